@@ -0,0 +1,115 @@
+"""
+Cost of the per-artist mean audio features: the string-keyed isin + merge +
+groupby of get_artist_features and the per-artist groupby of
+process_artist_data as they used to be, against get_artist_features on
+ArtistAggregates (artist ids factorized once, bincount reductions) and its
+O(1) per-artist lookup.
+
+Synthetic catalogs have two tracks per artist, 1.5 artists per track on
+average and about 1% of names shared by several artist ids. Run from the
+repository root:
+    python -m benchmarks.bench_aggregation
+"""
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.common import measure, print_table
+from src.aggregation import FEATURES, ArtistAggregates
+from src.data_processing import get_artist_features, merge_artist_features, process_artist_data
+from src.lookup import RowLookup
+
+
+SIZES = [3_000, 100_000, 1_000_000]
+QUERIES = 200
+
+
+def synthetic_artist_tracks(n_artists, seed=42):
+    """(artists, tracks, mapping, audio_features) frames with the columns of the csv files"""
+    rng = np.random.default_rng(seed)
+    n_tracks = 2 * n_artists
+    # one category set per id shared by every table, like read_columnar
+    artist_ids = pd.Series(pd.Categorical([f'a{i:021x}' for i in range(n_artists)]))
+    track_ids = pd.Series(pd.Categorical([f't{i:021x}' for i in range(n_tracks)]))
+    name_codes = rng.integers(0, int(n_artists * 0.99), n_artists)
+    artists = pd.DataFrame({
+        'artist_id': artist_ids,
+        'name': pd.Series([f'artist {i}' for i in name_codes], dtype='string'),
+        'popularity': rng.integers(0, 100, n_artists).astype(np.int8),
+        'followers': rng.integers(0, 10**7, n_artists),
+    })
+    tracks = pd.DataFrame({'track_id': track_ids, 'name': pd.Series(['song'] * n_tracks, dtype='string')})
+
+    # every track has a main artist, half of them a second one
+    featured = rng.random(n_tracks) < 0.5
+    pair_tracks = np.concatenate([np.arange(n_tracks), np.flatnonzero(featured)])
+    pair_artists = np.concatenate([np.arange(n_tracks) % n_artists, rng.integers(0, n_artists, featured.sum())])
+    pairs = pd.DataFrame({'artist_id': pair_artists, 'track_id': pair_tracks}).drop_duplicates()
+    mapping = pd.DataFrame({'artist_id': artist_ids.iloc[pairs['artist_id']].reset_index(drop=True),
+                            'track_id': track_ids.iloc[pairs['track_id']].reset_index(drop=True)})
+
+    audio_features = pd.DataFrame({'track_id': track_ids})
+    for feature in FEATURES:
+        audio_features[feature] = rng.random(n_tracks).astype(np.float32)
+    return artists, tracks, mapping, audio_features
+
+
+def groupby_features(artists_df, artist_track_, audio_features):
+    """get_artist_features before: string isin, merge and groupby mean by name"""
+    artist_tracks = artist_track_[artist_track_['name_x'].isin(artists_df['name'])]
+    features = pd.merge(artist_tracks[['name_x', 'track_id']], audio_features, on='track_id', how='inner')
+    return features.groupby('name_x')[FEATURES].mean().reset_index()
+
+
+def groupby_artist(artist_name, artist_track_, audio_features, lookup):
+    """process_artist_data before: a frame of groupby tuples mapped with a lambda"""
+    artist_rows = artist_track_.iloc[lookup.rows(artist_name)]
+    artist_data = pd.DataFrame(artist_rows.groupby(['track_id'], observed=True))
+    artist_mapped = pd.DataFrame(artist_data[0].map(lambda x: x[0]))
+    artist_features_ = pd.merge(artist_mapped, audio_features, left_on=0, right_on='track_id', how='inner')
+    return artist_features_[FEATURES].mean().reset_index()
+
+
+def per_query(func, keys):
+    start = time.perf_counter()
+    for key in keys:
+        func(key)
+    return (time.perf_counter() - start) / len(keys)
+
+
+def main():
+    rows = []
+    for size in SIZES:
+        artists, tracks, mapping, audio_features = synthetic_artist_tracks(size)
+        artist_track_ = merge_artist_features(tracks, mapping, artists)
+        lookup = RowLookup(artist_track_['name_x'])
+        repeat = 1 if size >= 1_000_000 else 3
+
+        before = measure(groupby_features, artists, artist_track_, audio_features, repeat=repeat)
+        after = measure(get_artist_features, artists, artist_track_, audio_features, repeat=repeat)
+        aggregates = ArtistAggregates(artist_track_, audio_features)
+        table = aggregates.frame()
+
+        names = artists['name'].sample(QUERIES, random_state=0).tolist()
+        rows.append({
+            'artists': size,
+            'pairs': len(artist_track_),
+            'groupby s': before['seconds'],
+            'aggregates s': after['seconds'],
+            'groupby MB': before['peak_mb'],
+            'aggregates MB': after['peak_mb'],
+            'artist before ms': per_query(lambda name: groupby_artist(name, artist_track_, audio_features, lookup),
+                                          names[:20]) * 1e3,
+            'artist lookup ms': per_query(lambda name: process_artist_data(name, artist_track_, audio_features,
+                                                                           aggregates=aggregates), names) * 1e3,
+            'max abs diff': float(np.abs(groupby_features(artists, artist_track_, audio_features)[FEATURES]
+                                         .to_numpy(np.float64) - table[FEATURES].to_numpy(np.float64)).max()),
+        })
+
+    print_table(rows, ['artists', 'pairs', 'groupby s', 'aggregates s', 'groupby MB', 'aggregates MB',
+                       'artist before ms', 'artist lookup ms', 'max abs diff'])
+
+
+if __name__ == '__main__':
+    main()
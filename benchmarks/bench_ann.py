@@ -0,0 +1,68 @@
+"""
+Recall@k against latency of the approximate IVF search for several probe
+counts, measured against the exact SimilarityIndex on synthetic catalogs.
+
+The catalogs are clustered like real feature vectors (a mixture of Gaussian
+blobs in the MinMax-scaled unit cube) rather than uniform noise. Run from the
+repository root:
+    python -m benchmarks.bench_ann
+"""
+import time
+
+import numpy as np
+
+from benchmarks.common import print_table
+from src.ann import IVFIndex
+from src.similarity import SimilarityIndex
+
+
+SIZES = [100_000, 1_000_000]
+NPROBES = [1, 2, 4, 8, 16, 32, 64]
+K = 20
+N_QUERIES = 200
+N_FEATURES = 11
+
+
+def clustered_catalog(n_items, n_features=N_FEATURES, n_clusters=300, spread=0.08, seed=42):
+    """Gaussian blobs around random centers, clipped to [0, 1] like MinMax-scaled features"""
+    rng = np.random.default_rng(seed)
+    centers = rng.random((n_clusters, n_features))
+    members = rng.integers(n_clusters, size=n_items)
+    vectors = centers[members] + rng.normal(scale=spread, size=(n_items, n_features))
+    return np.clip(vectors, 0, 1).astype(np.float32)
+
+
+def timed_queries(search, queries):
+    """Results of search(q) for every query and the mean milliseconds per query"""
+    start = time.perf_counter()
+    results = [search(query) for query in queries]
+    return results, (time.perf_counter() - start) / len(queries) * 1e3
+
+
+def main():
+    rows = []
+    for size in SIZES:
+        exact = SimilarityIndex(clustered_catalog(size))
+        queries = np.random.default_rng(0).choice(size, size=N_QUERIES, replace=False)
+
+        truth, exact_ms = timed_queries(lambda q: exact.query(q, k=K)[0], queries)
+        rows.append({'items': size, 'search': 'exact', 'recall@20': 1.0, 'ms per query': exact_ms,
+                     'scored per query': size})
+
+        start = time.perf_counter()
+        ivf = IVFIndex(exact.unit_vectors)
+        build_s = time.perf_counter() - start
+
+        for nprobe in NPROBES:
+            found, ms = timed_queries(lambda q: ivf.query(q, k=K, nprobe=nprobe)[0], queries)
+            recall = np.mean([len(np.intersect1d(a, b)) / K for a, b in zip(found, truth)])
+            scored = np.mean([len(ivf.candidates(q, nprobe)[0]) for q in queries[:20]])
+            rows.append({'items': size, 'search': f'ivf nprobe={nprobe}', 'recall@20': recall,
+                         'ms per query': ms, 'scored per query': int(scored)})
+        print(f'{size} items: {ivf.n_lists} lists built in {build_s:.2f}s')
+
+    print_table(rows, ['items', 'search', 'recall@20', 'ms per query', 'scored per query'])
+
+
+if __name__ == '__main__':
+    main()
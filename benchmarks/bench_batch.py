@@ -0,0 +1,51 @@
+"""
+Throughput of SimilarityIndex.query_batch (blocked matrix multiplication)
+against one query() call per item, for several per-block memory budgets.
+
+Run from the repository root:
+    python -m benchmarks.bench_batch
+"""
+import time
+
+import numpy as np
+
+from benchmarks.common import measure, print_table, random_catalog
+from src.similarity import SimilarityIndex
+
+
+SIZES = [10_000, 100_000]
+N_QUERIES = 10_000
+BUDGETS_MB = [16, 64, 256]
+K = 20
+
+
+def loop_queries(index, queries, k):
+    """One query() per item, the pre-batch way of precomputing neighbours"""
+    for query in queries:
+        index.query(query, k)
+
+
+def main():
+    rows = []
+    for size in SIZES:
+        vectors, _ = random_catalog(size)
+        index = SimilarityIndex(vectors)
+        queries = np.random.default_rng(0).integers(0, size, N_QUERIES)
+
+        start = time.perf_counter()
+        loop_queries(index, queries[:1000], K)
+        loop_seconds = (time.perf_counter() - start) * N_QUERIES / 1000
+        rows.append({'items': size, 'method': 'query() loop', 'seconds': loop_seconds,
+                     'queries/s': N_QUERIES / loop_seconds, 'peak MB': None})
+
+        for budget in BUDGETS_MB:
+            result = measure(index.query_batch, queries, K, memory_budget_mb=budget, repeat=1)
+            rows.append({'items': size, 'method': f'query_batch {budget} MB', 'seconds': result['seconds'],
+                         'queries/s': N_QUERIES / result['seconds'], 'peak MB': result['peak_mb']})
+
+    print(f'{N_QUERIES} queries, k={K} (query() loop extrapolated from 1000 queries)')
+    print_table(rows, ['items', 'method', 'seconds', 'queries/s', 'peak MB'])
+
+
+if __name__ == '__main__':
+    main()
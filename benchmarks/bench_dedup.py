@@ -0,0 +1,76 @@
+"""
+Latency of get_similar_artists when near-duplicates crowd the top of the
+ranking: the previous candidate walk (Python loop with a set of seen names,
+growing the window until n distinct names are found) against the grouped
+max-per-name reduction.
+
+The query item gets `copies` rows right next to it in feature space, spread
+over a handful of names, so the walk has to step over all of them. Run from
+the repository root:
+    python -m benchmarks.bench_dedup
+"""
+import numpy as np
+
+from benchmarks.common import measure, print_table, random_catalog
+from src.data_processing import get_similar_artists
+from src.lookup import RowLookup
+from src.similarity import SimilarityIndex, top_k
+
+
+SIZES = [100_000, 1_000_000]
+COPIES = [0, 1_000, 20_000]
+DUPLICATE_NAMES = 5
+
+
+def walk_get_similar_artists(artist_name, vectors, artists_df, n=20, index=None, lookup=None):
+    """The previous de-duplication: walk the best candidates, widening the window as needed"""
+    artist_idx = lookup.first(artist_name)
+    artist_similarities = index.scores(artist_idx)
+    names = artists_df['name'].to_numpy()
+    window = min(len(artist_similarities), 2 * n + 1)
+    while True:
+        filtered_indices = []
+        seen_names = set()
+        for idx in top_k(artist_similarities, window):
+            name = names[idx]
+            if name != artist_name and name not in seen_names:
+                filtered_indices.append(idx)
+                seen_names.add(name)
+            if len(filtered_indices) >= n:
+                break
+        if len(filtered_indices) >= n or window >= len(artist_similarities):
+            break
+        window = min(len(artist_similarities), window * 4)
+    filtered_indices = np.array(filtered_indices[:n], dtype=np.int64)
+    return vectors[filtered_indices], artists_df.iloc[filtered_indices], artist_similarities[filtered_indices]
+
+
+def crowded_catalog(size, copies, seed=42):
+    """Random catalog where item 0 has `copies` near-identical rows under a few names"""
+    vectors, names = random_catalog(size, seed=seed)
+    rng = np.random.default_rng(seed)
+    vectors[1:copies + 1] = vectors[0] + rng.normal(scale=1e-4, size=(copies, vectors.shape[1]))
+    names.loc[1:copies, 'name'] = [f'duplicate {i % DUPLICATE_NAMES}' for i in range(copies)]
+    return vectors, names
+
+
+def main():
+    rows = []
+    for size in SIZES:
+        for copies in COPIES:
+            vectors, names = crowded_catalog(size, copies)
+            query = names['name'].iloc[0]
+            index = SimilarityIndex(vectors)
+            lookup = RowLookup(names['name'])
+
+            walk = measure(walk_get_similar_artists, query, vectors, names, index=index, lookup=lookup)
+            grouped = measure(get_similar_artists, query, vectors, names, index=index, lookup=lookup)
+            rows.append({'items': size, 'near-duplicates': copies,
+                         'walk ms': walk['seconds'] * 1e3, 'grouped ms': grouped['seconds'] * 1e3,
+                         'grouped peak MB': grouped['peak_mb']})
+
+    print_table(rows, ['items', 'near-duplicates', 'walk ms', 'grouped ms', 'grouped peak MB'])
+
+
+if __name__ == '__main__':
+    main()
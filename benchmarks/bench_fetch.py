@@ -0,0 +1,133 @@
+"""
+Latency of fetching the Spotify metadata of one page (the selected item plus
+its recommendation cards) against the local stub server with an injected
+per-request delay.
+
+Fetch patterns compared:
+    sequential per item   one request per id, one after another (original)
+    sequential per row    selected item, then the card row (shared client)
+    gathered              every chunk in flight at once (fetch_concurrently)
+The gathered pattern is also run with one id per request, where only the
+concurrency limit keeps it from taking one delay per id.
+
+Finally whole song-page reruns are timed headless (streamlit AppTest) with
+and without the injected delay; the difference is what the network costs a
+rerun. The metadata cache lives in a temporary directory and is emptied
+before every configuration: 'cold' empties it before every rerun too, so
+each rerun fetches the page from the stub, 'warm' only fills it once. Run
+from the repository root:
+    python -m benchmarks.bench_fetch
+"""
+import os
+import tempfile
+import time
+
+from benchmarks.common import print_table
+from benchmarks.spotify_stub import SpotifyStubServer
+
+
+DELAY = 0.05
+REPEAT = 5
+CARD_COUNTS = [3, 12]
+PAGE = 'pages/1 Song recommendation concept.py'
+SONG = 'Lean On'
+
+
+def sequential_per_item(client, ids):
+    for track_id in ids:
+        client.get(f'tracks/{track_id}')
+
+
+def sequential_per_row(client, ids):
+    client.get_tracks(ids[:1])
+    client.get_tracks(ids[1:])
+
+
+def timed(func, *args, **kwargs):
+    """Mean milliseconds of REPEAT calls"""
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        func(*args, **kwargs)
+    return (time.perf_counter() - start) / REPEAT * 1e3
+
+
+def fetch_rows(stub):
+    from src.spotify_client import SpotifyClient, fetch_concurrently
+
+    client = SpotifyClient('id', 'secret', api_url=stub.api_url, auth_url=stub.auth_url)
+    client.get_token()
+    patterns = {
+        'sequential per item (before)': lambda ids: sequential_per_item(client, ids),
+        'sequential per row': lambda ids: sequential_per_row(client, ids),
+        'gathered (after)': lambda ids: fetch_concurrently(client, track_ids=ids),
+        'gathered, 1 id per request': lambda ids: fetch_concurrently(client, track_ids=ids, chunk_size=1),
+    }
+
+    rows = []
+    for cards in CARD_COUNTS:
+        ids = [f'track{i:017d}' for i in range(cards + 1)]
+        for name, pattern in patterns.items():
+            stub.reset()
+            ms = timed(pattern, ids)
+            rows.append({'cards': cards, 'pattern': name,
+                         'requests': stub.count('/v1/') // REPEAT, 'ms': ms})
+    return rows
+
+
+def page_script():
+    import os
+    path = os.environ['BENCH_PAGE']
+    exec(compile(open(path).read(), path, 'exec'), {'__name__': '__main__'})
+
+
+def page_rows(stub):
+    from streamlit.testing.v1 import AppTest
+    from src.spotify_widget import get_metadata_cache
+
+    os.environ['BENCH_PAGE'] = PAGE
+    app = AppTest.from_function(page_script, default_timeout=300)
+    app.secrets['spotify'] = {'client_id': 'id', 'client_secret': 'secret'}
+    app.run()
+    app.text_input[0].set_value(SONG).run()
+    app.selectbox[0].set_value(SONG).run()
+
+    # the process-wide cache the page reads, see main
+    cache = get_metadata_cache()
+
+    def cold_rerun():
+        cache.clear()
+        app.run()
+
+    rows = []
+    for delay in [0.0, DELAY]:
+        stub.delay = delay
+        for state, rerun in [('cold', cold_rerun), ('warm', app.run)]:
+            cache.clear()
+            if state == 'warm':
+                app.run()
+            stub.reset()
+            ms = timed(rerun)
+            rows.append({'injected delay ms': delay * 1e3, 'metadata cache': state,
+                         'API requests per rerun': stub.count('/v1/') / REPEAT,
+                         'ms per rerun': ms})
+    return rows
+
+
+def main():
+    with SpotifyStubServer(delay=DELAY) as stub, tempfile.TemporaryDirectory() as cache_dir:
+        # the app's shared client and the metadata cache read these on import; stub
+        # records must not reach the app's own cache in data/cache
+        os.environ['SPOTIFY_API_URL'] = stub.api_url
+        os.environ['SPOTIFY_AUTH_URL'] = stub.auth_url
+        os.environ['METADATA_CACHE_PATH'] = os.path.join(cache_dir, 'metadata.sqlite')
+
+        print(f'metadata fetch, {DELAY * 1e3:.0f} ms injected delay per API request')
+        print_table(fetch_rows(stub), ['cards', 'pattern', 'requests', 'ms'])
+        print()
+        print(f'song page reruns ({SONG!r} selected)')
+        print_table(page_rows(stub), ['injected delay ms', 'metadata cache', 'API requests per rerun',
+                                      'ms per rerun'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""
+Cost of filtered searches (src.filters) with the filter applied inside the
+scan, against post-filtering the unfiltered results.
+
+A synthetic catalog, clustered like bench_ann, gets a release year, an
+explicit flag, an album type and a popularity per row. For a selective, a
+medium and a broad filter the mean latency of similar_rows is reported:
+'post-filter' asks for ever more results (doubling n) until 20 pass the
+filter; 'pushdown' passes the RowFilter, which scores only the passing rows
+of a selective filter and masks the full scan of a broad one. Both forced
+strategies are timed too, which is where SUBSET_SHARE comes from. Every
+pushdown result is checked against the brute-force top 20 of the passing
+rows. Run from the repository root:
+    python -m benchmarks.bench_filters
+"""
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.bench_ann import clustered_catalog
+from benchmarks.common import print_table, random_catalog
+from src.data_processing import best_per_name, similar_rows
+from src.filters import SUBSET_SHARE, FilterIndex
+from src.lookup import RowLookup
+from src.similarity import SimilarityIndex
+
+
+N_ITEMS = 1_000_000
+N_QUERIES = 20
+N = 20
+FILTERS = {
+    'selective: singles of 2000-2004': {'year_min': 2000, 'year_max': 2004, 'album_types': ('single',)},
+    'medium: 1990-2009': {'year_min': 1990, 'year_max': 2009},
+    'broad: non-explicit': {'explicit': False},
+}
+
+
+def filter_columns(n_items, seed=0):
+    """Release date, explicit flag, album type and popularity, distributed like the shipped tracks"""
+    rng = np.random.default_rng(seed)
+    years = np.clip(rng.normal(2005, 15, size=n_items).astype(int), 1900, 2024)
+    items = pd.DataFrame({
+        'release_date': pd.Series(years).astype(str) + '-01-01',
+        'explicit': rng.random(n_items) < 0.38,
+        'album_type': pd.Categorical(rng.choice(['album', 'single', 'compilation'], size=n_items,
+                                                p=[0.81, 0.15, 0.04])),
+    })
+    return items, rng.integers(0, 101, size=n_items)
+
+
+def post_filtered(name, vectors, items, index, lookup, row_filter):
+    """Unfiltered search for more and more results until N pass the filter"""
+    n = N
+    while True:
+        rows, scores = similar_rows(name, vectors, items, n=n, index=index, lookup=lookup)
+        passing = row_filter.mask[rows]
+        if passing.sum() >= N or n >= len(vectors):
+            return rows[passing][:N], scores[passing][:N], n
+        n *= 2
+
+
+def mean_ms(search, queries):
+    start = time.perf_counter()
+    results = [search(query) for query in queries]
+    return results, (time.perf_counter() - start) / len(queries) * 1e3
+
+
+def main():
+    vectors = clustered_catalog(N_ITEMS)
+    _, items = random_catalog(N_ITEMS)
+    columns, popularity = filter_columns(N_ITEMS)
+    filter_index = FilterIndex(columns, popularity)
+    index = SimilarityIndex(vectors)
+    lookup = RowLookup(items['name'])
+    queries = items['name'].sample(N_QUERIES, random_state=0).tolist()
+
+    _, unfiltered_ms = mean_ms(lambda name: similar_rows(name, vectors, items, index=index, lookup=lookup),
+                               queries)
+    rows = [{'filter': 'none', 'case': 'full scan', 'ms per query': unfiltered_ms}]
+
+    for label, filters in FILTERS.items():
+        start = time.perf_counter()
+        row_filter = filter_index.row_filter(filters)
+        build_ms = (time.perf_counter() - start) * 1e3
+
+        results, ms = mean_ms(lambda name: post_filtered(name, vectors, items, index, lookup, row_filter),
+                              queries)
+        rows.append({'filter': label, 'share': row_filter.share, 'case': 'post-filter', 'ms per query': ms,
+                     'mean n fetched': np.mean([n for _, _, n in results])})
+
+        selective = row_filter.selective
+        for case, forced in [('pushdown', selective), ('forced subset scoring', True),
+                             ('forced masked scan', False)]:
+            row_filter.selective = forced
+            results, ms = mean_ms(lambda name: similar_rows(name, vectors, items, index=index, lookup=lookup,
+                                                            row_filter=row_filter), queries)
+            exact = 0
+            for name, (result_rows, _) in zip(queries, results):
+                query_scores = index.scores(lookup.first(name))
+                expected, _ = best_per_name(row_filter.rows, query_scores[row_filter.rows], lookup, name, N)
+                exact += np.array_equal(result_rows, expected)
+            rows.append({'filter': label, 'share': row_filter.share, 'case': case, 'ms per query': ms,
+                         'exact top 20': exact / len(queries),
+                         'mask ms': build_ms if case == 'pushdown' else None})
+        row_filter.selective = selective
+
+    print(f'{N_ITEMS} items, {N_QUERIES} queries, SUBSET_SHARE={SUBSET_SHARE}')
+    print_table(rows, ['filter', 'share', 'case', 'ms per query', 'mean n fetched', 'exact top 20', 'mask ms'])
+
+
+if __name__ == '__main__':
+    main()
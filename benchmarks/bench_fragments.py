@@ -0,0 +1,165 @@
+"""
+How often the expensive functions of the recommendation pages run per
+interaction, now that the pages are split into fragments (st.fragment).
+
+Every interaction of one session is replayed on a headless page (streamlit
+AppTest, against the local Spotify stub), and reported twice:
+- whole page: every call of the rerun, which is what every interaction
+  cost before
+- fragment: the calls made inside the fragment holding the widget, which is
+  what the rerun of that fragment alone costs now; an interaction whose
+  fragment calls st.rerun() for the whole page (applying weights, moving a
+  slider in live mode) costs a whole-page rerun on top
+
+AppTest only reruns whole pages, so calls are charged to the fragment running
+at the time: st.fragment is replaced by a decorator recording the fragment it
+runs. The result cache is emptied before every interaction, so a whole-page
+rerun searches again instead of reusing the last interaction's results.
+Run from the repository root:
+    python -m benchmarks.bench_fragments
+"""
+import functools
+import importlib
+import logging
+import os
+import tempfile
+from collections import Counter
+
+import streamlit as st
+from streamlit import logger as streamlit_logger
+from streamlit.testing.v1 import AppTest
+
+from benchmarks.common import print_table
+from benchmarks.spotify_stub import SpotifyStubServer
+
+
+PAGES = {
+    'song': ('pages/1 Song recommendation concept.py', 'Lean On', 'song_live'),
+    'artist': ('pages/2 Artist recommendation concept.py', 'Drake', 'artist_live'),
+}
+# (module, function) pairs counted per interaction
+EXPENSIVE = [
+    ('src.result_cache', 'similar_rows'),
+    ('src.spotify_widget', 'fetch_spotify_metadata'),
+    ('src.projection', 'layout_coords'),
+    ('src.visualization', 'visualize_artist_space'),
+    ('src.data_processing', 'process_songs'),
+    ('src.data_processing', 'process_artist_data'),
+    ('src.visualization', 'create_radar_chart_new'),
+]
+# (fragment, function) -> calls; None for calls outside any fragment
+calls = Counter()
+# fragments running now, innermost last
+running = []
+
+
+def counted(name, func):
+    """`func` counting its calls under `name`, charged to the running fragment"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        calls[running[-1] if running else None, name] += 1
+        return func(*args, **kwargs)
+    return wrapper
+
+
+def tracking_fragment(fragment):
+    """Replacement for st.fragment recording which fragment runs"""
+    def decorator(func=None, **kwargs):
+        if func is None:
+            return functools.partial(decorator, **kwargs)
+
+        @functools.wraps(func)
+        def body(*args, **inner_kwargs):
+            running.append(func.__name__)
+            try:
+                return func(*args, **inner_kwargs)
+            finally:
+                running.pop()
+        return fragment(body, **kwargs)
+    return decorator
+
+
+def instrument(patch=setattr):
+    """
+    Count the EXPENSIVE calls per fragment. Pages import these functions and
+    st.fragment at every run, so patching the modules is enough.
+
+    Args:
+        patch (callable): patch(obj, name, value) installing a wrapper
+            (default setattr; pytest's monkeypatch.setattr undoes it)
+    """
+    for module_name, name in EXPENSIVE:
+        module = importlib.import_module(module_name)
+        patch(module, name, counted(name, getattr(module, name)))
+    patch(st, 'fragment', tracking_fragment(st.fragment))
+
+
+def interactions(live_key):
+    """(label, fragment holding the widget, reruns the whole page, change to the widgets) of one session"""
+    return [
+        ('move a weight slider', 'weight_controls', False,
+         lambda app: app.select_slider(key='weight_danceability').set_value(2.0)),
+        ('apply the weights', 'weight_controls', True,
+         lambda app: next(b for b in app.button if b.label == 'Apply Weights').click()),
+        ('refine the plot layout', 'projection_plot', False,
+         lambda app: next(t for t in app.toggle if t.key != live_key).set_value(True)),
+        ('turn on live mode', 'weight_controls', False, lambda app: app.toggle(key=live_key).set_value(True)),
+        ('move a slider in live mode', 'weight_controls', True,
+         lambda app: app.select_slider(key='weight_energy').set_value(3.0)),
+    ]
+
+
+def session_rows(page, selection, live_key):
+    """
+    Function calls of every interaction of one session, as a whole-page rerun
+    and as the rerun of the fragment holding the widget.
+
+    Returns:
+        list: dicts with 'interaction', 'rerun' and the calls of every EXPENSIVE function
+    """
+    from src.result_cache import load_result_cache
+
+    app = AppTest.from_file(os.path.abspath(page), default_timeout=300)
+    app.secrets['spotify'] = {'client_id': 'id', 'client_secret': 'secret'}
+    app.run()
+    # the picker offers the names matching the typed text
+    app.text_input[0].set_value(selection).run()
+    app.selectbox[0].set_value(selection).run()
+
+    names = [name for _, name in EXPENSIVE]
+    rows = []
+    for label, fragment, reruns_page, change in interactions(live_key):
+        change(app)
+        load_result_cache().clear()
+        calls.clear()
+        app.run()
+        if app.exception:
+            raise RuntimeError(app.exception[0].value)
+        page_calls = {name: sum(count for (_, called), count in calls.items() if called == name) for name in names}
+        rows.append({'interaction': label, 'rerun': 'whole page', **page_calls})
+        rows.append({'interaction': label, 'rerun': 'fragment',
+                     **(page_calls if reruns_page else {name: calls[fragment, name] for name in names})})
+    return rows
+
+
+def main():
+    # Streamlit warns about the missing runtime on every cached call
+    streamlit_logger.set_log_level(logging.ERROR)
+
+    with SpotifyStubServer() as stub, tempfile.TemporaryDirectory() as cache_dir:
+        # the app's shared client and the metadata cache read these on import
+        os.environ['SPOTIFY_API_URL'] = stub.api_url
+        os.environ['SPOTIFY_AUTH_URL'] = stub.auth_url
+        os.environ['METADATA_CACHE_PATH'] = os.path.join(cache_dir, 'metadata.sqlite')
+        instrument()
+
+        names = [name for _, name in EXPENSIVE]
+        for kind, (page, selection, live_key) in PAGES.items():
+            rows = session_rows(page, selection, live_key)
+            print(f'{kind} page ({selection!r} selected): calls per interaction')
+            print_table(rows, ['interaction', 'rerun'] + [name for name in names if any(row[name] for row in rows)])
+            print()
+
+
+if __name__ == '__main__':
+    main()
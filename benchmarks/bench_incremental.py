@@ -0,0 +1,79 @@
+"""
+Cost of keeping the artist vectors current as new tracks arrive: a full
+rebuild (get_artist_features + vectorize_artist_features over the complete
+tables) against ArtistProfiles.append of the new rows followed by the lazy
+vectors() call, with the incremental result checked against the rebuild.
+
+Synthetic catalogs come from bench_aggregation; the newest tracks (with their
+mapping rows and audio features) are held back and appended in batches.
+Run from the repository root:
+    python -m benchmarks.bench_incremental
+"""
+import time
+
+from benchmarks.bench_aggregation import synthetic_artist_tracks
+from benchmarks.common import print_table
+from src.aggregation import ArtistProfiles
+from src.data_processing import get_artist_features, merge_artist_features, vectorize_artist_features
+
+
+SIZES = [100_000, 1_000_000]
+BATCH_TRACKS = [10, 1_000]
+N_BATCHES = 3
+
+
+def full_rebuild(tracks, mapping, artists, audio_features):
+    artist_track_ = merge_artist_features(tracks, mapping, artists)
+    return vectorize_artist_features(get_artist_features(artists, artist_track_, audio_features))
+
+
+def seconds(func, *args, **kwargs):
+    start = time.perf_counter()
+    func(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+def main():
+    rows = []
+    for size in SIZES:
+        artists, tracks, mapping, audio_features = synthetic_artist_tracks(size)
+        held_back = sum(BATCH_TRACKS) * N_BATCHES
+
+        # synthetic track ids are numbered in category order
+        def tracks_between(frame, start, stop):
+            codes = frame['track_id'].cat.codes.to_numpy()
+            return frame[(codes >= start) & (codes < stop)]
+
+        def upto(frame, n_tracks):
+            return tracks_between(frame, 0, n_tracks)
+
+        n_tracks = len(tracks) - held_back
+        start = time.perf_counter()
+        profiles = ArtistProfiles(upto(tracks, n_tracks), upto(mapping, n_tracks), artists,
+                                  upto(audio_features, n_tracks))
+        profiles.vectors()
+        rows.append({'artists': size, 'case': 'initial build', 'incremental s': time.perf_counter() - start})
+
+        for batch in BATCH_TRACKS:
+            for _ in range(N_BATCHES):
+                first, n_tracks = n_tracks, n_tracks + batch
+                append_s = seconds(profiles.append,
+                                   tracks=tracks_between(tracks, first, n_tracks),
+                                   mapping=tracks_between(mapping, first, n_tracks),
+                                   audio_features=tracks_between(audio_features, first, n_tracks))
+                vectors_s = seconds(profiles.vectors)
+                rebuild_s = seconds(full_rebuild, upto(tracks, n_tracks), upto(mapping, n_tracks), artists,
+                                    upto(audio_features, n_tracks))
+                rows.append({'artists': size, 'case': f'append {batch} tracks', 'append s': append_s,
+                             'vectors s': vectors_s, 'incremental s': append_s + vectors_s,
+                             'full rebuild s': rebuild_s})
+
+        rows[-1]['matches rebuild'] = profiles.verify(upto(tracks, n_tracks), upto(mapping, n_tracks), artists,
+                                                      upto(audio_features, n_tracks))
+
+    print_table(rows, ['artists', 'case', 'append s', 'vectors s', 'incremental s', 'full rebuild s',
+                       'matches rebuild'])
+
+
+if __name__ == '__main__':
+    main()
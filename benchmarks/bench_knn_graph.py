@@ -0,0 +1,74 @@
+"""
+Offline cost and online payoff of the precomputed neighbour graph: build
+time of build_knn_graph on one process and on every CPU, the size of the CSR
+arrays, and the latency of an unweighted get_similar_artists call that
+slices one graph row against the full scan, with the share of queries whose
+top 20 match exactly.
+
+Synthetic catalogs are clustered like bench_ann, with unique names so every
+neighbour is a recommendation. Run from the repository root:
+    python -m benchmarks.bench_knn_graph
+"""
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.bench_ann import clustered_catalog
+from benchmarks.common import print_table, random_catalog
+from src.data_processing import get_similar_artists
+from src.knn_graph import KNNGraph, build_knn_graph
+from src.lookup import RowLookup
+from src.similarity import SimilarityIndex
+
+
+SIZES = [20_000, 100_000]
+N_QUERIES = 200
+
+
+def timed_build(directory, index, n_jobs):
+    np.save(os.path.join(directory, 'unit.npy'), index.unit_vectors)
+    np.save(os.path.join(directory, 'norms.npy'), index.norms)
+    start = time.perf_counter()
+    arrays = build_knn_graph(os.path.join(directory, 'unit.npy'), os.path.join(directory, 'norms.npy'),
+                             n_jobs=n_jobs)
+    return KNNGraph(*arrays), time.perf_counter() - start
+
+
+def mean_ms(search, queries):
+    start = time.perf_counter()
+    results = [search(query) for query in queries]
+    return results, (time.perf_counter() - start) / len(queries) * 1e3
+
+
+def main():
+    rows = []
+    cpus = os.cpu_count() or 1
+    for size in SIZES:
+        vectors = clustered_catalog(size)
+        _, names = random_catalog(size)
+        index = SimilarityIndex(vectors)
+        lookup = RowLookup(names['name'])
+        queries = names['name'].sample(N_QUERIES, random_state=0).tolist()
+
+        with tempfile.TemporaryDirectory() as directory:
+            for n_jobs in sorted({1, cpus}):
+                graph, seconds = timed_build(directory, index, n_jobs)
+                rows.append({'items': size, 'case': f'build on {n_jobs} processes', 'seconds': seconds,
+                             'MB': (graph.indptr.nbytes + graph.indices.nbytes + graph.scores.nbytes) / 1e6})
+
+        exact, scan_ms = mean_ms(lambda name: get_similar_artists(name, vectors, names, index=index,
+                                                                  lookup=lookup), queries)
+        sliced, graph_ms = mean_ms(lambda name: get_similar_artists(name, vectors, names, index=index,
+                                                                    lookup=lookup, graph=graph), queries)
+        matches = np.mean([list(a[1].index) == list(b[1].index) for a, b in zip(exact, sliced)])
+        rows.append({'items': size, 'case': 'full scan query', 'ms per query': scan_ms})
+        rows.append({'items': size, 'case': 'graph row query', 'ms per query': graph_ms,
+                     'same top 20': float(matches)})
+
+    print_table(rows, ['items', 'case', 'seconds', 'MB', 'ms per query', 'same top 20'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+"""
+Latency of re-ranking one selected item after a weight change: the weighted
+query path (a new weight vector needs a fresh pass over the vectors for its
+row norms) against the selected item's cached per-feature contributions
+(two matrix-vector products), each followed by the top-20 selection.
+
+Every timed call uses a different weight vector, like a slider moving. The
+one-off cost of building the contributions and their memory (the item's
+products plus the squares the index shares between items) are reported
+per catalog. Run from the repository root:
+    python -m benchmarks.bench_live_weights
+"""
+import time
+
+import numpy as np
+
+from benchmarks.bench_ann import clustered_catalog
+from benchmarks.common import print_table
+from src.similarity import SimilarityIndex, top_k
+from src.vector_store import open_vector_store
+
+
+SIZES = [1_000_000, 5_000_000]
+K = 20
+N_CHANGES = 20
+WEIGHT_VALUES = [0.1, 0.5, 1, 1.5, 2.0, 3.0, 5.0]
+
+
+def weight_changes(n_features, seed=0):
+    """Weight vectors drawn from the slider values, all different"""
+    rng = np.random.default_rng(seed)
+    return [rng.choice(WEIGHT_VALUES, size=n_features).astype(np.float32) for _ in range(N_CHANGES)]
+
+
+def mean_ms(rank, changes):
+    start = time.perf_counter()
+    for weights in changes:
+        rank(weights)
+    return (time.perf_counter() - start) / len(changes) * 1e3
+
+
+def case_rows(catalog, index):
+    query_idx = len(index) // 2
+    changes = weight_changes(index.unit_vectors.shape[1])
+
+    start = time.perf_counter()
+    contributions = index.contributions(query_idx)
+    build_ms = (time.perf_counter() - start) * 1e3
+
+    def weighted_query(weights):
+        # every change is a new weight vector, so its row norms are never cached
+        return top_k(index.scores(query_idx, weights), K)
+
+    rows = [
+        {'catalog': catalog, 'case': 'weighted query (Apply Weights)', 'ms per change': mean_ms(weighted_query, changes)},
+        {'catalog': catalog, 'case': 'cached contributions (live)',
+         'ms per change': mean_ms(lambda weights: top_k(contributions.scores(weights), K), changes),
+         'build ms': build_ms, 'MB': (contributions.products.nbytes + contributions.squared_features.nbytes) / 1e6},
+        {'catalog': catalog, 'case': '  of which scoring',
+         'ms per change': mean_ms(contributions.scores, changes)},
+    ]
+    return rows
+
+
+def main():
+    store = open_vector_store()
+    rows = []
+    for kind in ['track', 'artist']:
+        index = store.index(kind)
+        rows += case_rows(f'{kind}s {len(index)}', index)
+    for size in SIZES:
+        rows += case_rows(f'synthetic {size}', SimilarityIndex(clustered_catalog(size)))
+    print_table(rows, ['catalog', 'case', 'ms per change', 'build ms', 'MB'])
+
+
+if __name__ == '__main__':
+    main()
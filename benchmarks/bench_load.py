@@ -0,0 +1,99 @@
+"""
+Load time and resident memory of the four data tables: the original CSV
+parsing against the typed Feather files read by load_df.
+
+The shipped data is only a few MB, where allocator noise dominates, so the
+tables are also replicated SCALE times (with distinct ids) into a temporary
+directory. Each loader runs in a fresh interpreter so resident memory is not
+shared between them. Run from the repository root:
+    python -m benchmarks.bench_load
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import pandas as pd
+
+from benchmarks.common import print_table
+from src.storage import TABLES, convert_to_columnar
+
+
+SCALES = [1, 20]
+
+LOADERS = {
+    'csv (before)': """
+import pandas as pd
+def load(data_dir, columnar_dir):
+    return [pd.read_csv(f'{data_dir}/{table}.csv') for table in ['audio_features', 'tracks', 'mapping', 'artists']]
+""",
+    'feather (after)': """
+from src.storage import read_columnar
+def load(data_dir, columnar_dir):
+    return read_columnar(data_dir, columnar_dir)
+""",
+}
+
+MEASURE = """
+import gc, json, time
+from benchmarks.common import rss_mb
+{loader}
+# warm up lazy library initialization and the page cache; kept alive so the
+# measured load cannot just reuse memory freed by the warm-up
+warm = load({data_dir!r}, {columnar_dir!r})
+gc.collect()
+before = rss_mb()
+start = time.perf_counter()
+tables = load({data_dir!r}, {columnar_dir!r})
+seconds = time.perf_counter() - start
+print(json.dumps({{
+    'seconds': seconds,
+    'rss_mb': rss_mb() - before,
+    'frames_mb': sum(t.memory_usage(deep=True).sum() for t in tables) / 1e6,
+}}))
+"""
+
+
+def replicate_data(out_dir, scale, data_dir='data'):
+    """Write the CSVs repeated `scale` times, suffixing ids so copies stay distinct"""
+    for table in TABLES:
+        frame = pd.read_csv(os.path.join(data_dir, f'{table}.csv'), index_col=0, dtype=str)
+        copies = []
+        for copy in range(scale):
+            part = frame.copy()
+            for column in ['track_id', 'artist_id']:
+                if column in part and copy > 0:
+                    # keep junk rows (blank ids, repeated header) as they are
+                    is_id = part[column].notna() & (part[column] != column)
+                    part.loc[is_id, column] = part.loc[is_id, column] + f'_{copy}'
+            copies.append(part)
+        pd.concat(copies, ignore_index=True).to_csv(os.path.join(out_dir, f'{table}.csv'))
+
+
+def main():
+    rows = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for scale in SCALES:
+            data_dir = os.path.join(tmp, f'x{scale}')
+            columnar_dir = os.path.join(data_dir, 'columnar')
+            os.makedirs(data_dir)
+            replicate_data(data_dir, scale)
+            convert_to_columnar(data_dir, columnar_dir)
+
+            for name, loader in LOADERS.items():
+                code = MEASURE.format(loader=loader, data_dir=data_dir, columnar_dir=columnar_dir)
+                output = subprocess.run([sys.executable, '-c', code],
+                                        capture_output=True, text=True, check=True).stdout
+                result = json.loads(output.strip().splitlines()[-1])
+                rows.append({'scale': f'x{scale}',
+                             'loader': name,
+                             'load s': result['seconds'],
+                             'resident MB': result['rss_mb'],
+                             'DataFrames MB': result['frames_mb']})
+
+    print_table(rows, ['scale', 'loader', 'load s', 'resident MB', 'DataFrames MB'])
+
+
+if __name__ == '__main__':
+    main()
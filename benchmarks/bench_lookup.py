@@ -0,0 +1,65 @@
+"""
+Cost of resolving a selection by name or id: boolean-mask scans as the pages
+used to do them, against the RowLookup hash indexes.
+
+Run from the repository root:
+    python -m benchmarks.bench_lookup
+"""
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.common import print_table
+from src.lookup import build_lookups
+
+
+SIZES = [10_000, 100_000, 1_000_000]
+QUERIES = 200
+
+
+def synthetic_tracks(n_rows, seed=42):
+    """Track-like frame where roughly one name in ten is shared by several rows"""
+    rng = np.random.default_rng(seed)
+    n_names = max(1, int(n_rows * 0.9))
+    names = rng.integers(0, n_names, n_rows)
+    return pd.DataFrame({
+        'track_id': pd.Series([f'{i:022x}' for i in range(n_rows)], dtype='string'),
+        'name': pd.Series([f'song {i}' for i in names], dtype='string'),
+    })
+
+
+def per_query(func, keys):
+    """Mean seconds per call of func(key) over the given keys"""
+    start = time.perf_counter()
+    for key in keys:
+        func(key)
+    return (time.perf_counter() - start) / len(keys)
+
+
+def main():
+    rows = []
+    rng = np.random.default_rng(0)
+    for size in SIZES:
+        frame = synthetic_tracks(size)
+        names = frame['name'].to_numpy()[rng.integers(0, size, QUERIES)]
+        ids = frame['track_id'].to_numpy()[rng.integers(0, size, QUERIES)]
+
+        start = time.perf_counter()
+        lookups = build_lookups(frame, ['name', 'track_id'])
+        build_seconds = time.perf_counter() - start
+
+        rows.append({
+            'rows': size,
+            'mask name s': per_query(lambda key: frame[frame['name'] == key], names[:20]),
+            'lookup name s': per_query(lambda key: frame.iloc[lookups['name'].rows(key)], names),
+            'mask id s': per_query(lambda key: frame[frame['track_id'] == key].index[0], ids[:20]),
+            'lookup id s': per_query(lambda key: lookups['track_id'].first(key), ids),
+            'build s': build_seconds,
+        })
+
+    print_table(rows, ['rows', 'mask name s', 'lookup name s', 'mask id s', 'lookup id s', 'build s'])
+
+
+if __name__ == '__main__':
+    main()
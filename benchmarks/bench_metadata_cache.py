@@ -0,0 +1,67 @@
+"""
+Spotify metadata fetches with and without the SQLite metadata cache, against
+the local stub server with an injected per-request delay, plus the cost of
+the cache's bulk get/put on its own.
+
+Each "restart" opens a new MetadataCache on the same file, as a new app
+process would. Run from the repository root:
+    python -m benchmarks.bench_metadata_cache
+"""
+import os
+import tempfile
+import time
+
+from benchmarks.common import print_table
+from benchmarks.spotify_stub import SpotifyStubServer, fake_track
+from src.metadata_cache import MetadataCache
+from src.spotify_client import SpotifyClient
+
+
+DELAY = 0.05
+PAGE_IDS = [f'track{i:017d}' for i in range(4)]
+BULK_SIZES = [4, 50, 1000]
+
+
+def page_fetch(client, cache):
+    """Selected song plus three cards, fetching only cache misses"""
+    records = cache.get_many('track', PAGE_IDS)
+    missing = [i for i in PAGE_IDS if i not in records]
+    if missing:
+        cache.put_many('track', dict(zip(missing, client.get_tracks(missing))))
+
+
+def main():
+    rows = []
+    with SpotifyStubServer(delay=DELAY) as stub, tempfile.TemporaryDirectory() as tmp:
+        client = SpotifyClient('id', 'secret', api_url=stub.api_url, auth_url=stub.auth_url)
+        path = os.path.join(tmp, 'metadata.sqlite')
+        cache = MetadataCache(path)
+        for view in ['first view', 'second view', 'after restart']:
+            if view == 'after restart':
+                cache.close()
+                cache = MetadataCache(path)
+            stub.reset()
+            start = time.perf_counter()
+            page_fetch(client, cache)
+            rows.append({'view': view, 'API requests': stub.count('/v1/'),
+                         'ms': (time.perf_counter() - start) * 1e3})
+        print(f'song page metadata, {DELAY * 1e3:.0f} ms injected delay per API request')
+        print_table(rows, ['view', 'API requests', 'ms'])
+        print(cache.stats())
+
+        rows = []
+        cache = MetadataCache(os.path.join(tmp, 'bulk.sqlite'))
+        for size in BULK_SIZES:
+            records = {f'bulk{size}_{i}': fake_track(f'{i}') for i in range(size)}
+            start = time.perf_counter()
+            cache.put_many('track', records)
+            put_ms = (time.perf_counter() - start) * 1e3
+            start = time.perf_counter()
+            cache.get_many('track', list(records))
+            rows.append({'ids': size, 'put_many ms': put_ms, 'get_many ms': (time.perf_counter() - start) * 1e3})
+        print()
+        print_table(rows, ['ids', 'put_many ms', 'get_many ms'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""
+Cost of the similarity-space plot per render: t-SNE fitted on the plotted
+rows (original) against slicing the precomputed global layout, its local
+refinement (unweighted and weighted) and a hit in the layout cache.
+
+Needs the global layouts (python -m src.projection); the time that offline
+fit took is read back from the store. Run from the repository root:
+    python -m benchmarks.bench_projection
+"""
+import json
+import os
+
+from benchmarks.common import measure, print_table
+from src.data_processing import get_similar_artists
+from src.projection import LAYOUT_INFO, layout_coords, load_layout, weight_vector
+from src.vector_store import FEATURES, load_item_frame, load_item_lookups, open_vector_store
+from src.visualization import visualize_artist_space
+
+
+QUERIES = {'track': 'Lean On', 'artist': 'Rihanna'}
+WEIGHTS = {'danceability': 3.0, 'tempo': 0.5}
+
+
+def main():
+    store = open_vector_store()
+    if any(load_layout(store, kind) is None for kind in QUERIES):
+        raise SystemExit('No global layout in the vector store, run `python -m src.projection` first')
+    with open(os.path.join(store.path, LAYOUT_INFO)) as f:
+        info = json.load(f)
+
+    rows = []
+    for kind, query in QUERIES.items():
+        frame = load_item_frame(kind)
+        vectors = getattr(store, f'{kind}_vectors')
+        similar_vectors, similar_items, scores = get_similar_artists(
+            query, vectors, frame, index=store.index(kind), lookup=load_item_lookups(kind)['name'])
+        item_rows = tuple(similar_items.index.tolist())
+        item_type = 'song' if kind == 'track' else 'artist'
+
+        def uncached(**kwargs):
+            layout_coords.clear()
+            return layout_coords(store.version, kind, item_rows, **kwargs)
+
+        def plot(**kwargs):
+            coords = layout_coords(store.version, kind, item_rows, **kwargs) if kwargs else None
+            return visualize_artist_space(similar_vectors, similar_items, scores, item_type=item_type, coords=coords)
+
+        weights = weight_vector(WEIGHTS, FEATURES)
+        layout_coords(store.version, kind, item_rows, weights=weights)
+        cases = [
+            ('per-render t-SNE (before)', lambda: plot()),
+            ('global slice', lambda: uncached()),
+            ('global slice + plot', lambda: plot(refine=False)),
+            ('local refinement', lambda: uncached(refine=True)),
+            ('weighted refinement', lambda: uncached(weights=weights)),
+            ('weighted, cached', lambda: layout_coords(store.version, kind, item_rows, weights=weights)),
+        ]
+        for name, case in cases:
+            rows.append({'kind': kind, 'rows plotted': len(item_rows), 'case': name,
+                         'ms': measure(case)['seconds'] * 1e3})
+        rows.append({'kind': kind, 'rows plotted': info[kind]['rows'], 'case': 'offline global fit',
+                     'ms': info[kind]['seconds'] * 1e3})
+
+    print_table(rows, ['kind', 'rows plotted', 'case', 'ms'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""
+Memory and top-k agreement of the compact scan copies: float64 vectors (what
+vectorize_artist_features returns), the float32 store vectors, and int8 /
+float16 scan copies with and without full-precision re-ranking.
+
+Agreement is measured against float64 results: the share of the top 20 found
+(overlap) and the share of queries whose top 20 is identical in order. The
+synthetic catalog is the clustered one of bench_ann; the real catalog runs
+get_similar_artists on the vector store. Run from the repository root:
+    python -m benchmarks.bench_quantized
+"""
+import time
+
+import numpy as np
+
+from benchmarks.bench_ann import clustered_catalog
+from benchmarks.common import print_table
+from src.data_processing import get_similar_artists
+from src.similarity import QuantizedIndex, SimilarityIndex
+from src.vector_store import load_item_frame, load_item_lookups, open_vector_store
+
+
+SIZE = 1_000_000
+K = 20
+N_QUERIES = 100
+RERANK = 300
+
+
+def agreement(found, reference):
+    """(mean top-k overlap, share of identical rankings)"""
+    overlap = np.mean([len(np.intersect1d(a, b)) / len(b) for a, b in zip(found, reference)])
+    identical = np.mean([np.array_equal(a, b) for a, b in zip(found, reference)])
+    return overlap, identical
+
+
+def scan_mb(index):
+    """Memory of the matrix an index scans per query"""
+    matrix = index.codes if isinstance(index, QuantizedIndex) else index.unit_vectors
+    return matrix.nbytes / 1e6
+
+
+def synthetic_rows():
+    vectors = clustered_catalog(SIZE).astype(np.float64)
+    queries = np.random.default_rng(0).choice(SIZE, size=N_QUERIES, replace=False)
+    reference = SimilarityIndex(vectors, dtype=np.float64)
+    exact = SimilarityIndex(vectors)
+    indexes = {
+        'float64 (before)': reference,
+        'float32': exact,
+        'int8, no re-rank': QuantizedIndex.from_vectors(vectors, 'int8', rerank=0),
+        f'int8, re-rank {RERANK}': QuantizedIndex.from_vectors(vectors, 'int8', rerank=RERANK),
+        f'float16, re-rank {RERANK}': QuantizedIndex.from_vectors(vectors, 'float16', rerank=RERANK),
+    }
+
+    truth = [reference.query(q, k=K)[0] for q in queries]
+    rows = []
+    for name, index in indexes.items():
+        start = time.perf_counter()
+        found = [index.query(q, k=K)[0] for q in queries]
+        ms = (time.perf_counter() - start) / N_QUERIES * 1e3
+        overlap, identical = agreement(found, truth)
+        rows.append({'catalog': f'synthetic {SIZE}', 'scan': name, 'scan MB': scan_mb(index),
+                     'ms per query': ms, 'top-20 overlap': overlap, 'identical top-20': identical})
+    return rows
+
+
+def store_rows():
+    store = open_vector_store()
+    rows = []
+    for kind in ['track', 'artist']:
+        frame = load_item_frame(kind)
+        lookup = load_item_lookups(kind)['name']
+        vectors = getattr(store, f'{kind}_vectors')
+        names = np.random.default_rng(0).choice(frame['name'].dropna().unique(), size=N_QUERIES, replace=False)
+
+        reference = SimilarityIndex(vectors, dtype=np.float64)
+        truth = [get_similar_artists(name, vectors, frame, index=reference, lookup=lookup)[1].index for name in names]
+        for scan in ['float32', 'int8', 'float16']:
+            index = store.index(kind, scan=scan, rerank=RERANK)
+            found = [get_similar_artists(name, vectors, frame, index=index, lookup=lookup)[1].index for name in names]
+            overlap, identical = agreement(found, truth)
+            rows.append({'catalog': f'{kind}s {len(frame)}', 'scan': scan, 'scan MB': scan_mb(index),
+                         'top-20 overlap': overlap, 'identical top-20': identical})
+        rows.append({'catalog': f'{kind}s {len(frame)}', 'scan': 'float64 (before)',
+                     'scan MB': reference.unit_vectors.nbytes / 1e6, 'top-20 overlap': 1.0, 'identical top-20': 1.0})
+    return rows
+
+
+def main():
+    print_table(synthetic_rows() + store_rows(),
+                ['catalog', 'scan', 'scan MB', 'ms per query', 'top-20 overlap', 'identical top-20'])
+
+
+if __name__ == '__main__':
+    main()
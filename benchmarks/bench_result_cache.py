@@ -0,0 +1,97 @@
+"""
+Payoff of the recommendation result cache (src.result_cache) on a stream of
+queries whose popularity follows a Zipf law, like lookups of hit songs.
+
+Every query picks an item by popularity, and one in WEIGHTED_SHARE carries
+one of a few weight presets; presets differ by a common factor in pairs, so
+they share entries. Reported per cache budget: hit rate, evictions, the mean
+latency of cached_similar_items against the uncached search, and the memory
+held by the entries. A last row checks that a new store version empties the
+cache. Run from the repository root:
+    python -m benchmarks.bench_result_cache
+"""
+import time
+
+import numpy as np
+
+from benchmarks.bench_ann import clustered_catalog
+from benchmarks.common import print_table, random_catalog
+from src.data_processing import similar_rows
+from src.lookup import RowLookup
+from src.result_cache import ResultCache, cached_similar_items
+from src.similarity import SimilarityIndex
+
+
+N_ITEMS = 100_000
+N_QUERIES = 5_000
+ZIPF = 1.1
+WEIGHTED_SHARE = 0.3
+PRESETS = [{'danceability': 2.0}, {'danceability': 4.0, 'energy': 2.0, 'acousticness': 2.0,
+                                   'instrumentalness': 2.0, 'liveness': 2.0, 'valence': 2.0,
+                                   'speechiness': 2.0, 'key': 2.0, 'mode': 2.0, 'tempo': 2.0,
+                                   'time_signature': 2.0},
+           {'tempo': 0.5, 'energy': 1.5}, {'tempo': 1.0, 'energy': 3.0, 'danceability': 2.0,
+                                           'acousticness': 2.0, 'instrumentalness': 2.0,
+                                           'liveness': 2.0, 'valence': 2.0, 'speechiness': 2.0,
+                                           'key': 2.0, 'mode': 2.0, 'time_signature': 2.0}]
+BUDGETS_MB = [0.1, 1.0, 64.0]
+
+
+def query_stream(names, seed=0):
+    """(name, weights) pairs, item popularity following a Zipf law"""
+    rng = np.random.default_rng(seed)
+    ranks = rng.zipf(ZIPF, size=N_QUERIES * 2)
+    ranks = ranks[ranks <= len(names)][:N_QUERIES] - 1
+    popular = rng.permutation(len(names))
+    weighted = rng.random(len(ranks)) < WEIGHTED_SHARE
+    presets = rng.integers(len(PRESETS), size=len(ranks))
+    return [(names[popular[rank]], PRESETS[preset] if weight else None)
+            for rank, weight, preset in zip(ranks, weighted, presets)]
+
+
+def main():
+    vectors = clustered_catalog(N_ITEMS)
+    _, items = random_catalog(N_ITEMS)
+    items['item_id'] = [f'id{row}' for row in range(N_ITEMS)]
+    index = SimilarityIndex(vectors)
+    lookup = RowLookup(items['name'])
+    queries = query_stream(items['name'].tolist())
+
+    start = time.perf_counter()
+    for name, weights in queries[:500]:
+        similar_rows(name, vectors, items, index=index, lookup=lookup, weights=weights)
+    uncached_ms = (time.perf_counter() - start) / 500 * 1e3
+
+    rows = [{'case': 'no cache', 'ms per query': uncached_ms}]
+    for budget in BUDGETS_MB:
+        cache = ResultCache(max_bytes=int(budget * 1e6))
+        start = time.perf_counter()
+        for name, weights in queries:
+            cached_similar_items(cache, 'v1', 'item', name, vectors, items, index=index, lookup=lookup,
+                                 weights=weights)
+        seconds = time.perf_counter() - start
+        stats = cache.stats()
+        rows.append({'case': f'cache of {budget:g} MB', 'ms per query': seconds / len(queries) * 1e3,
+                     'hit rate': stats['hits'] / (stats['hits'] + stats['misses']),
+                     'entries': stats['entries'], 'evictions': stats['evictions'],
+                     'MB held': stats['bytes'] / 1e6})
+
+    name, weights = queries[0]
+    start = time.perf_counter()
+    for _ in range(1000):
+        cached_similar_items(cache, 'v1', 'item', name, vectors, items, index=index, lookup=lookup,
+                             weights=weights)
+    rows.append({'case': 'cache hit', 'ms per query': (time.perf_counter() - start)})
+
+    # a new store version drops every entry
+    cached_similar_items(cache, 'v2', 'item', queries[0][0], vectors, items, index=index, lookup=lookup)
+    stats = cache.stats()
+    rows.append({'case': 'after a store version change', 'entries': stats['entries'],
+                 'invalidations': stats['invalidations']})
+
+    print(f'{N_ITEMS} items, {len(queries)} queries (Zipf {ZIPF}), {WEIGHTED_SHARE:.0%} weighted')
+    print_table(rows, ['case', 'ms per query', 'hit rate', 'entries', 'evictions', 'MB held', 'invalidations'])
+
+
+if __name__ == '__main__':
+    main()
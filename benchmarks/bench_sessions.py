@@ -0,0 +1,98 @@
+"""
+Resident memory of the app process at 1, 10 and 100 simulated sessions.
+
+Every session is a headless AppTest run of the data setup the pages used to
+do per session, kept alive so its session state stays in memory:
+'per-session copies' stores the load_df tables in st.session_state as
+home.py did (st.cache_data hands every session its own copy), 'shared
+catalog' only calls load_catalog (st.cache_resource, one object per process)
+and keeps a selection and weights in the session state.
+
+Each case runs in a fresh process, on the shipped catalog and on a
+synthetic one. Run from the repository root:
+    python -m benchmarks.bench_sessions
+"""
+import gc
+import logging
+import multiprocessing
+import os
+import shutil
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+from streamlit import logger as streamlit_logger
+
+from benchmarks.common import print_table, rss_mb
+from src.synthetic import SyntheticCatalog, write_feather
+
+
+SESSIONS = [1, 10, 100]
+SYNTHETIC_TRACKS = 200_000
+MODES = ['per-session copies', 'shared catalog']
+
+
+def session_script():
+    import os
+    import streamlit as st
+    from src.data_processing import load_catalog, load_df
+
+    data_dir = os.environ['BENCH_DATA_DIR']
+    if os.environ['BENCH_MODE'] == 'per-session copies':
+        if 'data_loaded' not in st.session_state:
+            for key, table in zip(['tracks', 'mapping', 'artists', 'audio_features'], load_df(data_dir)):
+                st.session_state[key] = table
+            st.session_state.data_loaded = True
+    else:
+        load_catalog(data_dir)
+    st.session_state.selected = 'artist'
+    st.session_state.weights = {'danceability': 2.0, 'energy': 1.5}
+
+
+def session_rss(mode, n_sessions, data_dir):
+    """RSS of a fresh process after running n_sessions sessions, and per extra session"""
+    from streamlit.testing.v1 import AppTest
+
+    streamlit_logger.set_log_level(logging.ERROR)
+    os.environ['BENCH_MODE'] = mode
+    os.environ['BENCH_DATA_DIR'] = data_dir
+
+    sessions = []
+    for _ in range(n_sessions):
+        app = AppTest.from_function(session_script, default_timeout=300)
+        app.run()
+        sessions.append(app)
+        if len(sessions) == 1:
+            gc.collect()
+            first = rss_mb()
+    gc.collect()
+    total = rss_mb()
+    return total, (total - first) / max(n_sessions - 1, 1)
+
+
+def main():
+    # Streamlit warns about the missing runtime on every cached call
+    streamlit_logger.set_log_level(logging.ERROR)
+
+    # a fresh process per case, so the RSS of one case does not carry into the next
+    context = multiprocessing.get_context('spawn')
+    work_dir = tempfile.mkdtemp(prefix='bench-sessions-')
+    try:
+        synthetic_dir = os.path.join(work_dir, f'synthetic-{SYNTHETIC_TRACKS}')
+        write_feather(SyntheticCatalog(SYNTHETIC_TRACKS), os.path.join(synthetic_dir, 'columnar'))
+
+        rows = []
+        for catalog, data_dir in [('data', 'data'), (str(SYNTHETIC_TRACKS), synthetic_dir)]:
+            for mode in MODES:
+                for n_sessions in SESSIONS:
+                    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+                        total, per_session = pool.submit(session_rss, mode, n_sessions, data_dir).result()
+                    rows.append({'catalog': catalog, 'mode': mode, 'sessions': n_sessions, 'RSS MB': total,
+                                 'MB per extra session': per_session if n_sessions > 1 else None})
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print_table(rows, ['catalog', 'mode', 'sessions', 'RSS MB', 'MB per extra session'])
+
+
+if __name__ == '__main__':
+    main()
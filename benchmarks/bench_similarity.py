@@ -0,0 +1,67 @@
+"""
+Latency and peak memory of one similarity query: the original full-matrix
+get_similar_artists against the top-k SimilarityIndex.
+
+Run from the repository root:
+    python -m benchmarks.bench_similarity
+"""
+import numpy as np
+from sklearn.metrics.pairwise import cosine_similarity
+
+from benchmarks.common import measure, print_table, random_catalog
+from src.data_processing import get_similar_artists
+from src.similarity import SimilarityIndex
+
+
+SIZES = [10_000, 100_000, 1_000_000]
+# the original function allocates an N x N float64 matrix, skip it above this size
+LEGACY_MAX_BYTES = 2e9
+
+
+def legacy_get_similar_artists(artist_name, vectors, artists_df, n=20):
+    """The original implementation: full cosine matrix, then a Python loop"""
+    artist_idx = artists_df[artists_df['name'] == artist_name].index[0]
+    similarity_matrix = cosine_similarity(vectors)
+    artist_similarities = similarity_matrix[artist_idx]
+    sorted_indices = np.argsort(-artist_similarities)
+    filtered_indices = []
+    seen_names = set()
+    for idx in sorted_indices:
+        name = artists_df.iloc[idx]['name']
+        if name != artist_name and name not in seen_names:
+            filtered_indices.append(idx)
+            seen_names.add(name)
+        if len(filtered_indices) >= n:
+            break
+    filtered_indices = np.array(filtered_indices[:n])
+    return vectors[filtered_indices], artists_df.iloc[filtered_indices], artist_similarities[filtered_indices]
+
+
+def main():
+    rows = []
+    for size in SIZES:
+        vectors, names = random_catalog(size)
+        query = names['name'].iloc[0]
+        index = SimilarityIndex(vectors)
+
+        legacy_bytes = size * size * 8
+        if legacy_bytes <= LEGACY_MAX_BYTES:
+            legacy = measure(legacy_get_similar_artists, query, vectors, names, repeat=1)
+        else:
+            legacy = {'seconds': None, 'peak_mb': None}
+        fast = measure(get_similar_artists, query, vectors, names, index=index)
+
+        rows.append({
+            'items': size,
+            'legacy s': legacy['seconds'],
+            'legacy peak MB': legacy['peak_mb'] if legacy['peak_mb'] is not None else f'>{legacy_bytes / 1e6:.0f} (skipped)',
+            'top-k s': fast['seconds'],
+            'top-k peak MB': fast['peak_mb'],
+            'index build s': measure(SimilarityIndex, vectors, repeat=1)['seconds'],
+        })
+
+    print_table(rows, ['items', 'legacy s', 'legacy peak MB', 'top-k s', 'top-k peak MB', 'index build s'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,64 @@
+"""
+Spotify round trips and latency of one song-page render (selected song plus
+three recommendation cards) against the local stub server: the original
+per-rerun token and per-track requests, against the shared pooled client.
+
+Run from the repository root:
+    python -m benchmarks.bench_spotify
+"""
+import base64
+import time
+
+import requests
+
+from benchmarks.common import print_table
+from benchmarks.spotify_stub import SpotifyStubServer
+from src.spotify_client import SpotifyClient
+
+
+RERUNS = 5
+DELAY = 0.02
+SELECTED = 'selected0000000000000'
+CARDS = ['card10000000000000000', 'card20000000000000000', 'card30000000000000000']
+
+
+def legacy_render(stub):
+    """What a rerun used to do: new token, then one unpooled GET per track"""
+    auth = base64.b64encode(b'id:secret').decode('utf-8')
+    token = requests.post(stub.auth_url, headers={'Authorization': 'Basic ' + auth},
+                          data={'grant_type': 'client_credentials'}).json()['access_token']
+    for track_id in [SELECTED] + CARDS:
+        requests.get(f'{stub.api_url}/tracks/{track_id}', headers={'Authorization': 'Bearer ' + token}).json()
+
+
+def client_render(client):
+    """Pooled client: cached token, selected song, then one request for the card row"""
+    client.get_tracks([SELECTED])
+    client.get_tracks(CARDS)
+
+
+def main():
+    rows = []
+    with SpotifyStubServer(delay=DELAY) as stub:
+        start = time.perf_counter()
+        for _ in range(RERUNS):
+            legacy_render(stub)
+        rows.append({'client': 'per-request (before)', 'requests': stub.count(),
+                     'token requests': stub.count('/api/token'),
+                     'ms per render': (time.perf_counter() - start) / RERUNS * 1e3})
+
+        stub.reset()
+        client = SpotifyClient('id', 'secret', api_url=stub.api_url, auth_url=stub.auth_url)
+        start = time.perf_counter()
+        for _ in range(RERUNS):
+            client_render(client)
+        rows.append({'client': 'pooled (after)', 'requests': stub.count(),
+                     'token requests': stub.count('/api/token'),
+                     'ms per render': (time.perf_counter() - start) / RERUNS * 1e3})
+
+    print(f'{RERUNS} song-page renders, {DELAY * 1e3:.0f} ms injected delay per API request')
+    print_table(rows, ['client', 'requests', 'token requests', 'ms per render'])
+
+
+if __name__ == '__main__':
+    main()
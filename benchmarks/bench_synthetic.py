@@ -0,0 +1,116 @@
+"""
+Fidelity and throughput of the synthetic catalog generator (src.synthetic).
+
+Fidelity compares a generated catalog with the shipped one: the largest
+Kolmogorov-Smirnov distance between the marginals of the audio features,
+the largest difference between their Spearman correlations, and the shares
+of duplicate names, missing audio features and featured artists.
+
+Throughput times writing Feather and CSV files at growing sizes. It also
+times reading them back with load_df and merge_artist_features, which is
+what the app does at startup, and records the process RSS after the load.
+Run from the repository root:
+    python -m benchmarks.bench_synthetic
+"""
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.common import print_table, rss_mb
+from src.data_processing import load_df, merge_artist_features
+from src.storage import read_clean_csvs, apply_dtypes
+from src.synthetic import CatalogModel, SyntheticCatalog, write_csv, write_feather
+
+
+FIDELITY_TRACKS = 200_000
+SIZES = [1_000_000, 5_000_000]
+CSV_SIZES = [1_000_000]
+FEATURES = ['danceability', 'energy', 'acousticness', 'instrumentalness', 'liveness', 'valence',
+            'speechiness', 'key', 'mode', 'tempo', 'time_signature']
+
+
+def ks_distance(a, b):
+    """Largest gap between the empirical CDFs of two samples"""
+    a, b = np.sort(a), np.sort(b)
+    grid = np.concatenate([a, b])
+    return float(np.abs(np.searchsorted(a, grid, side='right') / len(a)
+                        - np.searchsorted(b, grid, side='right') / len(b)).max())
+
+
+def catalog_stats(tracks, mapping, audio_features):
+    features = audio_features[FEATURES].astype(np.float64)
+    return {
+        'features': features,
+        'spearman': features.corr(method='spearman').to_numpy(),
+        'duplicate names': float(tracks['name'].duplicated(keep=False).mean()),
+        'missing features': float(1 - tracks['track_id'].isin(audio_features['track_id']).mean()),
+        'artists per track': len(mapping) / tracks['track_id'].nunique(),
+    }
+
+
+def fidelity_rows(model):
+    shipped = apply_dtypes(read_clean_csvs())
+    reference = catalog_stats(shipped['tracks'], shipped['mapping'], shipped['audio_features'])
+    rows = [{'catalog': 'shipped', **{key: value for key, value in reference.items()
+                                      if key not in ('features', 'spearman')}}]
+
+    for label, options in [('synthetic', {}), ('synthetic, 5% missing', {'missing_features': 0.05})]:
+        directory = tempfile.mkdtemp()
+        try:
+            write_feather(SyntheticCatalog(FIDELITY_TRACKS, model=model, **options), f'{directory}/columnar')
+            tracks, mapping, _, audio_features = load_df(directory)
+            stats = catalog_stats(tracks, mapping, audio_features)
+        finally:
+            shutil.rmtree(directory)
+        rows.append({
+            'catalog': label,
+            'max KS': max(ks_distance(reference['features'][f], stats['features'][f]) for f in FEATURES),
+            'max spearman diff': float(np.abs(reference['spearman'] - stats['spearman']).max()),
+            **{key: value for key, value in stats.items() if key not in ('features', 'spearman')},
+        })
+    return rows
+
+
+def scale_rows(model):
+    rows = []
+    for size in SIZES:
+        for file_format in ['feather', 'csv']:
+            if file_format == 'csv' and size not in CSV_SIZES:
+                continue
+            directory = tempfile.mkdtemp()
+            try:
+                catalog = SyntheticCatalog(size, model=model)
+                start = time.perf_counter()
+                if file_format == 'csv':
+                    write_csv(catalog, directory)
+                else:
+                    write_feather(catalog, f'{directory}/columnar')
+                write_s = time.perf_counter() - start
+
+                start = time.perf_counter()
+                tracks, mapping, artists, audio_features = load_df(directory)
+                load_s = time.perf_counter() - start
+                start = time.perf_counter()
+                merge_artist_features(tracks, mapping, artists)
+                merge_s = time.perf_counter() - start
+                rows.append({'tracks': size, 'format': file_format, 'write s': write_s, 'load_df s': load_s,
+                             'merge s': merge_s, 'RSS MB': rss_mb(), 'mapping rows': len(mapping)})
+                del tracks, mapping, artists, audio_features
+            finally:
+                shutil.rmtree(directory)
+    return rows
+
+
+def main():
+    model = CatalogModel()
+    print_table(fidelity_rows(model), ['catalog', 'max KS', 'max spearman diff', 'duplicate names',
+                                       'missing features', 'artists per track'])
+    print()
+    print_table(scale_rows(model), ['tracks', 'format', 'write s', 'load_df s', 'merge s', 'RSS MB',
+                                    'mapping rows'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+Cost of the song picker with and without the typeahead index (src.typeahead).
+
+Before, every rerun sorted the unique names and sent all of them to the
+browser in the selectbox. Now TypeaheadIndex is built once and every query
+ships at most MAX_OPTIONS names. Per catalog size, this reports:
+- the build time and size of the index
+- the latency and payload (the JSON of the options) of the old option list
+- the same for typical queries: short prefixes, a word inside the name, an
+  accent-folded query and no match
+
+Names are spelled from the words of the shipped song names, like
+src.synthetic. Every result is checked against a scan of the folded names.
+Run from the repository root:
+    python -m benchmarks.bench_typeahead
+"""
+import json
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.common import print_table
+from src.synthetic import CatalogModel, spell_names
+from src.typeahead import MAX_OPTIONS, NGRAM, TypeaheadIndex, fold
+
+
+SIZES = [10_000, 100_000, 1_000_000]
+REPEAT = 20
+
+
+def index_mb(index):
+    """Folded names, their two lists, the trigram dict and the arrays held by the index"""
+    folded = sum(sys.getsizeof(key) for key in index.folded)
+    lists = sys.getsizeof(index.folded) + sys.getsizeof(index.sorted_keys) + sys.getsizeof(index.gram_codes)
+    arrays = (index.postings.nbytes + index.indptr.nbytes + index.sorted_ids.nbytes + index.rank.nbytes
+              + index.ranking.nbytes)
+    return (folded + lists + arrays) / 1e6
+
+
+def expected(index, query):
+    """Matches of a scan over every folded name, ranked like search"""
+    key = fold(query).strip()
+    if len(key) >= NGRAM:
+        ids = [name_id for name_id, name in enumerate(index.folded) if key in name]
+    else:
+        ids = [name_id for name_id, name in enumerate(index.folded) if name.startswith(key)]
+    ids = np.asarray(ids, dtype=np.int64)
+    return index.names[ids[np.argsort(index.rank[ids])][:MAX_OPTIONS]].tolist()
+
+
+def timed(func):
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        result = func()
+    return result, (time.perf_counter() - start) / REPEAT * 1e3
+
+
+def main():
+    words = CatalogModel().track_words
+    rows = []
+    for size in SIZES:
+        names = pd.Series(spell_names(np.arange(size), words, size))
+        popularity = np.random.default_rng(0).integers(0, 101, size=size)
+
+        start = time.perf_counter()
+        index = TypeaheadIndex(names.unique(), popularity)
+        rows.append({'names': size, 'case': 'build index', 'ms': (time.perf_counter() - start) * 1e3,
+                     'MB': index_mb(index)})
+
+        options, ms = timed(lambda: sorted(names.unique()))
+        rows.append({'names': size, 'case': 'every name, sorted (before)', 'ms': ms, 'options': len(options),
+                     'payload KB': len(json.dumps(options)) / 1e3})
+
+        # a word inside popular names, and its first letters with accents and capitals
+        word = fold(index.search('', 1)[0].split()[-1])
+        queries = {'prefix, 1 letter': word[:1].upper(), 'prefix, 2 letters': word[:2],
+                   'substring, one word': word, 'accented, capitals': word.replace('e', 'é').upper(),
+                   'no match': 'zzqx'}
+        for label, query in queries.items():
+            options, ms = timed(lambda: index.search(query))
+            rows.append({'names': size, 'case': f'{label} {query!r}', 'ms': ms, 'options': len(options),
+                         'payload KB': len(json.dumps(options)) / 1e3,
+                         'matches scan': options == expected(index, query)})
+
+    print(f'at most {MAX_OPTIONS} options per query')
+    print_table(rows, ['names', 'case', 'ms', 'MB', 'options', 'payload KB', 'matches scan'])
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""
+Cost of a weighted search: weighing a per-session copy of the vectors and
+rebuilding an index over it (before) against folding the weights into the
+query of the shared index, with the weighted row norms computed once per
+weight vector (first call) and reused afterwards (cached).
+
+The copy column is the memory one session held for its weighted vectors.
+Run from the repository root:
+    python -m benchmarks.bench_weights
+"""
+import numpy as np
+
+from benchmarks.bench_ann import clustered_catalog
+from benchmarks.common import measure, print_table
+from src.data_processing import apply_feature_weights
+from src.similarity import SimilarityIndex
+from src.vector_store import FEATURES, open_vector_store
+
+
+SIZE = 1_000_000
+K = 20
+WEIGHTS = {'danceability': 3.0, 'tempo': 0.1, 'energy': 5.0}
+
+
+def weighted_copy_search(vectors, query_idx, weights):
+    weighted = apply_feature_weights(np.asarray(vectors), weights)
+    return SimilarityIndex(weighted).query(query_idx, k=K)
+
+
+def case_rows(catalog, vectors, index):
+    weights = np.array([WEIGHTS.get(feature, 1.0) for feature in FEATURES], dtype=np.float32)
+    query_idx = len(vectors) // 2
+
+    def first_call():
+        index._init_weighted_norms()
+        return index.query(query_idx, k=K, weights=weights)
+
+    index.query(query_idx, k=K, weights=weights)
+    cases = [
+        ('weighted copy + index (before)', lambda: weighted_copy_search(vectors, query_idx, WEIGHTS)),
+        ('weighted query, first call', first_call),
+        ('weighted query, cached norms', lambda: index.query(query_idx, k=K, weights=weights)),
+        ('unweighted query', lambda: index.query(query_idx, k=K)),
+    ]
+    copy_mb = np.asarray(vectors, dtype=np.float64).nbytes / 1e6
+    rows = []
+    for name, case in cases:
+        result = measure(case)
+        rows.append({'catalog': catalog, 'case': name, 'ms': result['seconds'] * 1e3,
+                     'peak MB': result['peak_mb'],
+                     'session copy MB': copy_mb if 'before' in name else 0.0})
+    return rows
+
+
+def main():
+    store = open_vector_store()
+    rows = []
+    for kind in ['track', 'artist']:
+        vectors = getattr(store, f'{kind}_vectors')
+        rows += case_rows(f'{kind}s {len(vectors)}', vectors, store.index(kind))
+
+    vectors = clustered_catalog(SIZE)
+    rows += case_rows(f'synthetic {SIZE}', vectors, SimilarityIndex(vectors))
+    print_table(rows, ['catalog', 'case', 'ms', 'peak MB', 'session copy MB'])
+
+
+if __name__ == '__main__':
+    main()
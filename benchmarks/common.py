@@ -0,0 +1,80 @@
+import gc
+import time
+import tracemalloc
+
+import numpy as np
+
+
+
+def measure(func, *args, repeat=3, **kwargs):
+    """
+    Time a call and record its peak traced memory.
+
+    Args:
+        func (callable): Function to benchmark
+        *args: Positional arguments for func
+        repeat (int): Number of timed runs, the median is reported (default 3)
+        **kwargs: Keyword arguments for func
+
+    Returns:
+        dict: {'seconds': median wall time, 'peak_mb': peak allocation during one call}
+    """
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        func(*args, **kwargs)
+        timings.append(time.perf_counter() - start)
+
+    # memory is traced in a separate run so tracing overhead stays out of the timings
+    gc.collect()
+    tracemalloc.start()
+    func(*args, **kwargs)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {'seconds': float(np.median(timings)), 'peak_mb': peak / 1e6}
+
+
+def print_table(rows, columns):
+    """Print a list of dicts as a fixed-width table"""
+    widths = [max(len(str(col)), *(len(format_cell(row.get(col))) for row in rows)) for col in columns]
+    print('  '.join(str(col).ljust(width) for col, width in zip(columns, widths)))
+    print('  '.join('-' * width for width in widths))
+    for row in rows:
+        print('  '.join(format_cell(row.get(col)).ljust(width) for col, width in zip(columns, widths)))
+
+
+def format_cell(value):
+    """Format a table cell, keeping floats short"""
+    if value is None:
+        return '-'
+    if isinstance(value, float):
+        return f'{value:.4g}'
+    return str(value)
+
+
+def random_catalog(n_items, n_features=11, seed=42):
+    """Random vectors and a matching names DataFrame for synthetic benchmarks"""
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    vectors = rng.random((n_items, n_features))
+    names = pd.DataFrame({'name': [f'item {i}' for i in range(n_items)]})
+    return vectors, names
+
+
+def rss_mb():
+    """Current resident set size of this process in MB (peak RSS where /proc is unavailable)"""
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) / 1e3
+    except OSError:
+        pass
+    import resource
+    import sys
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes on Linux
+    return maxrss / 1e6 if sys.platform == 'darwin' else maxrss / 1e3
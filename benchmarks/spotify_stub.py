@@ -0,0 +1,146 @@
+"""
+Local stand-in for the Spotify token endpoint and the track/artist endpoints.
+
+Answers with canned objects shaped like Spotify's, optionally after an injected
+delay, and records every request it receives so callers can count round trips:
+
+    with SpotifyStubServer(delay=0.05) as stub:
+        client = SpotifyClient('id', 'secret', api_url=stub.api_url, auth_url=stub.auth_url)
+        client.get_tracks(['a', 'b'])
+        stub.count('/v1/tracks')   # -> 1
+
+Setting SPOTIFY_API_URL / SPOTIFY_AUTH_URL to stub.api_url / stub.auth_url
+points the app's shared client at the stub.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+def fake_track(track_id):
+    """Track object with the fields the app reads"""
+    return {
+        'id': track_id,
+        'name': f'Song {track_id}',
+        'album': {'artists': [{'name': f'Artist of {track_id}'}],
+                  'images': [{'url': f'https://example.com/{track_id}.jpg'}]},
+        'external_urls': {'spotify': f'https://open.spotify.com/track/{track_id}'},
+    }
+
+
+def fake_artist(artist_id):
+    """Artist object with the fields the app reads"""
+    return {
+        'id': artist_id,
+        'name': f'Artist {artist_id}',
+        'popularity': 50,
+        'followers': {'total': 1000},
+        'images': [{'url': f'https://example.com/{artist_id}.jpg'}],
+        'external_urls': {'spotify': f'https://open.spotify.com/artist/{artist_id}'},
+    }
+
+
+class SpotifyStubServer:
+    """
+    Threaded HTTP server on localhost answering like the Spotify Web API.
+
+    Args:
+        delay (float): Seconds to wait before answering each API request (default 0)
+        expires_in (int): Lifetime of the issued tokens in seconds (default 3600)
+        unknown_ids (iterable): Ids answered with null by the multi-id endpoints,
+            like ids Spotify does not know (default none)
+        failing_ids (iterable): Requests for any of these ids are answered with
+            503, like a Spotify outage (default none)
+    """
+
+    def __init__(self, delay=0.0, expires_in=3600, unknown_ids=(), failing_ids=()):
+        self.delay = delay
+        self.expires_in = expires_in
+        self.unknown_ids = set(unknown_ids)
+        self.failing_ids = set(failing_ids)
+        self.requests = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+        host, port = self._server.server_address
+        self.api_url = f'http://{host}:{port}/v1'
+        self.auth_url = f'http://{host}:{port}/api/token'
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def record(self, method, path):
+        with self._lock:
+            self.requests.append((method, path))
+
+    def count(self, path_prefix=''):
+        """Number of requests received whose path starts with `path_prefix`"""
+        with self._lock:
+            return sum(1 for _, path in self.requests if path.startswith(path_prefix))
+
+    def reset(self):
+        with self._lock:
+            self.requests.clear()
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # headers and body go out in separate writes, don't let Nagle hold the body back
+            disable_nagle_algorithm = True
+
+            def log_message(self, format, *args):
+                pass
+
+            def send_json(self, payload, status=200):
+                body = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_POST(self):
+                url = urlparse(self.path)
+                stub.record('POST', url.path)
+                self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                if url.path != '/api/token':
+                    return self.send_json({'error': 'not found'}, 404)
+                self.send_json({'access_token': 'stub-token', 'token_type': 'Bearer',
+                                'expires_in': stub.expires_in})
+
+            def do_GET(self):
+                url = urlparse(self.path)
+                stub.record('GET', url.path)
+                if stub.delay:
+                    time.sleep(stub.delay)
+                if self.headers.get('Authorization') != 'Bearer stub-token':
+                    return self.send_json({'error': 'unauthorized'}, 401)
+
+                parts = url.path.strip('/').split('/')
+                ids = parse_qs(url.query).get('ids', [''])[0].split(',')
+                if stub.failing_ids.intersection(ids + parts[2:]):
+                    return self.send_json({'error': 'service unavailable'}, 503)
+                if parts == ['v1', 'tracks']:
+                    return self.send_json({'tracks': [None if i in stub.unknown_ids else fake_track(i)
+                                                      for i in ids]})
+                if parts == ['v1', 'artists']:
+                    return self.send_json({'artists': [None if i in stub.unknown_ids else fake_artist(i)
+                                                       for i in ids]})
+                if len(parts) == 3 and parts[:2] == ['v1', 'tracks']:
+                    return self.send_json(fake_track(parts[2]))
+                if len(parts) == 3 and parts[:2] == ['v1', 'artists']:
+                    return self.send_json(fake_artist(parts[2]))
+                self.send_json({'error': 'not found'}, 404)
+
+        return Handler
@@ -0,0 +1,254 @@
+"""
+Benchmark suite of the recommendation pipeline, headless and offline.
+
+Every stage the pages run is timed and its peak traced memory recorded, on
+the shipped catalog and on synthetic catalogs of growing size (src.synthetic):
+load_df, merge_artist_features, get_artist_features,
+vectorize_artist_features, apply_feature_weights, get_similar_artists (with
+and without a prebuilt index, on artists and on tracks), the artist means
+and create_radar_chart_new of the comparison chart, and
+visualize_artist_space of one recommendation.
+Nothing starts a Streamlit server or opens a network connection.
+
+Results are written as JSON with the environment they were measured in. Given
+a baseline file from an earlier run, every stage is compared with it, and
+the run exits with status 1 when a stage got slower or needs more memory
+beyond the tolerance. Run from the repository root:
+    python -m benchmarks.suite [--sizes data 10000 100000 1000000] [--out FILE] [--baseline FILE]
+"""
+import argparse
+import gc
+import json
+import logging
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+from streamlit import logger as streamlit_logger
+
+from benchmarks.common import print_table, rss_mb
+from src.data_processing import (apply_feature_weights,
+                                 data_to_radar_chart,
+                                 get_artist_features,
+                                 get_similar_artists,
+                                 load_df,
+                                 merge_artist_features,
+                                 process_artist_data,
+                                 vectorize_artist_features,
+                                 )
+from src.lookup import RowLookup
+from src.similarity import SimilarityIndex
+from src.synthetic import CatalogModel, SyntheticCatalog, write_feather
+from src.visualization import create_radar_chart_new, visualize_artist_space
+
+
+DEFAULT_SIZES = ['data', '10000', '100000', '1000000']
+DEFAULT_OUT = 'benchmarks/results/latest.json'
+WEIGHTS = {'danceability': 2.0, 'energy': 1.5, 'tempo': 0.5}
+# a stage regresses when it is this much slower or bigger than the baseline...
+TOLERANCE = 0.25
+# ...and the difference is above the noise floor
+MIN_SECONDS = 0.01
+MIN_MB = 1.0
+
+
+def run_stage(func, *args, repeat=3, **kwargs):
+    """
+    Time a call and record its peak traced memory, returning its result.
+
+    Args:
+        func (callable): Stage to run
+        *args: Positional arguments for func
+        repeat (int): Timed runs, the median is reported (default 3)
+        **kwargs: Keyword arguments for func
+
+    Returns:
+        tuple: (result of the last call, {'seconds', 'peak_mb', 'rss_mb'})
+    """
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        func(*args, **kwargs)
+        timings.append(time.perf_counter() - start)
+
+    # memory is traced in a separate run so tracing overhead stays out of the timings
+    gc.collect()
+    tracemalloc.start()
+    result = func(*args, **kwargs)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, {'seconds': float(np.median(timings)), 'peak_mb': peak / 1e6, 'rss_mb': rss_mb()}
+
+
+def catalog_dirs(sizes, work_dir):
+    """Data directory of every catalog: data/ itself, or a generated synthetic catalog"""
+    model = None
+    for size in sizes:
+        if size == 'data':
+            yield size, 'data'
+            continue
+        if model is None:
+            model = CatalogModel()
+        directory = os.path.join(work_dir, f'synthetic-{size}')
+        write_feather(SyntheticCatalog(int(size), model=model), os.path.join(directory, 'columnar'))
+        yield size, directory
+
+
+def pipeline(catalog, data_dir):
+    """Run every stage on one catalog, returning one result row per stage"""
+    tracks_df, mapping, artists, audio_features = load_df(data_dir)
+    repeat = 1 if len(tracks_df) >= 1_000_000 else 5
+    info = {'catalog': catalog, 'tracks': len(tracks_df), 'artists': len(artists)}
+
+    def stage(name, func, *args, **kwargs):
+        result, metrics = run_stage(func, *args, repeat=repeat, **kwargs)
+        rows.append({**info, 'stage': name, **metrics})
+        return result
+
+    rows = []
+    stage('load_df', load_df, data_dir)
+    artist_track_ = stage('merge_artist_features', merge_artist_features, tracks_df, mapping, artists)
+    table_artists = stage('get_artist_features', get_artist_features, artists, artist_track_, audio_features)
+    vectors, artists_cleaned = stage('vectorize_artist_features', vectorize_artist_features, table_artists)
+    stage('apply_feature_weights', apply_feature_weights, vectors, WEIGHTS)
+
+    # a row from the middle of the table, the same one in every run
+    query = artists_cleaned['name'].iloc[len(artists_cleaned) // 2]
+    lookup = RowLookup(artists_cleaned['name'])
+    stage('get_similar_artists', get_similar_artists, query, vectors, artists_cleaned)
+    index = SimilarityIndex(vectors)
+    similar = stage('get_similar_artists (prebuilt index)', get_similar_artists, query, vectors,
+                    artists_cleaned, index=index, lookup=lookup)
+    stage('get_similar_artists (weighted)', get_similar_artists, query, vectors, artists_cleaned,
+          index=index, lookup=lookup, weights=WEIGHTS)
+
+    tracks_features = pd.merge(tracks_df, audio_features, on='track_id', how='inner')
+    track_vectors, tracks_cleaned = vectorize_artist_features(tracks_features)
+    song = tracks_cleaned['name'].iloc[len(tracks_cleaned) // 2]
+    stage('get_similar_artists (tracks)', get_similar_artists, song, track_vectors, tracks_cleaned,
+          index=SimilarityIndex(track_vectors), lookup=RowLookup(tracks_cleaned['name']))
+
+    similar_vectors, similar_items, scores = similar
+    plotted = artists_cleaned.iloc[[lookup.first(query)]]
+    stage('visualize_artist_space', visualize_artist_space,
+          np.vstack([vectors[lookup.first(query)], similar_vectors]),
+          pd.concat([plotted, similar_items]), np.concatenate([[1.0], scores]))
+
+    second = similar_items['name'].iloc[0]
+    radar_table = stage('process_artist_data', lambda: data_to_radar_chart(
+        process_artist_data(query, artist_track_, audio_features),
+        process_artist_data(second, artist_track_, audio_features)))
+    stage('create_radar_chart_new', create_radar_chart_new, radar_table)
+    return rows
+
+
+def environment():
+    """Where the results were measured: commit, versions and machine"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'commit': commit,
+        'python': sys.version.split()[0],
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def compare(results, baseline, tolerance=TOLERANCE, min_seconds=MIN_SECONDS, min_mb=MIN_MB):
+    """
+    Compare every stage with the same stage and catalog of a baseline run.
+
+    Args:
+        results (list): Result rows of this run
+        baseline (list): Result rows of the baseline run
+        tolerance (float): Relative increase tolerated (default TOLERANCE)
+        min_seconds (float): Time differences below this are noise (default MIN_SECONDS)
+        min_mb (float): Memory differences below this are noise (default MIN_MB)
+
+    Returns:
+        list: One row per stage with both values, their ratio and a status of
+        'ok', 'slower', 'more memory', 'faster' or 'new'
+    """
+    before = {(row['catalog'], row['stage']): row for row in baseline}
+    rows = []
+    for row in results:
+        old = before.get((row['catalog'], row['stage']))
+        compared = {'catalog': row['catalog'], 'stage': row['stage'], 'seconds': row['seconds'],
+                    'peak_mb': row['peak_mb']}
+        if old is None:
+            rows.append({**compared, 'status': 'new'})
+            continue
+
+        slower = (row['seconds'] > old['seconds'] * (1 + tolerance)
+                  and row['seconds'] - old['seconds'] > min_seconds)
+        bigger = (row['peak_mb'] > old['peak_mb'] * (1 + tolerance)
+                  and row['peak_mb'] - old['peak_mb'] > min_mb)
+        faster = (row['seconds'] < old['seconds'] / (1 + tolerance)
+                  and old['seconds'] - row['seconds'] > min_seconds)
+        status = 'slower' if slower else 'more memory' if bigger else 'faster' if faster else 'ok'
+        rows.append({**compared, 'baseline seconds': old['seconds'], 'baseline peak_mb': old['peak_mb'],
+                     'time ratio': row['seconds'] / old['seconds'] if old['seconds'] else None,
+                     'status': status})
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Time the recommendation pipeline and compare with a baseline')
+    parser.add_argument('--sizes', nargs='+', default=DEFAULT_SIZES,
+                        help="catalogs: 'data' for the shipped files, or a number of synthetic tracks")
+    parser.add_argument('--out', default=DEFAULT_OUT, help='JSON file the results are written to')
+    parser.add_argument('--baseline', default=None, help='results of an earlier run to compare with')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE,
+                        help='relative slowdown or memory growth tolerated (default 0.25)')
+    args = parser.parse_args(argv)
+
+    # Streamlit warns about the missing runtime on every cached call
+    streamlit_logger.set_log_level(logging.ERROR)
+
+    results = []
+    work_dir = tempfile.mkdtemp(prefix='benchmark-suite-')
+    try:
+        for catalog, data_dir in catalog_dirs(args.sizes, work_dir):
+            results += pipeline(catalog, data_dir)
+            if data_dir != 'data':
+                shutil.rmtree(data_dir)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print_table(results, ['catalog', 'tracks', 'artists', 'stage', 'seconds', 'peak_mb', 'rss_mb'])
+
+    os.makedirs(os.path.dirname(args.out) or '.', exist_ok=True)
+    with open(args.out, 'w') as f:
+        json.dump({'environment': environment(), 'results': results}, f, indent=2)
+    print(f"\nresults written to {args.out}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        comparison = compare(results, baseline['results'], tolerance=args.tolerance)
+        print(f"\ncompared with {args.baseline} (commit {baseline['environment'].get('commit')}):")
+        print_table(comparison, ['catalog', 'stage', 'baseline seconds', 'seconds', 'time ratio',
+                                 'baseline peak_mb', 'peak_mb', 'status'])
+        regressions = [row for row in comparison if row['status'] in ('slower', 'more memory')]
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) beyond {args.tolerance:.0%}")
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,6 +1,6 @@
 # importing necessary libraries
 import streamlit as st
-from src.data_processing import (load_df, 
+from src.data_processing import (load_catalog, 
                                 
                                 )
 
@@ -107,15 +107,8 @@ with st.container():
                 st.link_button(label=name, url=contact_info)
                 st.write("")
 
-#Initializing the variables from load_and_cache
-if "data_loaded" not in st.session_state:  
-    variables = load_df()  # Call the function once
-    keys = ['tracks',"mapping", "artists",  "audio_features"]
-    
-    # Store all variables in session state dynamically
-    for key, value in zip(keys, variables):
-        st.session_state[key] = value
-    
-    st.session_state.data_loaded = True  # Flag to avoid reloading
+# loading the catalog once per process; sessions share it instead of copying it
+# into their session state (they keep only their selection and weights)
+load_catalog()
 
 
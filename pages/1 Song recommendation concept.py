@@ -6,29 +6,40 @@ import matplotlib.pyplot as plt
 from src.data_processing import (data_to_radar_chart, 
                                  process_songs, 
                                     reset_weights_callback,
-                                 vectorize_artist_features, 
-                                 apply_feature_weights, 
-                                 get_similar_artists,
+                                    selected_weights,
                                    )
 
 from src.visualization import create_radar_chart_new, visualize_artist_space
+from src.projection import layout_coords, weight_vector
+
+from src.vector_store import open_vector_store, load_index, load_item_frame, load_item_lookups
+from src.knn_graph import load_knn_graph
+from src.result_cache import cached_similar_items, load_result_cache
+from src.filters import load_filter_index
+from src.typeahead import load_typeahead, picker
+from src.tracing import start_trace, finish_trace, traced_fragment
 
 from src.spotify_widget import (
-                                fetch_and_parse_spotify_songs,
-                                get_token
+                                fetch_spotify_metadata,
                                 )
 
 
 
-# bring the necessary data
-tracks = st.session_state.tracks
-audio_features = st.session_state.audio_features
-tracks_features = pd.merge(tracks, audio_features, on='track_id', how='inner')
+# timing spans of this rerun (APP_TRACE=1), shown in the sidebar at the end
+trace = start_trace('Song recommendation')
+# a fragment rerunning on its own gets a trace of its own
+fragment_trace = traced_fragment('Song recommendation')
+
+# bring the necessary data (vectors and track rows come from the prebuilt vector store)
+store = open_vector_store()
+tracks_features = load_item_frame('track')
+# name / track_id -> row lookups, built once per process
+track_lookups = load_item_lookups('track')
 
 # loading Spotify credentials (for API) from .env file
 client_id = st.secrets["spotify"]["client_id"]
 client_secret = st.secrets["spotify"]["client_secret"]
-token = get_token(client_id, client_secret)
+# the shared client requests a token only when a cache miss needs the API
 
 # Initialize variables for visualization
 similar_vectors = None
@@ -41,10 +52,20 @@ features = ['danceability', 'energy', 'acousticness', 'instrumentalness',
 weight_values = [0.1, 0.5, 1, 1.5, 2.0, 3.0, 5.0]
 weights = {}
 
-# processing the data
+# processing the data: memory-mapped vectors, aligned row by row with tracks_features
 
-vectors, songs_cleaned = vectorize_artist_features(tracks_features)
-st.session_state.original_vectors = vectors.copy()
+vectors = store.track_vectors
+songs_cleaned = tracks_features
+# one index per process; weights are applied per query, not to a copy of the vectors
+track_index = load_index('track')
+# precomputed neighbours (python -m src.knn_graph), None until built
+track_graph = load_knn_graph('track')
+# recent results of every session, dropped when the store version changes
+result_cache = load_result_cache()
+# release year, explicit flag, album type and popularity masks over the track rows
+track_filters = load_filter_index('track')
+# prefix and substring index over the song names, ranked by popularity
+song_names = load_typeahead('track')
 
 
 
@@ -52,18 +73,40 @@ st.session_state.original_vectors = vectors.copy()
 #SIDEBAR: artist selection
 
 
+@st.fragment
+@fragment_trace
+def song_picker(selected_song):
+    """Song search; typing reruns only the picker, picking a song the whole page"""
+    if picker(song_names, "Search for a song", "Type song name...", 'song_pick') != selected_song:
+        st.rerun()
+
+
+# song picked in the last run of the picker (None before the first pick)
+selected_song = st.session_state.get('song_pick')
+
 with st.sidebar:
 
 # First container: Feature weights
     
 
-        song_list = sorted(tracks_features['name'].unique())
-        selected_song = st.selectbox(
-            "Search for a song",
-            options=song_list,
-            index=None,
-            placeholder="Type song name..."
-        )
+        song_picker(selected_song)
+
+        # filters are applied inside the similarity scan, unset ones are left out
+        with st.expander("Filters"):
+            first_year, last_year = track_filters.year_range()
+            year_range = st.slider("Release year", first_year, last_year, (first_year, last_year))
+            clean_only = st.checkbox("Hide explicit songs")
+            album_type_names = sorted(track_filters.album_types)
+            album_types = st.multiselect("Album type", album_type_names, default=album_type_names)
+            min_popularity = st.slider("Minimum artist popularity", 0, 100, 0)
+        filters = {'min_popularity': min_popularity}
+        if year_range != (first_year, last_year):
+            filters.update(year_min=year_range[0], year_max=year_range[1])
+        if clean_only:
+            filters['explicit'] = False
+        if len(album_types) < len(album_type_names):
+            filters['album_types'] = album_types
+        row_filter = track_filters.row_filter(filters)
 with st.container(border=True):
         st.markdown('### :rainbow[Song recommendations]')
         
@@ -82,12 +125,20 @@ with st.container(border=True):
                         * Explore visualizations below  
                             """)              
 
-# Main page layout, two columns
-main_col1, main_col2 = st.columns([1, 1])
+# The sections below are fragments: a widget inside one reruns only that
+# fragment. The whole page reruns when the selection or the weights used by
+# the recommendations change.
 
+# weights of this rerun's recommendations: the sliders in live mode, else the
+# applied ones (widget values are in the session state before the sliders are drawn)
+live = st.session_state.get('song_live', False)
+applied_weights = selected_weights(features) if live else st.session_state.get('song_weights')
 
-# First main column: Feature weights
-with main_col1:
+
+@st.fragment
+@fragment_trace
+def weight_controls(applied_weights):
+    """Weight sliders; the page reruns only once the recommendations use other weights"""
     with st.container():
     # Add Reset button next to title
         col1, col2 = st.columns([3, 1])
@@ -129,13 +180,133 @@ with main_col1:
         # Store weights in session state
         st.session_state.weights = weights       
         
+        # live mode re-ranks on every slider change from the selected item's
+        # cached per-feature contributions, without the Apply Weights step
+        live = st.toggle("Update recommendations as the weights change", value=False, key='song_live')
+
         # Apply weights button
-        if weights:
+        if weights and not live:
             if st.button("Apply Weights", use_container_width=True):
-                vectors_weighted = apply_feature_weights(vectors, weights)
-                st.session_state.vectors = vectors_weighted
-                st.session_state.song_vectors = vectors_weighted
+                # searches weigh the query; the layout of the plot is cached per weight vector
+                st.session_state.song_weights = dict(weights)
+
+        # a slider move outside live mode stays in this fragment
+        if (dict(weights) if live else st.session_state.get('song_weights')) != applied_weights:
+            st.rerun()
+
+
+@st.fragment
+@fragment_trace
+def selection_header(song_id, selected_song, songs_fetch):
+    """Name, link and cover of the selected song"""
+    if song_id not in songs_fetch.index:
+        # Spotify details could not be fetched, the catalog name stands in
+        st.markdown(f'#### :rainbow[Selected song: {selected_song}]')
+        st.caption("Spotify details are unavailable right now")
+        st.write("")
+        return
+    test_fetch = songs_fetch.loc[song_id]
+    song_name = test_fetch['song_name']
+   # Create two columns for title and button
+    title_col, button_col = st.columns([2, 1])
+    with title_col:
+        st.markdown(f'#### :rainbow[Selected song: {song_name}]')
+    with button_col:
+        st.link_button('Go to Spotify profile', 
+                    test_fetch['spotify_url'], 
+                    use_container_width=True)
+    
+    # Image below the columns
+    if pd.notna(test_fetch['cover_image']):
+        st.image(test_fetch['cover_image'], use_container_width=True)
+    st.write("")
+
+
+@st.fragment
+@fragment_trace
+def recommendation_cards(scores, card_ids, card_names, songs_fetch):
+    """The three most similar songs"""
+    # Create three columns for recommendations
+    
+    rec_cols = st.columns(3, gap="small")
+    
+     # Only loop through top 3 artists for display
+    for idx in range(3):
+        with rec_cols[idx]:
+            score = scores[idx+1]
+            if card_ids[idx] not in songs_fetch.index:
+                # placeholder card when Spotify details could not be fetched
+                st.markdown(f"**{card_names[idx]}**<br>Spotify details unavailable", unsafe_allow_html=True)
+                st.metric("Similarity Score", f"{score:.4f}")
+                continue
+            # cards render from the metadata gathered above
+            test_fetch = songs_fetch.loc[card_ids[idx]]
+            # Display artist information
+            
+            if pd.notna(test_fetch['cover_image']):
+                st.image(test_fetch['cover_image'], use_container_width=True, width=150)
+            st.markdown(f"**{test_fetch['song_name']}**<br>{test_fetch['artist_name']}", unsafe_allow_html=True)
+            col1, col2 = st.columns(2)
+            with col1:
+                st.link_button('Listen on Spotify', test_fetch['spotify_url'])
+            with col2:
+                st.metric("Similarity Score", f"{score:.4f}")
             
+            st.write("") 
+
+
+@st.fragment
+@fragment_trace
+def projection_plot(similar_vectors, similar_songs, scores, applied_weights, live):
+    """t-SNE plot of the recommendations; the refine toggle reruns only this fragment"""
+    refine = st.toggle("Refine the layout around this selection", value=False)
+    # rows of the precomputed global layout; weighted vectors are refined locally,
+    # live weights only on request since they change with every slider move
+    plot_weights = applied_weights if refine or not live else None
+    coords = layout_coords(store.version, 'track', tuple(similar_songs.index.tolist()),
+                           weights=weight_vector(plot_weights, features) if plot_weights else None,
+                           refine=refine)
+    fig = visualize_artist_space(similar_vectors, similar_songs, scores, item_type='song', coords=coords)
+    st.plotly_chart(fig,  use_container_width=True)
+
+
+@st.fragment
+@fragment_trace
+def radar_chart(selected_song, top1_song):
+    """Audio features of the selected song against its top match"""
+    song1 = process_songs(selected_song, tracks_features, lookup=track_lookups['name'])
+    song2 = process_songs(top1_song, tracks_features, lookup=track_lookups['name'])
+    data_radar = data_to_radar_chart(song1, song2)
+    fig = create_radar_chart_new(data_radar)
+    st.plotly_chart(fig, use_container_width=True)
+
+
+# Main page layout, two columns
+main_col1, main_col2 = st.columns([1, 1])
+
+
+# First main column: Feature weights
+with main_col1:
+    weight_controls(applied_weights)
+            
+
+# Find recommendations before rendering, so the Spotify metadata of the selected
+# song and of every card is fetched in one concurrent round
+result = None
+if selected_song is not None:
+    song_row = track_lookups['name'].first(selected_song)
+    song_id = tracks_features['track_id'].iloc[song_row]
+
+    result = cached_similar_items(result_cache, store.version, 'track', selected_song, vectors, songs_cleaned,
+                                  index=track_index, lookup=track_lookups['name'], weights=applied_weights,
+                                  live=live, graph=track_graph, row_filter=row_filter)
+    if not isinstance(result, str) and len(result[2]) < 4:
+        result = "Too few songs pass the filters, try broader ones"
+
+    # the recommended rows carry their own track_id, no name search needed
+    card_ids = [] if isinstance(result, str) else list(result[1]['track_id'].iloc[1:4])
+    card_names = [] if isinstance(result, str) else list(result[1]['name'].iloc[1:4])
+    songs_fetch, _ = fetch_spotify_metadata(client_id, client_secret, track_ids=[song_id] + card_ids)
 
 # Second main col: Artist selection
 with main_col2:      
@@ -144,31 +315,15 @@ with main_col2:
     if selected_song is None:
         st.write("Please select a song")
     else:
-        song_match = tracks_features[tracks_features['name'] == selected_song]   
-        song_id = song_match['track_id'].values[0]
-        test_fetch = fetch_and_parse_spotify_songs(song_id, token, client_id, client_secret)
-        song_name = test_fetch['song_name'].iloc[0]
-       # Create two columns for title and button
-        title_col, button_col = st.columns([2, 1])
-        with title_col:
-            st.markdown(f'#### :rainbow[Selected song: {song_name}]')
-        with button_col:
-            st.link_button('Go to Spotify profile', 
-                        test_fetch['spotify_url'].iloc[0], 
-                        use_container_width=True)
-        
-        # Image below the columns
-        st.image(test_fetch['cover_image'].iloc[0], use_container_width=True)
-        st.write("")
+        selection_header(song_id, selected_song, songs_fetch)
 
 st.markdown("---")
 
 # Recommendations container
+top1_song = None
 with st.container():
     st.markdown('#### :rainbow[Similar songs]')
     if selected_song is not None:
-        vectors_to_use = st.session_state.get('song_vectors', vectors)
-        result = get_similar_artists(selected_song, vectors_to_use, songs_cleaned)
         
         if isinstance(result, str):
             st.error(result)
@@ -179,30 +334,7 @@ with st.container():
             similar_vectors, similar_songs, scores = result
             #store top1 similar song for radar chart
             top1_song = similar_songs.iloc[1]['name']
-
-            # Create three columns for recommendations
-            
-            rec_cols = st.columns(3, gap="small")
-            
-             # Only loop through top 3 artists for display
-            for idx in range(3):
-                with rec_cols[idx]:
-                    artist = similar_songs.iloc[idx+1]['name']
-                    score = scores[idx+1]
-                    song_match = tracks_features[tracks_features['name'] == artist]   
-                    track_id = song_match['track_id'].values[0]
-                    test_fetch = fetch_and_parse_spotify_songs(track_id, token, client_id, client_secret)
-                    # Display artist information
-                    
-                    st.image(test_fetch['cover_image'].values[0], use_container_width=True, width=150)
-                    st.markdown(f"**{test_fetch['song_name'].values[0]}**<br>{test_fetch['artist_name'].values[0]}", unsafe_allow_html=True)
-                    col1, col2 = st.columns(2)
-                    with col1:
-                        st.link_button('Listen on Spotify', test_fetch['spotify_url'].values[0])
-                    with col2:
-                        st.metric("Similarity Score", f"{score:.4f}")
-                    
-                    st.write("") 
+            recommendation_cards(scores, card_ids, card_names, songs_fetch)
 
 st.markdown("---")
 st.markdown("""
@@ -217,8 +349,7 @@ with st.container():
                 """)
     
     if similar_vectors is not None:
-        fig = visualize_artist_space(similar_vectors, similar_songs, scores,item_type='song')
-        st.plotly_chart(fig,  use_container_width=True)
+        projection_plot(similar_vectors, similar_songs, scores, applied_weights, live)
 st.markdown("---")
 st.markdown("""
             """)
@@ -239,8 +370,6 @@ with st.container():
     if selected_song == None or top1_song == None:
         st.write("Please select an artist")
     else:
-        song1 = process_songs(selected_song, tracks_features)
-        song2 = process_songs(top1_song, tracks_features)
-        data_radar = data_to_radar_chart(song1, song2)
-        fig = create_radar_chart_new(data_radar)
-        st.plotly_chart(fig, use_container_width=True)
\ No newline at end of file
+        radar_chart(selected_song, top1_song)
+
+finish_trace(trace)
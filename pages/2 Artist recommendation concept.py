@@ -5,38 +5,49 @@ import pandas as pd
 
 from src.data_processing import (data_to_radar_chart, 
                                  process_artist_data, 
-                                 get_artist_features, 
-                                 vectorize_artist_features, 
-                                 apply_feature_weights, 
                                  reset_weights_callback, 
-                                 get_similar_artists,
-                                    merge_artist_features,
+                                 selected_weights,
+                                    load_artist_tracks,
+                                    load_artist_aggregates,
+                                    load_catalog,
                                   
                                     )
 
 from src.visualization import (create_radar_chart_new, 
                                visualize_artist_space
 )
+from src.projection import layout_coords, weight_vector
 
-from src.spotify_widget import (fetch_and_parse_spotify_artist_data, 
-                                get_token                                
+from src.vector_store import open_vector_store, load_index, load_item_frame, load_item_lookups
+from src.knn_graph import load_knn_graph
+from src.result_cache import cached_similar_items, load_result_cache
+from src.filters import load_filter_index
+from src.typeahead import load_typeahead, picker
+from src.tracing import start_trace, finish_trace, traced_fragment
+
+from src.spotify_widget import (fetch_spotify_metadata,
                                 )
 
 
 
-# bring the necessary data
-tracks = st.session_state.tracks
-mapping = st.session_state.mapping
-artists = st.session_state.artists
-audio_features = st.session_state.audio_features
+# timing spans of this rerun (APP_TRACE=1), shown in the sidebar at the end
+trace = start_trace('Artist recommendation')
+# a fragment rerunning on its own gets a trace of its own
+fragment_trace = traced_fragment('Artist recommendation')
+
+# bring the necessary data: one read-only catalog shared by every session
+tracks, mapping, artists, audio_features = load_catalog()
 
-artist_track_ = merge_artist_features(tracks, mapping, artists)
+# merged artist/track table and its artist name lookup, built once per process
+artist_track_, artist_track_lookup = load_artist_tracks()
+# mean audio features of every artist, for the radar chart
+artist_aggregates = load_artist_aggregates()
 
 # loading Spotify credentials (for API) from .env file
 
 client_id = st.secrets["spotify"]["client_id"]
 client_secret = st.secrets["spotify"]["client_secret"]
-token = get_token(client_id, client_secret)
+# the shared client requests a token only when a cache miss needs the API
 
 # Initialize variables for visualization
 similar_vectors = None
@@ -51,12 +62,21 @@ features = ['danceability', 'energy', 'acousticness', 'instrumentalness',
 weight_values = [0.1, 0.5, 1, 1.5, 2.0, 3.0, 5.0]
 weights = {}
 
-# processing the data
-table = get_artist_features(artists, artist_track_, audio_features)
-
-vectors, artists_cleaned = vectorize_artist_features(table)
-# Store original vectors for reset
-st.session_state.original_vectors = vectors.copy()
+# processing the data: memory-mapped vectors from the prebuilt vector store
+store = open_vector_store()
+vectors = store.artist_vectors
+artists_cleaned = load_item_frame('artist')
+artist_lookups = load_item_lookups('artist')
+# one index per process; weights are applied per query, not to a copy of the vectors
+artist_index = load_index('artist')
+# precomputed neighbours (python -m src.knn_graph), None until built
+artist_graph = load_knn_graph('artist')
+# recent results of every session, dropped when the store version changes
+result_cache = load_result_cache()
+# popularity mask over the artist rows
+artist_filters = load_filter_index('artist')
+# prefix and substring index over the artist names, ranked by popularity
+artist_names = load_typeahead('artist')
 
 
 
@@ -64,14 +84,24 @@ st.session_state.original_vectors = vectors.copy()
 #SIDEBAR: artist selection
 
 
+@st.fragment
+@fragment_trace
+def artist_picker(selected_artist):
+    """Artist search; typing reruns only the picker, picking an artist the whole page"""
+    if picker(artist_names, "Search for an artist", "Type artist name...", 'artist_pick') != selected_artist:
+        st.rerun()
+
+
+# artist picked in the last run of the picker (None before the first pick)
+selected_artist = st.session_state.get('artist_pick')
+
 with st.sidebar:
-    artist_list = sorted(artist_track_['name_x'].unique())
-    selected_artist = st.selectbox(
-        "Search for an artist",
-        options=artist_list,
-        index=None,
-        placeholder="Type artist name..."
-    )
+    artist_picker(selected_artist)
+
+    # filters are applied inside the similarity scan, unset ones are left out
+    with st.expander("Filters"):
+        min_popularity = st.slider("Minimum popularity", 0, 100, 0)
+    row_filter = artist_filters.row_filter({'min_popularity': min_popularity})
 with st.container(border=True):
         st.markdown('### :rainbow[Artist recommendations]')
         
@@ -82,12 +112,21 @@ with st.container(border=True):
                         * With the feature weighting option, you can adjust the importance of each attribute (e.g., giving more weight to danceability or tempo) to refine the recommendations.
                     * Explore visualizations below to compare the selected artist's avg features and recommendations in different ways, including radar charts and t-SNE projections.
                     """)
-# Main page layout, two columns
-main_col1, main_col2 = st.columns([1, 1])
 
-# First main column: Feature weights
-with main_col1:
-    
+# The sections below are fragments: a widget inside one reruns only that
+# fragment. The whole page reruns when the selection or the weights used by
+# the recommendations change.
+
+# weights of this rerun's recommendations: the sliders in live mode, else the
+# applied ones (widget values are in the session state before the sliders are drawn)
+live = st.session_state.get('artist_live', False)
+applied_weights = selected_weights(features) if live else st.session_state.get('artist_weights')
+
+
+@st.fragment
+@fragment_trace
+def weight_controls(applied_weights):
+    """Weight sliders; the page reruns only once the recommendations use other weights"""
     with st.container():
                 
         # Add Reset button next to title
@@ -129,47 +168,153 @@ with main_col1:
         # Store weights in session state
         st.session_state.weights = weights       
         
+        # live mode re-ranks on every slider change from the selected item's
+        # cached per-feature contributions, without the Apply Weights step
+        live = st.toggle("Update recommendations as the weights change", value=False, key='artist_live')
+
         # Apply weights button
-        if weights:
+        if weights and not live:
             if st.button("Apply Weights", use_container_width=True):
-                vectors_weighted = apply_feature_weights(vectors, weights)
-                st.session_state.vectors = vectors_weighted
-                # Store with artist-specific key
-                st.session_state.artist_vectors = vectors_weighted
+                # searches weigh the query; the layout of the plot is cached per weight vector
+                st.session_state.artist_weights = dict(weights)
+
+        # a slider move outside live mode stays in this fragment
+        if (dict(weights) if live else st.session_state.get('artist_weights')) != applied_weights:
+            st.rerun()
+
+
+@st.fragment
+@fragment_trace
+def selection_header(artist_id, selected_artist, artists_fetch):
+    """Name, link and image of the selected artist"""
+    if artist_id not in artists_fetch.index:
+        # Spotify details could not be fetched, the catalog name stands in
+        st.markdown(f'#### :rainbow[Selected artist: {selected_artist}]')
+        st.caption("Spotify details are unavailable right now")
+        st.write("")
+        return
+    test_fetch = artists_fetch.loc[artist_id]
+    artist_name = test_fetch['artist_name']
+   # Create two columns for title and button
+    title_col, button_col = st.columns([2, 1])
+    with title_col:
+        st.markdown(f'#### :rainbow[Selected artist: {artist_name}]')
+    with button_col:
+        st.link_button('Go to Spotify profile', 
+                    test_fetch['spotify_url'], 
+                    use_container_width=True)
+    
+    # Image below the columns
+    if pd.notna(test_fetch['artist_image']):
+        st.image(test_fetch['artist_image'], use_container_width=True)
+    st.write("")
+
+
+@st.fragment
+@fragment_trace
+def recommendation_cards(scores, card_ids, card_names, artists_fetch):
+    """The three most similar artists"""
+    rec_cols = st.columns(3, gap="small")
     
+     # Only loop through top 3 artists for display
+    for idx in range(3):
+        with rec_cols[idx]:
+            score = scores[idx+1]
+            if card_ids[idx] not in artists_fetch.index:
+                # placeholder card when Spotify details could not be fetched
+                st.subheader(card_names[idx])
+                st.caption("Spotify details unavailable")
+                st.metric("Similarity Score", f"{score:.4f}")
+                continue
+            # cards render from the metadata gathered above
+            test_fetch = artists_fetch.loc[card_ids[idx]]
+            # Display artist information
+            if pd.notna(test_fetch['artist_image']):
+                st.image(test_fetch['artist_image'], use_container_width=True, width=50)
+            st.write("") 
             
+            # Display artist info
+            st.subheader(test_fetch['artist_name'])
+           
+            # Display metrics
+            col1, col2 = st.columns(2)
+            with col1:
+                st.link_button('Go to Spotify profile', test_fetch['spotify_url'], use_container_width=True)
+            with col2:
+                st.metric("Similarity Score", f"{score:.4f}")
+
+
+@st.fragment
+@fragment_trace
+def projection_plot(similar_vectors, similar_artists, scores, applied_weights, live):
+    """t-SNE plot of the recommendations; the refine toggle reruns only this fragment"""
+    refine = st.toggle("Refine the layout around this selection", value=False)
+    # rows of the precomputed global layout; weighted vectors are refined locally,
+    # live weights only on request since they change with every slider move
+    plot_weights = applied_weights if refine or not live else None
+    coords = layout_coords(store.version, 'artist', tuple(similar_artists.index.tolist()),
+                           weights=weight_vector(plot_weights, features) if plot_weights else None,
+                           refine=refine)
+    fig = visualize_artist_space(similar_vectors, similar_artists, scores, item_type='artist', coords=coords)
+    st.plotly_chart(fig,  use_container_width=True)
+
+
+@st.fragment
+@fragment_trace
+def radar_chart(selected_artist, second_artist):
+    """Mean audio features of the selected artist against its top match"""
+    artist1_mean = process_artist_data(selected_artist, artist_track_, audio_features,
+                                       lookup=artist_track_lookup, aggregates=artist_aggregates)
+    artist2_mean = process_artist_data(second_artist, artist_track_, audio_features,
+                                       lookup=artist_track_lookup, aggregates=artist_aggregates)
+
+    data_radar = data_to_radar_chart(artist1_mean, artist2_mean)
+    fig = create_radar_chart_new(data_radar)
+    st.plotly_chart(fig, use_container_width=True)
+
+
+# Main page layout, two columns
+main_col1, main_col2 = st.columns([1, 1])
+
+# First main column: Feature weights
+with main_col1:
+    weight_controls(applied_weights)
+    
+            
+
+# Find recommendations before rendering, so the Spotify metadata of the selected
+# artist and of every card is fetched in one concurrent round
+result = None
+if selected_artist is not None:
+    artist_row = artist_track_lookup.first(selected_artist)
+    artist_id = artist_track_['artist_id'].iloc[artist_row]
+
+    result = cached_similar_items(result_cache, store.version, 'artist', selected_artist, vectors, artists_cleaned,
+                                  index=artist_index, lookup=artist_lookups['name'], weights=applied_weights,
+                                  live=live, graph=artist_graph, row_filter=row_filter)
+    if not isinstance(result, str) and len(result[2]) < 4:
+        result = "Too few artists pass the filters, try broader ones"
+
+    # the recommended rows carry their own artist_id, no name search needed
+    card_ids = [] if isinstance(result, str) else list(result[1]['artist_id'].iloc[1:4])
+    card_names = [] if isinstance(result, str) else list(result[1]['name'].iloc[1:4])
+    _, artists_fetch = fetch_spotify_metadata(client_id, client_secret, artist_ids=[artist_id] + card_ids)
 
 with main_col2:
     # Second container: Artist selection    
     if selected_artist is None:
         st.write("Please select an artist")
     else:
-        artist_match = artist_track_[artist_track_['name_x'] == selected_artist]   
-        artist_id = artist_match['artist_id'].values[0]
-        test_fetch = fetch_and_parse_spotify_artist_data(artist_id, token, client_id, client_secret)
-        artist_name = test_fetch['artist_name'].iloc[0]
-       # Create two columns for title and button
-        title_col, button_col = st.columns([2, 1])
-        with title_col:
-            st.markdown(f'#### :rainbow[Selected artist: {artist_name}]')
-        with button_col:
-            st.link_button('Go to Spotify profile', 
-                        test_fetch['spotify_url'].iloc[0], 
-                        use_container_width=True)
-        
-        # Image below the columns
-        st.image(test_fetch['artist_image'].iloc[0], use_container_width=True)
-        st.write("")
+        selection_header(artist_id, selected_artist, artists_fetch)
                     
 
 st.markdown("---")
 
 # Recommendations container
+second_artist = None
 with st.container():
     st.markdown('#### :rainbow[Similar artists]')
     if selected_artist is not None:
-        vectors_to_use = st.session_state.get('artist_vectors', vectors)
-        result = get_similar_artists(selected_artist, vectors_to_use, artists_cleaned)
         
         if isinstance(result, str):
             st.error(result)
@@ -177,32 +322,9 @@ with st.container():
             similar_artists = None
             scores = None
         else:
-            # Create three columns for recommendations
             similar_vectors, similar_artists, scores = result
             second_artist = similar_artists.iloc[1]['name']
-            rec_cols = st.columns(3, gap="small")
-            
-             # Only loop through top 3 artists for display
-            for idx in range(3):
-                with rec_cols[idx]:
-                    artist = similar_artists.iloc[idx+1]['name']
-                    score = scores[idx+1]
-                    artist_match = artist_track_[artist_track_['name_x'] == artist]   
-                    artist_id = artist_match['artist_id'].values[0]
-                    test_fetch = fetch_and_parse_spotify_artist_data(artist_id, token, client_id, client_secret)
-                    # Display artist information
-                    st.image(test_fetch['artist_image'].iloc[0], use_container_width=True, width=50)
-                    st.write("") 
-                    
-                    # Display artist info
-                    st.subheader(test_fetch['artist_name'].iloc[0])
-                   
-                    # Display metrics
-                    col1, col2 = st.columns(2)
-                    with col1:
-                        st.link_button('Go to Spotify profile', test_fetch['spotify_url'].iloc[0], use_container_width=True)
-                    with col2:
-                        st.metric("Similarity Score", f"{score:.4f}")
+            recommendation_cards(scores, card_ids, card_names, artists_fetch)
 
 st.markdown("---")
 st.markdown("""
@@ -215,8 +337,7 @@ with st.container():
                 * Cosine similarity directly measures vector similarity in high dimensions, but it’s harder to visualize. A song may have high cosine similarity to another but appear distant in t-SNE due to how the reduction prioritizes local structure.
                 """)
     if similar_vectors is not None:
-        fig = visualize_artist_space(similar_vectors, similar_artists, scores, item_type='artist')
-        st.plotly_chart(fig,  use_container_width=True)
+        projection_plot(similar_vectors, similar_artists, scores, applied_weights, live)
 st.markdown("---")
 st.markdown("""
             """)
@@ -236,9 +357,6 @@ with st.container():
     if selected_artist == None or second_artist == None:
         st.write("Please select an artist")
     else:
-        artist1_mean = process_artist_data(selected_artist, artist_track_, audio_features)
-        artist2_mean = process_artist_data(second_artist, artist_track_, audio_features)
-    
-        data_radar = data_to_radar_chart(artist1_mean, artist2_mean)
-        fig = create_radar_chart_new(data_radar)
-        st.plotly_chart(fig, use_container_width=True)
\ No newline at end of file
+        radar_chart(selected_artist, second_artist)
+
+finish_trace(trace)
@@ -1,47 +1,34 @@
 import streamlit as st
-from sklearn.metrics.pairwise import cosine_similarity
 import numpy as np
-from src.data_processing import (get_artist_features, 
-                                 vectorize_artist_features,
-                                 merge_artist_features,
-                                 )
+from src.vector_store import open_vector_store, load_item_frame
+from src.tracing import start_trace, finish_trace
 import plotly.graph_objects as go
-import pandas as pd
 
 
 
 
-# bring the necessary data
-tracks = st.session_state.tracks
-mapping = st.session_state.mapping
-artists = st.session_state.artists
-audio_features = st.session_state.audio_features
+# timing spans of this rerun (APP_TRACE=1), shown in the sidebar at the end
+trace = start_trace('Other visuals')
+
+# bring the necessary data: unit vectors of the vector store, aligned row by row with the artist frame
+store = open_vector_store()
+artists_cleaned = load_item_frame('artist')
 
 st.markdown("### <h1 style='text-align: center;'> :rainbow[Other visuals]</h1>", unsafe_allow_html=True)
 st.markdown("---")
 st.markdown("#### <h2 style='text-align: center;'>Artist Similarity Matrix</h2>", unsafe_allow_html=True)
 
 
-# Check session state first
-if 'artists' in st.session_state and 'audio_features' in st.session_state:
-    # Get data from session state
-    artists = st.session_state.artists
-    
-    audio_features = st.session_state.audio_features
-    tracks_features = pd.merge(tracks, audio_features, on='track_id', how='inner')
-    artist_track_ = merge_artist_features(tracks, mapping, artists)
-    # Process data
-    table_artists = get_artist_features(artists, artist_track_, audio_features)
-    
-    vectors_artists, _ = vectorize_artist_features(table_artists)
+if len(artists_cleaned) >= 5:
+    vectors_artists = store.artist_unit
     
     # Get 5 random unique indices
-    random_indices = np.random.choice(len(vectors_artists), size=5, replace=False)
+    random_indices = np.sort(np.random.choice(len(vectors_artists), size=5, replace=False))
 
-    # Calculate similarity matrix for first 5 artists
-    
-    similarity_matrix = cosine_similarity(vectors_artists[random_indices])
-    names = artists['name'].iloc[random_indices].tolist()
+    # Cosine similarity of unit vectors is their dot product
+    unit = np.asarray(vectors_artists[random_indices], dtype=np.float64)
+    similarity_matrix = unit @ unit.T
+    names = artists_cleaned['name'].iloc[random_indices].tolist()
     
     # Create heatmap
     fig = go.Figure(data=go.Heatmap(
@@ -69,4 +56,4 @@ if 'artists' in st.session_state and 'audio_features' in st.session_state:
     st.plotly_chart(fig, use_container_width=True)
 
 
-   
\ No newline at end of file
+finish_trace(trace)
@@ -0,0 +1,412 @@
+import numpy as np
+import pandas as pd
+
+
+
+FEATURES = ['danceability', 'energy', 'acousticness', 'instrumentalness',
+            'liveness', 'valence', 'speechiness', 'key', 'mode',
+            'tempo', 'time_signature']
+
+
+def segment_sums(codes, values, n_groups, rows=None):
+    """
+    Sum the rows of `values` per integer code.
+
+    One np.bincount per column, so the rows are never sorted or grouped by
+    key string.
+
+    Args:
+        codes (np.array): Group code of every row, 0 <= code < n_groups
+        values (np.array): (n_rows, d) values
+        n_groups (int): Number of groups
+        rows (np.array): Optional row of `values` for every code; columns are
+            then gathered one at a time instead of copying values[rows]
+
+    Returns:
+        tuple: ((n_groups, d) float64 sums, (n_groups,) int64 row counts);
+        groups without rows sum to 0
+    """
+    sums = np.empty((n_groups, values.shape[1]), dtype=np.float64)
+    for column in range(values.shape[1]):
+        weights = values[:, column] if rows is None else values[rows, column]
+        sums[:, column] = np.bincount(codes, weights=np.asarray(weights, dtype=np.float64), minlength=n_groups)
+    return sums, np.bincount(codes, minlength=n_groups)
+
+
+def key_rows(keys, values):
+    """
+    Row of every value in the column of unique `keys`, -1 where absent.
+
+    Categorical columns (the id columns of read_columnar share their
+    categories) are matched through their codes, hashing each category at
+    most once instead of one string per row.
+
+    Args:
+        keys (pd.Series): Unique keys, e.g. audio_features['track_id']
+        values (pd.Series): Keys to find, e.g. artist_track_['track_id']
+
+    Returns:
+        np.array: int64 row positions in `keys`
+    """
+    if not (isinstance(keys.dtype, pd.CategoricalDtype) and isinstance(values.dtype, pd.CategoricalDtype)):
+        return pd.Index(keys).get_indexer(values)
+
+    key_codes = keys.cat.codes.to_numpy()
+    rows_by_category = np.full(len(keys.cat.categories), -1, dtype=np.int64)
+    present = np.flatnonzero(key_codes >= 0)
+    rows_by_category[key_codes[present]] = present
+
+    if values.cat.categories.equals(keys.cat.categories):
+        value_rows = rows_by_category
+    else:
+        categories = keys.cat.categories.get_indexer(values.cat.categories)
+        value_rows = np.where(categories >= 0, rows_by_category[categories], -1)
+    value_codes = values.cat.codes.to_numpy()
+    return np.where(value_codes >= 0, value_rows[value_codes], -1)
+
+
+class ArtistAggregates:
+    """
+    Mean audio features of every artist, computed in one pass over the tracks.
+
+    The artist/track rows are coded once (artist_id -> artist code, track_id
+    -> row of audio_features), the feature rows of every pair are summed per
+    artist with integer-coded reductions (segment_sums), and the per-artist
+    sums are pooled per artist name, so name-level means equal a groupby mean
+    over the name's rows (same result as the string-keyed groupby it
+    replaces). Sums and counts are kept, means come out of a dict lookup in
+    O(1) per artist.
+
+    Args:
+        artist_track_ (pd.DataFrame): Merged artist/track table (merge_artist_features)
+        audio_features (pd.DataFrame): One row per track_id with the audio features
+    """
+
+    def __init__(self, artist_track_, audio_features):
+        # feature row of every artist/track pair; pairs without features are dropped,
+        # like the inner merge did
+        track_rows = key_rows(audio_features['track_id'], artist_track_['track_id'])
+        keep = track_rows >= 0
+
+        artist_codes, artist_ids = pd.factorize(artist_track_['artist_id'])
+        self.artist_ids = np.asarray(artist_ids, dtype=object)
+        matrix = audio_features[FEATURES].to_numpy(dtype=np.float64)
+        self.id_sums, self.id_counts = segment_sums(artist_codes[keep], matrix, len(self.artist_ids),
+                                                    rows=track_rows[keep])
+
+        # artist name of every artist_id (its first row); names are sorted only by frame()
+        first_rows = np.unique(artist_codes, return_index=True)[1]
+        self.name_codes, names = pd.factorize(artist_track_['name_x'].iloc[first_rows])
+        self.names = np.asarray(names, dtype=object)
+        self.name_sums = segment_sums(self.name_codes, self.id_sums, len(self.names))[0]
+        self.name_counts = np.bincount(self.name_codes, weights=self.id_counts,
+                                       minlength=len(self.names)).astype(np.int64)
+
+        self.id_rows = dict(zip(self.artist_ids.tolist(), range(len(self.artist_ids))))
+        self.name_rows = dict(zip(self.names.tolist(), range(len(self.names))))
+        self.dtypes = audio_features[FEATURES].dtypes
+        self.name_dtype = artist_track_['name_x'].dtype
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self.name_rows
+
+    def mean(self, name):
+        """Mean feature vector of an artist name (FEATURES order), or None without tracks"""
+        row = self.name_rows.get(name)
+        if row is None or self.name_counts[row] == 0:
+            return None
+        return self.name_sums[row] / self.name_counts[row]
+
+    def mean_by_id(self, artist_id):
+        """Mean feature vector of one artist_id, or None without tracks"""
+        row = self.id_rows.get(artist_id)
+        if row is None or self.id_counts[row] == 0:
+            return None
+        return self.id_sums[row] / self.id_counts[row]
+
+    def frame(self, names=None):
+        """
+        Mean features per artist name, like get_artist_features.
+
+        Args:
+            names (array-like): Only these artist names (default all)
+
+        Returns:
+            pd.DataFrame: 'name' plus one column per feature, sorted by name;
+            names without tracks are left out
+        """
+        keep = self.name_counts > 0
+        if names is not None:
+            # set membership; np.isin on object arrays compares pairwise
+            wanted = set(pd.Series(names).dropna().tolist())
+            keep &= np.fromiter((name in wanted for name in self.names), dtype=bool, count=len(self.names))
+        # sorted by name like a groupby
+        rows = np.flatnonzero(keep)
+        rows = rows[np.argsort(self.names[rows], kind='stable')]
+        means = self.name_sums[rows] / self.name_counts[rows, None]
+        table = pd.DataFrame(means, columns=FEATURES)
+        # float32 inputs average to float32, integer inputs to float64, as pandas does
+        for feature in FEATURES:
+            if self.dtypes[feature] == np.float32:
+                table[feature] = table[feature].astype(np.float32)
+        table.insert(0, 'name', pd.array(self.names[rows], dtype=self.name_dtype))
+        return table
+
+
+def _grow(array, n_rows, fill=0):
+    """`array` with room for at least n_rows rows; capacity doubles, new rows hold `fill`"""
+    if n_rows <= len(array):
+        return array
+    grown = np.full((max(n_rows, 2 * len(array)),) + array.shape[1:], fill, dtype=array.dtype)
+    grown[:len(array)] = array
+    return grown
+
+
+class ArtistProfiles:
+    """
+    Artist vectors kept up to date as rows are appended to the catalog tables.
+
+    Keeps the running feature sums and track counts of every artist_id and
+    artist name, the name means, and the global per-feature min and max of
+    those means (what MinMaxScaler fits in vectorize_artist_features).
+    append() only re-averages the artists whose tracks changed; the min/max
+    is recomputed over every mean only when an artist that held it moved
+    inward. Scaling is lazy: vectors() rescales the artists changed since
+    its last call, or every artist when the min/max moved.
+
+    A mapping row counts once its artist, its track and the track's audio
+    features are all present (the inner merges of merge_artist_features and
+    get_artist_features); rows missing one of them wait until it arrives.
+    Rows of tracks, artists and audio_features whose id is already known are
+    ignored, artists without a name are never counted.
+
+    Args:
+        tracks (pd.DataFrame): Initial tracks table (default empty)
+        mapping (pd.DataFrame): Initial artist/track mapping (default empty)
+        artists (pd.DataFrame): Initial artists table (default empty)
+        audio_features (pd.DataFrame): Initial audio features (default empty)
+    """
+
+    def __init__(self, tracks=None, mapping=None, artists=None, audio_features=None):
+        n_features = len(FEATURES)
+        self.track_ids = set()
+        self.feature_rows = {}
+        self.features = np.empty((0, n_features), dtype=np.float64)
+
+        self.id_codes = {}
+        self.id_names = np.empty(0, dtype=np.int64)
+        self.id_sums = np.empty((0, n_features), dtype=np.float64)
+        self.id_counts = np.empty(0, dtype=np.int64)
+
+        self.name_codes = {}
+        self.names = np.empty(0, dtype=object)
+        self.name_sums = np.empty((0, n_features), dtype=np.float64)
+        self.name_counts = np.empty(0, dtype=np.int64)
+        self.means = np.empty((0, n_features), dtype=np.float64)
+
+        self.data_min = np.full(n_features, np.inf)
+        self.data_max = np.full(n_features, -np.inf)
+        # features averaged to float32 by the groupby (float32 inputs)
+        self.float32_features = np.zeros(n_features, dtype=bool)
+        self.name_dtype = object
+
+        self.pending_artists = np.empty(0, dtype=object)
+        self.pending_tracks = np.empty(0, dtype=object)
+
+        self._scaled = np.empty((0, n_features), dtype=np.float64)
+        self._dirty = set()
+        self._rescale_all = True
+        # rows of vectors(), sorted by name; reset when a name gains its first track
+        self._order = None
+
+        self.append(tracks, mapping, artists, audio_features)
+
+    def __len__(self):
+        return len(self.name_codes)
+
+    def _add_artists(self, artists):
+        artists = artists[artists['name'].notna()]
+        if self.name_dtype is object:
+            self.name_dtype = artists['name'].dtype
+        new_ids = []
+        for artist_id, name in zip(np.asarray(artists['artist_id'], dtype=object),
+                                   np.asarray(artists['name'], dtype=object)):
+            if artist_id in self.id_codes:
+                continue
+            if name not in self.name_codes:
+                self.name_codes[name] = len(self.name_codes)
+            self.id_codes[artist_id] = len(self.id_codes)
+            new_ids.append(self.name_codes[name])
+
+        n_ids, n_names = len(self.id_codes), len(self.name_codes)
+        self.id_names = _grow(self.id_names, n_ids)
+        self.id_names[n_ids - len(new_ids):n_ids] = new_ids
+        self.id_sums = _grow(self.id_sums, n_ids)
+        self.id_counts = _grow(self.id_counts, n_ids)
+
+        old_names = len(self.names)
+        self.names = np.concatenate([self.names, np.asarray(list(self.name_codes)[old_names:], dtype=object)])
+        self.name_sums = _grow(self.name_sums, n_names)
+        self.name_counts = _grow(self.name_counts, n_names)
+        self.means = _grow(self.means, n_names, fill=np.nan)
+
+    def _add_audio_features(self, audio_features):
+        self.float32_features |= (audio_features[FEATURES].dtypes == np.float32).to_numpy()
+        track_ids = np.asarray(audio_features['track_id'], dtype=object)
+        new = np.fromiter((track_id not in self.feature_rows for track_id in track_ids),
+                          dtype=bool, count=len(track_ids))
+        # duplicates within the batch keep their first row
+        new &= ~pd.Series(track_ids).duplicated().to_numpy()
+
+        start = len(self.feature_rows)
+        self.feature_rows.update(zip(track_ids[new].tolist(), range(start, start + new.sum())))
+        self.features = _grow(self.features, len(self.feature_rows))
+        self.features[start:len(self.feature_rows)] = audio_features[FEATURES].to_numpy(dtype=np.float64)[new]
+
+    def append(self, tracks=None, mapping=None, artists=None, audio_features=None):
+        """
+        Add new rows to the catalog and update the artists they touch.
+
+        Args:
+            tracks (pd.DataFrame): New rows of tracks (track_id)
+            mapping (pd.DataFrame): New rows of mapping (artist_id, track_id)
+            artists (pd.DataFrame): New rows of artists (artist_id, name)
+            audio_features (pd.DataFrame): New rows of audio_features (track_id + FEATURES)
+
+        Returns:
+            np.array: Names whose mean vector changed
+        """
+        if artists is not None:
+            self._add_artists(artists)
+        if tracks is not None:
+            self.track_ids.update(np.asarray(tracks['track_id'], dtype=object).tolist())
+        if audio_features is not None:
+            self._add_audio_features(audio_features)
+
+        # new mapping rows, plus earlier rows that were waiting for an artist,
+        # track or features
+        pair_artists, pair_tracks = self.pending_artists, self.pending_tracks
+        if mapping is not None:
+            pair_artists = np.concatenate([pair_artists, np.asarray(mapping['artist_id'], dtype=object)])
+            pair_tracks = np.concatenate([pair_tracks, np.asarray(mapping['track_id'], dtype=object)])
+        id_codes = np.fromiter((self.id_codes.get(artist_id, -1) for artist_id in pair_artists),
+                               dtype=np.int64, count=len(pair_artists))
+        rows = np.fromiter((self.feature_rows.get(track_id, -1) if track_id in self.track_ids else -1
+                            for track_id in pair_tracks), dtype=np.int64, count=len(pair_tracks))
+        complete = (id_codes >= 0) & (rows >= 0)
+        self.pending_artists, self.pending_tracks = pair_artists[~complete], pair_tracks[~complete]
+        if not complete.any():
+            return self.names[:0]
+
+        # running sums of the touched artist ids and names only
+        id_codes, rows = id_codes[complete], rows[complete]
+        touched_ids, id_groups = np.unique(id_codes, return_inverse=True)
+        sums, counts = segment_sums(id_groups, self.features, len(touched_ids), rows=rows)
+        self.id_sums[touched_ids] += sums
+        self.id_counts[touched_ids] += counts
+
+        touched_names, name_groups = np.unique(self.id_names[touched_ids], return_inverse=True)
+        self.name_sums[touched_names] += segment_sums(name_groups, sums, len(touched_names))[0]
+        self.name_counts[touched_names] += np.bincount(name_groups, weights=counts,
+                                                       minlength=len(touched_names)).astype(np.int64)
+        self._update_means(touched_names)
+        return self.names[touched_names]
+
+    def _update_means(self, names):
+        """Re-average the given name codes and keep the global min/max current"""
+        old = self.means[names]
+        new = self.name_sums[names] / self.name_counts[names, None]
+        # float32 features are averaged to float32 before scaling, as in get_artist_features
+        new[:, self.float32_features] = new[:, self.float32_features].astype(np.float32)
+        self.means[names] = new
+        if not np.isfinite(old).all():
+            self._order = None
+
+        data_min, data_max = self.data_min, self.data_max
+        if np.any((old == data_min) & (new > old)) or np.any((old == data_max) & (new < old)):
+            # an artist holding the min or max moved inward: rescan every mean
+            valid = self.means[np.isfinite(self.means).all(axis=1)]
+            self.data_min, self.data_max = valid.min(axis=0), valid.max(axis=0)
+        else:
+            finite = new[np.isfinite(new).all(axis=1)]
+            if len(finite):
+                self.data_min = np.minimum(data_min, finite.min(axis=0))
+                self.data_max = np.maximum(data_max, finite.max(axis=0))
+
+        if not (np.array_equal(self.data_min, data_min) and np.array_equal(self.data_max, data_max)):
+            self._rescale_all = True
+        else:
+            self._dirty.update(names.tolist())
+
+    def _scaling(self):
+        """MinMaxScaler's scale_ and min_ for the current min/max"""
+        data_range = self.data_max - self.data_min
+        # constant features are left unscaled, like sklearn's _handle_zeros_in_scale
+        data_range[data_range < 10 * np.finfo(np.float64).eps] = 1.0
+        scale = 1.0 / data_range
+        return scale, -self.data_min * scale
+
+    def vector(self, name):
+        """Scaled vector of one artist name with the current min/max, or None"""
+        code = self.name_codes.get(name)
+        if code is None or not np.isfinite(self.means[code]).all():
+            return None
+        scale, offset = self._scaling()
+        return self.means[code] * scale + offset
+
+    def vectors(self):
+        """
+        Scaled vectors of every artist name and the matching artist frame, like
+        vectorize_artist_features(get_artist_features(...)).
+
+        Returns:
+            tuple: (vectors, cleaned DataFrame) ordered by artist name
+        """
+        n_names = len(self.name_codes)
+        self._scaled = _grow(self._scaled, n_names)
+        if self._rescale_all:
+            rescale = np.arange(n_names)
+        else:
+            rescale = np.fromiter(self._dirty, dtype=np.int64, count=len(self._dirty))
+        scale, offset = self._scaling()
+        self._scaled[rescale] = self.means[rescale] * scale + offset
+        self._dirty.clear()
+        self._rescale_all = False
+
+        # names with tracks and complete features, sorted like a groupby
+        if self._order is None:
+            rows = np.flatnonzero(np.isfinite(self.means[:n_names]).all(axis=1))
+            self._order = rows[np.argsort(self.names[rows], kind='stable')]
+            self._order_names = pd.array(self.names[self._order], dtype=self.name_dtype)
+        rows = self._order
+        table = pd.DataFrame(self.means[rows], columns=FEATURES)
+        for feature, is_float32 in zip(FEATURES, self.float32_features):
+            if is_float32:
+                table[feature] = table[feature].astype(np.float32)
+        table.insert(0, 'name', self._order_names)
+        return self._scaled[rows], table
+
+    def verify(self, tracks, mapping, artists, audio_features, atol=1e-6):
+        """
+        Compare with a full rebuild from the complete tables.
+
+        Args:
+            tracks, mapping, artists, audio_features (pd.DataFrame): Every row
+                appended so far, concatenated
+            atol (float): Largest allowed difference of a scaled feature (default 1e-6)
+
+        Returns:
+            bool: True if the names, their order and every vector match
+        """
+        from src.data_processing import get_artist_features, merge_artist_features, vectorize_artist_features
+
+        artist_track_ = merge_artist_features(tracks, mapping, artists)
+        expected_vectors, expected = vectorize_artist_features(get_artist_features(artists, artist_track_,
+                                                                                   audio_features))
+        vectors, table = self.vectors()
+        if not np.array_equal(np.asarray(table['name'], dtype=object), np.asarray(expected['name'], dtype=object)):
+            return False
+        return bool(np.allclose(vectors, expected_vectors, rtol=0, atol=atol))
@@ -0,0 +1,125 @@
+"""
+Approximate nearest-neighbour search for large catalogs, NumPy only.
+
+IVFIndex partitions the unit vectors with spherical k-means into `n_lists`
+inverted lists. A query scores the list centroids, then only the rows of the
+`nprobe` closest lists, instead of the whole catalog. More probes raise recall
+and cost; nprobe = n_lists is exact. SimilarityIndex stays the exact path, and
+callers choose per query (see get_similar_artists(ann_index=...)).
+"""
+import numpy as np
+
+from src.similarity import divide_norms, top_k
+
+
+class IVFIndex:
+    """
+    Inverted-file index over L2-normalized vectors (cosine similarity).
+
+    Args:
+        unit_vectors (np.array): (N, d) normalized vectors, e.g. VectorStore.track_unit
+        n_lists (int): Number of partitions (default sqrt(N))
+        n_iter (int): k-means iterations (default 10)
+        sample_size (int): Rows the centroids are trained on (default 100,000)
+        nprobe (int): Lists probed per query unless given per call (default 8)
+        seed (int): Seed for the training sample and initial centroids (default 42)
+        memory_budget_mb (float): Working memory per assignment block (default 64)
+    """
+
+    def __init__(self, unit_vectors, n_lists=None, n_iter=10, sample_size=100_000, nprobe=8,
+                 seed=42, memory_budget_mb=64):
+        self.unit_vectors = unit_vectors
+        n_items = len(unit_vectors)
+        self.n_lists = min(n_lists or max(1, int(np.sqrt(n_items))), n_items)
+        self.nprobe = nprobe
+        self.memory_budget_mb = memory_budget_mb
+
+        rng = np.random.default_rng(seed)
+        sample_rows = np.sort(rng.choice(n_items, size=min(sample_size, n_items), replace=False))
+        sample = np.asarray(unit_vectors[sample_rows], dtype=np.float32)
+        self.centroids = self._train(sample, n_iter, rng)
+
+        # rows grouped by list, each list in row order
+        assignment = self.assign(unit_vectors)
+        self.order = np.argsort(assignment, kind='stable').astype(np.int64)
+        self.offsets = np.searchsorted(assignment[self.order], np.arange(self.n_lists + 1))
+
+    def _train(self, sample, n_iter, rng):
+        """Spherical k-means: centroids are normalized means of their members"""
+        centroids = sample[rng.choice(len(sample), size=self.n_lists, replace=False)].copy()
+        for _ in range(n_iter):
+            assignment = self.assign(sample, centroids)
+            sums = np.stack([np.bincount(assignment, weights=sample[:, dim], minlength=self.n_lists)
+                             for dim in range(sample.shape[1])], axis=1)
+            counts = np.bincount(assignment, minlength=self.n_lists)
+
+            # lists that lost every member restart from random sample rows
+            empty = np.flatnonzero(counts == 0)
+            sums[empty] = sample[rng.choice(len(sample), size=len(empty), replace=False)]
+
+            norms = np.linalg.norm(sums, axis=1)
+            centroids = sums / np.where(norms == 0, 1, norms)[:, None]
+        return centroids.astype(np.float32)
+
+    def assign(self, vectors, centroids=None):
+        """Closest centroid of every row, scored in blocks to bound memory"""
+        if centroids is None:
+            centroids = self.centroids
+        block_size = max(1, int(self.memory_budget_mb * 1e6 // (len(centroids) * 4)))
+        assignment = np.empty(len(vectors), dtype=np.int64)
+        for start in range(0, len(vectors), block_size):
+            block = np.asarray(vectors[start:start + block_size], dtype=np.float32)
+            assignment[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+        return assignment
+
+    def __len__(self):
+        return len(self.unit_vectors)
+
+    def candidates(self, query_idx, nprobe=None, weights=None):
+        """
+        Rows of the probed lists and their cosine similarity to item `query_idx`.
+
+        Args:
+            query_idx (int): Row of the query item
+            nprobe (int): Lists to probe (default self.nprobe)
+            weights (array-like): Optional weight per feature (weighted cosine;
+                the weighted query probes the centroids, which are built from
+                the unweighted vectors)
+
+        Returns:
+            tuple: (rows, scores) of every candidate, in row order
+        """
+        query = np.asarray(self.unit_vectors[query_idx], dtype=np.float32)
+        if weights is not None:
+            squared_weights = np.square(np.asarray(weights, dtype=np.float32))
+            query = query * squared_weights / (np.sqrt(np.square(query) @ squared_weights) or 1)
+        probes = top_k(self.centroids @ query, nprobe or self.nprobe)
+        rows = np.concatenate([self.order[self.offsets[probe]:self.offsets[probe + 1]] for probe in probes])
+        # gather in row order, memory-mapped vectors are then read front to back
+        rows.sort()
+        candidates = np.asarray(self.unit_vectors[rows], dtype=np.float32)
+        if weights is None:
+            return rows, candidates @ query
+        # weighted row norms of the candidates only
+        return rows, divide_norms(candidates @ query, np.sqrt(np.square(candidates) @ squared_weights))
+
+    def query(self, query_idx, k=20, nprobe=None, exclude_self=True, weights=None):
+        """
+        Approximate k most similar items to item `query_idx`.
+
+        Args:
+            query_idx (int): Row of the query item
+            k (int): Number of neighbours to return (default 20)
+            nprobe (int): Lists to probe (default self.nprobe)
+            exclude_self (bool): Drop the query row from the result (default True)
+            weights (array-like): Optional weight per feature
+
+        Returns:
+            tuple: (indices, scores) of the neighbours, best first
+        """
+        rows, scores = self.candidates(query_idx, nprobe, weights)
+        if exclude_self:
+            keep = rows != query_idx
+            rows, scores = rows[keep], scores[keep]
+        best = top_k(scores, k)
+        return rows[best], scores[best]
@@ -1,8 +1,13 @@
+import os
 import streamlit as st
 import pandas as pd
 from sklearn.preprocessing import MinMaxScaler
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
+from src.similarity import SimilarityIndex, normalize_rows, top_k
+from src.storage import read_columnar
+from src.lookup import RowLookup
+from src.aggregation import FEATURES, ArtistAggregates, key_rows
+from src.tracing import traced
 import streamlit.components.v1 as components
 import random
 
@@ -10,6 +15,7 @@ import random
 
 
 
+@traced
 def merge_artist_features(tracks, mapping, artists):
 
     artist_track = pd.merge(mapping, tracks, how='inner', on='track_id')
@@ -17,22 +23,96 @@ def merge_artist_features(tracks, mapping, artists):
 
     return artist_track_
 
-st.cache_data()
-def load_df(): 
+@st.cache_resource
+@traced
+def load_artist_tracks():
+    """
+    Merged artist/track table and a lookup from artist name to its rows,
+    built once per process.
+
+    Returns:
+        tuple: (artist_track_ DataFrame, RowLookup over its 'name_x' column)
+    """
+    tracks, mapping, artists, audio_features = load_catalog()
+    artist_track_ = merge_artist_features(tracks, mapping, artists)
+    return artist_track_, RowLookup(artist_track_['name_x'])
+
+@st.cache_resource
+@traced
+def load_artist_aggregates():
+    """
+    Mean audio features of every artist (ArtistAggregates), computed once per
+    process from the merged artist/track table.
+    """
+    tracks, mapping, artists, audio_features = load_catalog()
+    artist_track_, _ = load_artist_tracks()
+    return ArtistAggregates(artist_track_, audio_features)
+
+@st.cache_data()
+@traced
+def load_df(data_dir='data'): 
 
     
-    # loading data from csv files
-    audio_features = pd.read_csv('data/audio_features.csv')
-    tracks = pd.read_csv('data/tracks.csv')
-    mapping = pd.read_csv('data/mapping.csv')
-    artists = pd.read_csv('data/artists.csv')
+    # loading data from the typed columnar copies of the csv files
+    # (converted from <data_dir>/*.csv on first use or when the csv files change)
+    tracks, mapping, artists, audio_features = read_columnar(data_dir, os.path.join(data_dir, 'columnar'))
     
     
     return  tracks, mapping, artists,  audio_features
 
+def read_only(frame):
+    """
+    `frame` rebuilt on non-writeable arrays, so writing values into it raises.
+
+    Numeric and bool columns get read-only copies, categorical columns
+    read-only codes; Arrow-backed string columns are immutable already.
+
+    Args:
+        frame (pd.DataFrame): Frame to protect
+
+    Returns:
+        pd.DataFrame: Same columns, dtypes and index
+    """
+    columns = {}
+    for name in frame.columns:
+        column = frame[name]
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            codes = column.cat.codes.to_numpy().copy()
+            codes.flags.writeable = False
+            values = pd.Categorical.from_codes(codes, dtype=column.dtype)
+        elif isinstance(column.dtype, np.dtype):
+            values = column.to_numpy().copy()
+            values.flags.writeable = False
+        else:
+            values = column.array
+        columns[name] = values
+    return pd.DataFrame(columns, index=frame.index, copy=False)
+
+
+@st.cache_resource
+@traced
+def load_catalog(data_dir='data'):
+    """
+    The four catalog tables, loaded once per process and shared by every session.
+
+    Unlike load_df (st.cache_data, which hands each caller its own copy), every
+    call returns the same DataFrames, so memory does not grow with the number
+    of sessions. Their values are read-only (see read_only): writing into them
+    raises, and new columns go into derived frames, never into these.
+    Sessions keep only their own selection and weights.
+
+    Args:
+        data_dir (str): Directory holding the catalog (default data)
+
+    Returns:
+        tuple: (tracks, mapping, artists, audio_features) DataFrames
+    """
+    return tuple(read_only(frame) for frame in read_columnar(data_dir, os.path.join(data_dir, 'columnar')))
 
 
-def process_artist_data(artist_name, artist_track_, audio_features):
+
+@traced
+def process_artist_data(artist_name, artist_track_, audio_features, lookup=None, aggregates=None):
     """
     Process data for a given artist name to calculate charts and audio features.
 
@@ -41,6 +121,9 @@ def process_artist_data(artist_name, artist_track_, audio_features):
         artist_track_chart (pd.DataFrame): DataFrame with artist and track chart data.
         chart (pd.DataFrame): DataFrame with chart data.
         audio_features (pd.DataFrame): DataFrame with audio features.
+        lookup (RowLookup): Optional index over artist_track_['name_x'] to avoid a full scan.
+        aggregates (ArtistAggregates): Optional precomputed means of every artist; the
+            artist's means are then a dict lookup instead of a pass over its tracks.
 
     Returns:
         tuple: A tuple containing:
@@ -49,31 +132,36 @@ def process_artist_data(artist_name, artist_track_, audio_features):
             - artist_features_mean (pd.DataFrame): DataFrame with mean features for the artist.
     """
 
-    artist_data = artist_track_[artist_track_['name_x'] == artist_name].groupby(['track_id'])
-    artist_data = pd.DataFrame(artist_data)
+    if aggregates is not None and artist_name in aggregates:
+        means = aggregates.mean(artist_name)
+        if means is None:
+            # none of the artist's tracks has audio features
+            means = np.full(len(FEATURES), np.nan)
+    else:
+        if lookup is not None:
+            artist_rows = artist_track_.iloc[lookup.rows(artist_name)]
+        else:
+            artist_rows = artist_track_[artist_track_['name_x'] == artist_name]
 
-    artist_mapped = artist_data[0].map(lambda x: x[0])
-    artist_mapped = pd.DataFrame(artist_mapped)
-    artist_features_ = pd.merge(artist_mapped, audio_features, left_on=0, right_on='track_id', how='inner')
-    artist_features_mean = artist_features_.agg({
-        'danceability': 'mean',
-        'energy': 'mean',
-        'acousticness': 'mean',
-        'instrumentalness': 'mean',
-        'liveness': 'mean',
-        'valence': 'mean',
-        'speechiness': 'mean',
-        'key': 'mean',
-        'mode': 'mean',
-        'tempo': 'mean',
-        'time_signature': 'mean',
-    }).reset_index()
+        # every track of the artist once, matched to its audio feature row
+        feature_rows = key_rows(audio_features['track_id'], artist_rows['track_id'])
+        feature_rows = np.unique(feature_rows[feature_rows >= 0])
+        matrix = audio_features[FEATURES].to_numpy(dtype=np.float64)[feature_rows]
+        means = matrix.mean(axis=0) if len(matrix) else np.full(len(FEATURES), np.nan)
+
+    artist_features_mean = pd.DataFrame({'index': FEATURES, 0: means})
     artist_features_mean['name'] = artist_name
 
     return artist_features_mean
 
-def process_songs(song1_name,  tracks_features):
-    test = tracks_features[tracks_features['name'] == song1_name].agg({
+@traced
+def process_songs(song1_name,  tracks_features, lookup=None):
+    # lookup: optional RowLookup over tracks_features['name'] to avoid a full scan
+    if lookup is not None:
+        song_rows = tracks_features.iloc[lookup.rows(song1_name)]
+    else:
+        song_rows = tracks_features[tracks_features['name'] == song1_name]
+    test = song_rows.agg({
         'danceability': 'mean',
         'energy': 'mean',
         'acousticness': 'mean',
@@ -89,6 +177,7 @@ def process_songs(song1_name,  tracks_features):
     test['name'] = song1_name
     return test
 
+@traced
 def data_to_radar_chart(*tables):
     """
     Concatenate any number of DataFrames into a radar chart table.
@@ -116,109 +205,189 @@ def data_to_radar_chart(*tables):
 
 
 
+@traced
 def get_artist_features(artists_df, artist_track_, audio_features):
     """
     Process features for all artists in one operation
     Inputs: A dataframe of artists, a dataframe of artist and its tracks, and a dataframe of audio features
     Outputs: A dataframe of mean audio features for each artist
     """
-    # Get all relevant tracks
-    artist_tracks = artist_track_[artist_track_['name_x'].isin(artists_df['name'])]
-    
-    # Merge with audio features
-    features = pd.merge(artist_tracks[['name_x', 'track_id']], 
-                       audio_features, 
-                       on='track_id', 
-                       how='inner')
-    
-    # Calculate means for each artist
-    feature_columns = ['danceability', 'energy', 'acousticness', 'instrumentalness',
-                      'liveness', 'valence', 'speechiness', 'key', 'mode', 
-                      'tempo', 'time_signature']
-    
-    radar_table = features.groupby('name_x')[feature_columns].mean().reset_index()
-    radar_table = radar_table.rename(columns={'name_x': 'name'})
-    
-    return radar_table
+    # artist ids coded once, all means from one segment reduction (see ArtistAggregates)
+    aggregates = ArtistAggregates(artist_track_, audio_features)
+    return aggregates.frame(artists_df['name'])
+
+def best_per_name(candidates, candidate_scores, lookup, artist_name, n):
+    """
+    Keep the best-scoring candidate row per name (ties by row), drop the
+    selected name and return the top n.
+
+    Args:
+        candidates (np.array): Candidate rows
+        candidate_scores (np.array): Their similarity to the selected row
+        lookup (RowLookup): Name groups of the rows
+        artist_name (str): Selected name, left out of the result
+        n (int): Number of names to return
 
-def get_similar_artists(artist_name, vectors, artists_df, n=20):
+    Returns:
+        tuple: (rows int64, scores), best first
+    """
+    codes = lookup.row_codes[candidates]
+    keep = (codes >= 0) & (codes != lookup.codes[artist_name])
+    candidates, candidate_scores, codes = candidates[keep], candidate_scores[keep], codes[keep]
+    ranked = np.lexsort((candidates, -candidate_scores))
+    _, first = np.unique(codes[ranked], return_index=True)
+    best = ranked[np.sort(first)[:n]]
+    return candidates[best].astype(np.int64), candidate_scores[best]
+
+
+@traced
+def get_similar_artists(artist_name, vectors, artists_df, n=20, index=None, lookup=None,
+                        ann_index=None, nprobe=None, weights=None, live=False, graph=None, row_filter=None):
     """
     Find n most similar artists and return their vectors for visualization
+
+    Takes the arguments of similar_rows.
+
+    Returns:
+        tuple or str: Either (similar_vectors, similar_artists_df, similarity_scores) or error message
+    """
+    result = similar_rows(artist_name, vectors, artists_df, n=n, index=index, lookup=lookup,
+                          ann_index=ann_index, nprobe=nprobe, weights=weights, live=live, graph=graph,
+                          row_filter=row_filter)
+    if isinstance(result, str):
+        return result
+    filtered_indices, similarity_scores = result
+    return vectors[filtered_indices], artists_df.iloc[filtered_indices], similarity_scores
+
+
+def similar_rows(artist_name, vectors, artists_df, n=20, index=None, lookup=None,
+                 ann_index=None, nprobe=None, weights=None, live=False, graph=None, row_filter=None):
+    """
+    Rows and scores of the n artists most similar to `artist_name`
     
     Args:
         artist_name (str): Name of the artist to find similarities for
         vectors (np.array): Normalized feature vectors
         artists_df (pd.DataFrame): DataFrame containing artist names
         n (int): Number of similar artists to return (default 20)
-    
+        index (SimilarityIndex): Prebuilt index over `vectors`, built on the fly if None
+        lookup (RowLookup): Index over artists_df['name'] (name groups), built on the fly if None
+        ann_index (IVFIndex): Approximate index over `vectors`; when given, only the
+            probed partitions are scored instead of every item
+        nprobe (int): Partitions probed by ann_index (default: the index's own setting)
+        weights (dict or array): Optional feature weights; the weighted cosine is
+            computed from the unweighted `vectors` and index, no weighted copy is needed
+        live (bool): Score weights from the selected artist's cached per-feature
+            contributions (index.contributions), so re-ranking after a weight change
+            skips the pass over the vectors (default False)
+        graph (KNNGraph): Precomputed neighbours of every row of `vectors`; unweighted
+            searches slice the selected row instead of scoring every item, and fall
+            back to the full scan when the row holds fewer than n other names
+        row_filter (RowFilter): Only rows passing the filter are returned; a selective
+            filter scores only its rows, a broad one masks the full scan (see src.filters)
+
     Returns:
-        tuple or str: Either (similar_vectors, similar_artists_df, similarity_scores) or error message
+        tuple or str: Either (rows int64, similarity_scores), best first, or error message
     """
     try:
         # First ensure vectors and artists_df are aligned
         if len(vectors) != len(artists_df):
             return f"Mismatch between vectors ({len(vectors)}) and artists ({len(artists_df)})"
             
-        # Check if artist exists in DataFrame
-        if artist_name not in artists_df['name'].values:
+        if isinstance(weights, dict):
+            weights = feature_weights(weights) if weights else None
+        
+        # Name groups: every name is a group code, rows sharing a name one group
+        if lookup is None:
+            lookup = RowLookup(artists_df['name'])
+        
+        # Check if artist exists in DataFrame and get its row
+        artist_idx = lookup.first(artist_name)
+        if artist_idx is None:
             return f"Artist '{artist_name}' not found in database"
-            
-        # Get artist index and vector
-        artist_idx = artists_df[artists_df['name'] == artist_name].index[0]
         
         # Verify index is within bounds
         if artist_idx >= len(vectors):
             return f"Artist index {artist_idx} out of bounds for vectors length {len(vectors)}"
         
-        # Calculate similarity matrix
-        similarity_matrix = cosine_similarity(vectors)
-        
-        # Get similarity scores for input artist
-        artist_similarities = similarity_matrix[artist_idx]
-        
-        # Get indices of all artists sorted by similarity
-        sorted_indices = np.argsort(-artist_similarities)
-        
-        # Filter out the original artist and duplicates
-        filtered_indices = []
-        seen_names = set()
-        
-        # Add indices while filtering duplicates
-        for idx in sorted_indices:
-            name = artists_df.iloc[idx]['name']
-            if name != artist_name and name not in seen_names:
-                filtered_indices.append(idx)
-                seen_names.add(name)
+        filtered_indices = None
+        if graph is not None and weights is None:
+            # Precomputed: the row's neighbours are the candidates; the graph stores
+            # float16 scores, so the few candidates are re-scored exactly
+            candidates, _ = graph.neighbors(artist_idx)
+            row_length = len(candidates)
+            if row_filter is not None:
+                candidates = candidates[row_filter.mask[candidates]]
+            if index is not None:
+                candidate_scores = index.unit_vectors[candidates] @ index.unit_vectors[artist_idx]
+            else:
+                unit, _ = normalize_rows(vectors[np.concatenate([[artist_idx], candidates])])
+                candidate_scores = unit[1:] @ unit[0]
+            filtered_indices, similarity_scores = best_per_name(candidates, candidate_scores, lookup,
+                                                                artist_name, n)
+            if len(filtered_indices) < n and row_length < len(vectors) - 1:
+                filtered_indices = None
+
+        if filtered_indices is None and ann_index is not None:
+            # Approximate: score only the rows of the probed partitions
+            candidates, candidate_scores = ann_index.candidates(artist_idx, nprobe=nprobe, weights=weights)
+            if row_filter is not None:
+                passing = row_filter.mask[candidates]
+                candidates, candidate_scores = candidates[passing], candidate_scores[passing]
+            filtered_indices, similarity_scores = best_per_name(candidates, candidate_scores, lookup,
+                                                                artist_name, n)
+        elif filtered_indices is None and row_filter is not None and row_filter.selective:
+            # Selective filter: gather and score only the rows passing it
+            if index is None:
+                index = SimilarityIndex(vectors)
+            candidates = row_filter.rows
+            filtered_indices, similarity_scores = best_per_name(
+                candidates, index.subset_scores(artist_idx, candidates, weights), lookup, artist_name, n)
+        elif filtered_indices is None:
+            # Score the selected artist against every artist (no N x N matrix)
+            if index is None:
+                index = SimilarityIndex(vectors)
+            if live and weights is not None:
+                artist_similarities = index.contributions(artist_idx).scores(weights)
+            else:
+                artist_similarities = index.scores(artist_idx, weights)
+            if row_filter is not None:
+                # broad filter: rows failing it never reach the top n
+                artist_similarities = np.where(row_filter.mask, artist_similarities, -np.inf)
             
-            # Break if we have enough unique artists
-            if len(filtered_indices) >= n:
-                break
-                
-        # Convert to numpy array and take first n
-        filtered_indices = np.array(filtered_indices[:n])
-        
-        # Get vectors and names for similar artists
-        similar_vectors = vectors[filtered_indices]
-        similar_artists = artists_df.iloc[filtered_indices]
-        similarity_scores = artist_similarities[filtered_indices]
+            # Duplicate names collapse to their best-scoring row, the original
+            # artist's name is dropped, and the top n names come out of one pass
+            best_scores, best_rows = lookup.group_max(artist_similarities)
+            best_scores[lookup.codes[artist_name]] = -np.inf
+            groups = top_k(best_scores, n)
+            groups = groups[np.isfinite(best_scores[groups])]
+            if len(groups):
+                # equal scores rank by row, like the stable sort over rows did
+                groups = np.flatnonzero(best_scores >= best_scores[groups[-1]])
+                groups = groups[np.lexsort((best_rows[groups], -best_scores[groups]))][:n]
+            filtered_indices = best_rows[groups].astype(np.int64)
+            similarity_scores = artist_similarities[filtered_indices]
         
-        return similar_vectors, similar_artists, similarity_scores
+        return filtered_indices, similarity_scores
         
     except Exception as e:
         return f"Error processing artist '{artist_name}': {str(e)}"
     
 
-def vectorize_artist_features(artist_features):
+@traced
+def vectorize_artist_features(artist_features, return_scaler=False):
     """
     Vectorize artist features for similarity calculation.
     
     Args:
         artist_features (pd.DataFrame): DataFrame with artist features
+        return_scaler (bool): Also return the fitted MinMaxScaler (default False)
         
     Returns:
         tuple: (normalized vectors, cleaned DataFrame)
             - normalized vectors: numpy array of normalized features
             - cleaned DataFrame: DataFrame with same indices as vectors
+            - scaler: fitted MinMaxScaler, only when return_scaler is True
     """
     # Define features to use
     features_to_normalize = ['danceability', 'energy', 'acousticness', 'instrumentalness',
@@ -238,12 +407,45 @@ def vectorize_artist_features(artist_features):
     # Create clean DataFrame with same index as vectors
     cleaned_df = artist_features.reset_index(drop=True)
     
+    if return_scaler:
+        return vectors_normalized, cleaned_df, scaler
     return vectors_normalized, cleaned_df
 
+def feature_weights(weights):
+    """
+    Weight per feature as an array in vector column order
+    
+    Args:
+        weights (dict): Feature name -> weight, unlisted features weigh 1
+        
+    Returns:
+        np.array: One weight per feature column
+    """
+    available_features = ['danceability', 'energy', 'acousticness', 
+                         'instrumentalness', 'liveness', 'valence', 
+                         'speechiness', 'key', 'mode', 'tempo', 
+                         'time_signature']
+    
+    # Validate weights
+    invalid_features = [f for f in weights.keys() if f not in available_features]
+    if invalid_features:
+        raise ValueError(f"Invalid features in weights: {invalid_features}")
+    
+    # Create weight array in same order as features
+    weight_array = np.ones(len(available_features))
+    for i, feature in enumerate(available_features):
+        if feature in weights:
+            weight_array[i] = weights[feature]
+    return weight_array
+
+@traced
 def apply_feature_weights(vectors, weights=None):
     """
     Apply weights to feature vectors
     
+    Prefer passing weights to get_similar_artists, which weighs the query
+    instead of copying the vectors.
+    
     Args:
         vectors (pd.DataFrame): Feature vectors
         weights (dict): Dictionary of feature weights, default None
@@ -268,16 +470,7 @@ def apply_feature_weights(vectors, weights=None):
     if weights is None:
         return vectors
     
-    # Validate weights
-    invalid_features = [f for f in weights.keys() if f not in available_features]
-    if invalid_features:
-        raise ValueError(f"Invalid features in weights: {invalid_features}")
-    
-    # Create weight array in same order as features
-    weight_array = np.ones(len(available_features))
-    for i, feature in enumerate(available_features):
-        if feature in weights:
-            weight_array[i] = weights[feature]
+    weight_array = feature_weights(weights)
     
     # Apply weights
     weighted_vectors = vectors * weight_array
@@ -306,6 +499,27 @@ def get_artist_sample(vectors, artists_df, sample_size=30):
     
     return vectors_sample, artists_sample
 
+def selected_weights(features, neutral=1):
+    """
+    Feature weights set on the weight sliders, read from the session state.
+
+    Widget values are in the session state before the sliders are drawn, so
+    a rerun knows which weights its recommendations use up front.
+
+    Args:
+        features (list): Features with a weight slider
+        neutral (float): Slider value that leaves a feature unweighted (default 1)
+
+    Returns:
+        dict: Weight of every feature whose slider is not at neutral
+    """
+    weights = {}
+    for feature in features:
+        weight = st.session_state.get(f"weight_{feature}", neutral)
+        if weight != neutral:
+            weights[feature] = weight
+    return weights
+
 def reset_weights_callback():
     """Simple callback to reset all weight-related state"""
     # Reset weights dictionary
@@ -316,8 +530,9 @@ def reset_weights_callback():
         if key.startswith('weight_'):
             del st.session_state[key]
 
-    # Reset vectors to original state (no weights applied)
-    st.session_state.vectors = st.session_state.get('original_vectors', None)
+    # Drop the weights applied to the searches
+    for key in ['song_weights', 'artist_weights']:
+        st.session_state.pop(key, None)
 
 
     # Add this at the top of your home.py file
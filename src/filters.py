@@ -0,0 +1,192 @@
+"""
+Filters of the similarity search, as boolean masks over the vector store rows.
+
+The columns filters read are extracted once per kind (FilterIndex): the
+release year as int16, the explicit flag and one boolean mask per album type
+(bitmap indexes), and the popularity (for a track, the highest popularity
+of its credited artists). A filter combines them into a RowFilter, the mask
+plus the rows passing it, kept for the most recent MAX_FILTERS filters.
+
+similar_rows applies a RowFilter inside the scan: a selective filter (at
+most SUBSET_SHARE of the rows) scores only its rows, a broad one masks the
+full scan. The top n are exact either way, without over-fetching and
+post-filtering.
+
+Filters are dicts with any of:
+    year_min, year_max (int)  release year range, inclusive (tracks)
+    explicit (bool)           False keeps only non-explicit tracks
+    album_types (tuple)       album types kept, e.g. ('album', 'single') (tracks)
+    min_popularity (int)      minimum popularity, 0-100 (artist popularity for tracks)
+"""
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from src.data_processing import load_catalog
+from src.tracing import traced
+from src.vector_store import load_item_frame
+
+
+# below this share of rows, gathering and scoring only the passing rows beats masking a full scan
+SUBSET_SHARE = 0.3
+MAX_FILTERS = 32
+# year of rows without a release date; no year range keeps them
+NO_YEAR = -1
+
+
+class RowFilter:
+    """
+    Rows passing one filter.
+
+    Args:
+        filters (dict): The filter, with every value hashable (see normalize_filters)
+        mask (np.array): True for every passing row
+    """
+
+    def __init__(self, filters, mask):
+        self.filters = filters
+        self.mask = mask
+        self.rows = np.flatnonzero(mask)
+        self.share = len(self.rows) / len(mask) if len(mask) else 0.0
+        # few enough rows to score them alone
+        self.selective = self.share <= SUBSET_SHARE
+
+    def __len__(self):
+        return len(self.rows)
+
+
+def normalize_filters(filters):
+    """
+    Drop unset filters and make the rest hashable.
+
+    Returns:
+        dict: The active filters (album_types as a sorted tuple), empty for none
+    """
+    active = {}
+    for name, value in (filters or {}).items():
+        if value is None or (name == 'explicit' and value) or (name == 'min_popularity' and value <= 0):
+            continue
+        active[name] = tuple(sorted(value)) if name == 'album_types' else value
+    return active
+
+
+class FilterIndex:
+    """
+    Filterable columns of the rows of one kind, aligned with the vector store.
+
+    Args:
+        items (pd.DataFrame): Rows of load_item_frame; 'release_date', 'explicit'
+            and 'album_type' are indexed when present
+        popularity (array-like): Popularity of every row, NaN when unknown
+    """
+
+    def __init__(self, items, popularity=None):
+        self.n_rows = len(items)
+        self.year = None
+        self.explicit = None
+        self.album_types = {}
+        self.popularity = None
+
+        if 'release_date' in items:
+            years = pd.to_numeric(items['release_date'].str[:4], errors='coerce')
+            self.year = years.fillna(NO_YEAR).to_numpy(dtype=np.int16)
+        if 'explicit' in items:
+            self.explicit = items['explicit'].fillna(False).to_numpy(dtype=bool)
+        if 'album_type' in items:
+            album_type = items['album_type'].astype('category')
+            self.album_types = {str(name): (album_type == name).to_numpy(dtype=bool)
+                                for name in album_type.cat.categories}
+        if popularity is not None:
+            self.popularity = pd.Series(popularity).fillna(-1).to_numpy(dtype=np.int16)
+
+        self._filters = OrderedDict()
+        self._lock = threading.Lock()
+
+    def year_range(self):
+        """(first, last) release year of the rows, None without release dates"""
+        if self.year is None or not (self.year != NO_YEAR).any():
+            return None
+        years = self.year[self.year != NO_YEAR]
+        return int(years.min()), int(years.max())
+
+    def mask(self, filters):
+        """
+        Rows passing every filter.
+
+        Args:
+            filters (dict): Active filters from normalize_filters
+
+        Returns:
+            np.array: One bool per row
+        """
+        mask = np.ones(self.n_rows, dtype=bool)
+        for name, value in filters.items():
+            if name == 'year_min':
+                mask &= self.year >= value
+            elif name == 'year_max':
+                mask &= (self.year <= value) & (self.year != NO_YEAR)
+            elif name == 'explicit':
+                mask &= ~self.explicit
+            elif name == 'album_types':
+                kept = np.zeros(self.n_rows, dtype=bool)
+                for album_type in value:
+                    if album_type in self.album_types:
+                        kept |= self.album_types[album_type]
+                mask &= kept
+            elif name == 'min_popularity':
+                mask &= self.popularity >= value
+            else:
+                raise ValueError(f"Unknown filter: {name}")
+        return mask
+
+    def row_filter(self, filters):
+        """
+        RowFilter of `filters`, None when no filter is set.
+
+        Args:
+            filters (dict): Filters, unset ones (None, explicit=True,
+                min_popularity=0) are ignored
+
+        Returns:
+            RowFilter or None
+        """
+        filters = normalize_filters(filters)
+        if not filters:
+            return None
+        key = tuple(sorted(filters.items()))
+        with self._lock:
+            if key in self._filters:
+                self._filters.move_to_end(key)
+                return self._filters[key]
+
+        row_filter = RowFilter(filters, self.mask(filters))
+
+        with self._lock:
+            self._filters[key] = row_filter
+            while len(self._filters) > MAX_FILTERS:
+                self._filters.popitem(last=False)
+        return row_filter
+
+
+@st.cache_resource
+@traced
+def load_filter_index(kind):
+    """
+    FilterIndex over the rows of load_item_frame(kind), built once per process.
+
+    Args:
+        kind (str): 'track' or 'artist'
+    """
+    items = load_item_frame(kind)
+    if kind == 'artist':
+        return FilterIndex(items, items['popularity'])
+
+    # a track is as popular as its most popular credited artist
+    tracks, mapping, artists, audio_features = load_catalog()
+    credits = mapping.merge(artists[['artist_id', 'popularity']], on='artist_id')
+    popularity = credits.groupby('track_id', observed=True)['popularity'].max()
+    popularity.index = popularity.index.astype(str)
+    return FilterIndex(items, popularity.reindex(items['track_id'].astype(str)).to_numpy(dtype=np.float64))
@@ -0,0 +1,199 @@
+"""
+Precomputed k-nearest-neighbour graphs of every track and every artist.
+
+The unweighted top-k neighbours of every row are computed offline with
+blocked matrix multiplications (SimilarityIndex.query_batch) spread over
+several processes, each memory-mapping the unit vectors of the vector store.
+The graph is saved next to the store arrays as a CSR matrix: row offsets
+({kind}_knn_indptr.npy, int64), neighbour rows ({kind}_knn_indices.npy,
+int32) and cosine similarities ({kind}_knn_scores.npy, float16), plus
+knn.json with the build parameters and timings. Neighbours are stored best
+first, so an unweighted "similar items" search slices one row.
+
+float16 keeps about three significant digits, enough to order and plot the
+neighbours; the rows shown on the recommendation pages are re-scored exactly.
+
+Like the global layouts, the graph is a separate step from the vector store
+build. Run it from the repository root with:
+    python -m src.knn_graph
+"""
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import streamlit as st
+
+from src.similarity import SimilarityIndex
+from src.vector_store import KINDS, open_vector_store
+
+
+KNN_INFO = 'knn.json'
+# neighbours kept per row: the pages show 20 names, the rest covers rows
+# sharing a name, which collapse to one recommendation
+DEFAULT_K = 64
+ROWS_PER_TASK = 8192
+
+
+def graph_files(path, kind):
+    """indptr, indices and scores paths of the graph of 'track' or 'artist'"""
+    return [os.path.join(path, f'{kind}_knn_{name}.npy') for name in ['indptr', 'indices', 'scores']]
+
+
+def neighbour_block(unit_path, norms_path, start, stop, k, memory_budget_mb=64):
+    """
+    Top-k neighbours of rows start:stop, run in a worker process.
+
+    Args:
+        unit_path (str): .npy file of the unit vectors, memory-mapped
+        norms_path (str): .npy file of the row norms, memory-mapped
+        start (int): First query row
+        stop (int): End of the query rows (exclusive)
+        k (int): Neighbours per row
+        memory_budget_mb (float): Working memory of one scoring block (default 64)
+
+    Returns:
+        tuple: (start, indices int32, scores float16), arrays of shape (stop - start, k)
+    """
+    index = SimilarityIndex.from_unit_vectors(np.load(unit_path, mmap_mode='r'),
+                                              np.load(norms_path, mmap_mode='r'))
+    indices, scores = index.query_batch(np.arange(start, stop), k=k, memory_budget_mb=memory_budget_mb)
+    return start, indices, scores.astype(np.float16)
+
+
+def build_knn_graph(unit_path, norms_path, k=DEFAULT_K, n_jobs=None, rows_per_task=ROWS_PER_TASK):
+    """
+    Compute the top-k neighbour graph of a matrix of unit vectors.
+
+    Args:
+        unit_path (str): .npy file of the unit vectors
+        norms_path (str): .npy file of the row norms
+        k (int): Neighbours per row (default DEFAULT_K)
+        n_jobs (int): Worker processes, all CPUs if None; 1 runs in this process
+        rows_per_task (int): Query rows handed to a worker at a time (default ROWS_PER_TASK)
+
+    Returns:
+        tuple: (indptr int64, indices int32, scores float16) of the CSR graph,
+        neighbours of every row sorted best first, the row itself excluded
+    """
+    n_rows = len(np.load(unit_path, mmap_mode='r'))
+    n_jobs = n_jobs or os.cpu_count() or 1
+    k = min(k, max(n_rows - 1, 0))
+    indices = np.empty((n_rows, k), dtype=np.int32)
+    scores = np.empty((n_rows, k), dtype=np.float16)
+
+    tasks = [(start, min(start + rows_per_task, n_rows)) for start in range(0, n_rows, rows_per_task)]
+    args = [[unit_path] * len(tasks), [norms_path] * len(tasks),
+            [start for start, _ in tasks], [stop for _, stop in tasks], [k] * len(tasks)]
+    if n_jobs == 1:
+        blocks = map(neighbour_block, *args)
+        executor = None
+    else:
+        executor = ProcessPoolExecutor(max_workers=n_jobs)
+        blocks = executor.map(neighbour_block, *args)
+    try:
+        for start, block_indices, block_scores in blocks:
+            indices[start:start + len(block_indices)] = block_indices
+            scores[start:start + len(block_scores)] = block_scores
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    # k is capped at n_rows - 1, so every row has exactly k neighbours
+    indptr = np.arange(n_rows + 1, dtype=np.int64) * k
+    return indptr, indices.reshape(-1), scores.reshape(-1)
+
+
+def build_graphs(store, kinds=KINDS, k=DEFAULT_K, n_jobs=None):
+    """
+    Build the neighbour graphs and save them with the vector store.
+
+    Each array is written to a temporary file and renamed into place, so
+    readers never see a partial graph.
+
+    Args:
+        store (VectorStore): Store whose vectors are searched
+        kinds (list): Entity kinds to build (default all)
+        k (int): Neighbours per row (default DEFAULT_K)
+        n_jobs (int): Worker processes, all CPUs if None
+
+    Returns:
+        dict: kind -> {'rows', 'k', 'seconds', 'processes', 'bytes'}
+    """
+    info_path = os.path.join(store.path, KNN_INFO)
+    info = {}
+    if os.path.exists(info_path):
+        with open(info_path) as f:
+            info = json.load(f)
+
+    n_jobs = n_jobs or os.cpu_count() or 1
+    for kind in kinds:
+        start = time.perf_counter()
+        arrays = build_knn_graph(os.path.join(store.path, f'{kind}_unit.npy'),
+                                 os.path.join(store.path, f'{kind}_norms.npy'), k=k, n_jobs=n_jobs)
+        seconds = time.perf_counter() - start
+
+        for path, array in zip(graph_files(store.path, kind), arrays):
+            np.save(path + '.tmp.npy', array)
+            os.replace(path + '.tmp.npy', path)
+        info[kind] = {'rows': int(len(arrays[0]) - 1), 'k': int(k), 'seconds': seconds,
+                      'processes': int(n_jobs), 'bytes': int(sum(array.nbytes for array in arrays))}
+
+    with open(info_path + '.tmp', 'w') as f:
+        json.dump(info, f, indent=2)
+    os.replace(info_path + '.tmp', info_path)
+    return info
+
+
+class KNNGraph:
+    """
+    Read-only neighbour graph in CSR form.
+
+    Row i's neighbours are indices[indptr[i]:indptr[i + 1]], best first, with
+    their cosine similarities at the same positions of scores.
+    """
+
+    def __init__(self, indptr, indices, scores):
+        self.indptr = indptr
+        self.indices = indices
+        self.scores = scores
+
+    def __len__(self):
+        return len(self.indptr) - 1
+
+    def neighbors(self, row):
+        """
+        Neighbours of one row.
+
+        Args:
+            row (int): Row in the vector store
+
+        Returns:
+            tuple: (rows int64, scores float32), best first
+        """
+        start, stop = self.indptr[row], self.indptr[row + 1]
+        return (np.asarray(self.indices[start:stop], dtype=np.int64),
+                np.asarray(self.scores[start:stop], dtype=np.float32))
+
+
+def load_graph(store, kind):
+    """Memory-mapped neighbour graph of 'track' or 'artist', or None if not built"""
+    paths = graph_files(store.path, kind)
+    if not all(os.path.exists(path) for path in paths):
+        return None
+    return KNNGraph(*(np.load(path, mmap_mode='r') for path in paths))
+
+
+@st.cache_resource
+def load_knn_graph(kind):
+    """Process-wide neighbour graph of 'track' or 'artist' (see load_graph)"""
+    return load_graph(open_vector_store(), kind)
+
+
+if __name__ == '__main__':
+    store = open_vector_store()
+    for kind, row in build_graphs(store).items():
+        print(f"{kind}: {row['rows']} rows x {row['k']} neighbours in {row['seconds']:.1f}s "
+              f"on {row['processes']} processes ({row['bytes'] / 1e6:.1f} MB)")
+    print(f"saved with {store.version} at {store.path}")
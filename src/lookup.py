@@ -0,0 +1,82 @@
+import numpy as np
+import pandas as pd
+
+
+
+class RowLookup:
+    """
+    Hash index from the values of one column to the row positions holding them.
+
+    Built once in O(N); afterwards a lookup is one dict access plus an array
+    slice, instead of a boolean-mask scan over the whole column. Values that
+    appear on several rows (e.g. duplicate song names) map to all of them,
+    in row order.
+    """
+
+    def __init__(self, values):
+        codes, uniques = pd.factorize(values)
+        # key code of every row (-1 for missing keys)
+        self.row_codes = codes
+        # rows grouped by value, each group in original row order
+        self.order = np.argsort(codes, kind='stable').astype(np.int64)
+        sorted_codes = codes[self.order]
+        self.starts = np.searchsorted(sorted_codes, np.arange(len(uniques) + 1))
+        self.codes = dict(zip(np.asarray(uniques, dtype=object).tolist(), range(len(uniques))))
+
+    def __contains__(self, key):
+        return key in self.codes
+
+    def __len__(self):
+        return len(self.codes)
+
+    def rows(self, key):
+        """All row positions holding `key` (empty array if absent)"""
+        code = self.codes.get(key)
+        if code is None:
+            return self.order[:0]
+        return self.order[self.starts[code]:self.starts[code + 1]]
+
+    def first(self, key):
+        """First row position holding `key`, or None if absent"""
+        code = self.codes.get(key)
+        if code is None:
+            return None
+        return int(self.order[self.starts[code]])
+
+    def group_max(self, values):
+        """
+        Largest value per key, in one vectorized pass over the rows.
+
+        Args:
+            values (np.array): One value per row of the indexed column
+
+        Returns:
+            tuple: (maxima, rows) indexed by key code (see self.codes): the
+            largest value of each key and the first row position holding it
+        """
+        # rows with a missing key sort first and belong to no group
+        skip = self.starts[0]
+        grouped = np.asarray(values)[self.order[skip:]]
+        offsets = self.starts[:-1] - skip
+        maxima = np.maximum.reduceat(grouped, offsets)
+
+        # first position of each group equal to its maximum; groups are contiguous
+        # and in row order, so the first hit per group is the lowest row
+        positions = np.flatnonzero(grouped == np.repeat(maxima, np.diff(self.starts)))
+        groups = np.searchsorted(offsets, positions, side='right') - 1
+        first = positions[np.searchsorted(groups, np.arange(len(maxima)))]
+        return maxima, self.order[skip + first]
+
+
+def build_lookups(frame, columns):
+    """
+    Build a RowLookup for each of the given columns.
+
+    Args:
+        frame (pd.DataFrame): Frame to index, positions refer to its row order
+        columns (list): Column names to index
+
+    Returns:
+        dict: Column name -> RowLookup
+    """
+    return {column: RowLookup(frame[column]) for column in columns}
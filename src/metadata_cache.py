@@ -0,0 +1,214 @@
+"""
+On-disk cache of the Spotify metadata shown on the cards.
+
+Track names, cover URLs and artist followers/popularity rarely change, so the
+parsed card fields are kept in a SQLite file keyed by (kind, id). Entries
+expire after a per-kind TTL, and the least recently used entries are evicted
+once the cache holds more than `max_entries`. The file survives app restarts
+and is shared by every session and process using the same path.
+
+Lookups only read the file: a hit refreshes the entry's access time only when
+it is older than `touch_interval`, and hits and misses are counted in memory
+and written in batches (with the next put, every COUNTER_FLUSH lookups and
+on close), so page renders served from the cache do not queue for SQLite's
+write lock. Eviction is least recently used to within `touch_interval`.
+
+Hit, miss and eviction counters are stored alongside the entries, so they
+cover every process using the file. Print them with:
+    python -m src.metadata_cache
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+CACHE_PATH = os.environ.get('METADATA_CACHE_PATH', 'data/cache/metadata.sqlite')
+
+# seconds an entry stays fresh; follower counts and popularity move faster than track names
+TTL = {
+    'track': 30 * 24 * 3600,
+    'artist': 24 * 3600,
+}
+MAX_ENTRIES = 100_000
+# a hit rewrites accessed_at only when it is older than this (seconds)
+TOUCH_INTERVAL = 3600
+# lookups counted in memory before the counters are written
+COUNTER_FLUSH = 1000
+
+# SQLite limits the number of parameters bound to one statement
+MAX_PARAMS = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    kind TEXT NOT NULL,
+    id TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    stored_at REAL NOT NULL,
+    accessed_at REAL NOT NULL,
+    PRIMARY KEY (kind, id)
+);
+CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at);
+CREATE TABLE IF NOT EXISTS counters (
+    kind TEXT PRIMARY KEY,
+    hits INTEGER NOT NULL DEFAULT 0,
+    misses INTEGER NOT NULL DEFAULT 0,
+    evictions INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+
+class MetadataCache:
+    """
+    SQLite-backed TTL + LRU cache of JSON-serializable records.
+
+    Args:
+        path (str): SQLite file, created if missing (default CACHE_PATH)
+        ttl (dict): Seconds an entry of each kind stays fresh (default TTL)
+        max_entries (int): Entries kept before least recently used ones are evicted
+            (default MAX_ENTRIES)
+        clock (callable): Returns the current time in seconds (default time.time)
+        touch_interval (float): Age of accessed_at before a hit refreshes it
+            (default TOUCH_INTERVAL)
+    """
+
+    def __init__(self, path=CACHE_PATH, ttl=None, max_entries=MAX_ENTRIES, clock=time.time,
+                 touch_interval=TOUCH_INTERVAL):
+        self.path = path
+        self.ttl = dict(TTL, **(ttl or {}))
+        self.max_entries = max_entries
+        self.clock = clock
+        self.touch_interval = touch_interval
+        # kind -> [hits, misses] not written to the counters table yet
+        self._pending = {}
+
+        if path != ':memory:':
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        # one connection shared by the threads of a process, serialized by the lock
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            # WAL lets app processes read while another one writes
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.executescript(SCHEMA)
+
+    def get_many(self, kind, ids):
+        """
+        Look up fresh entries.
+
+        Args:
+            kind (str): Entity kind, e.g. 'track' or 'artist'
+            ids (list): Ids to look up
+
+        Returns:
+            dict: id -> record for every id with a fresh entry (None for an
+            entry stored as None, e.g. an id the API does not know); missing
+            or expired ids are left out and counted as misses
+        """
+        ids = list(dict.fromkeys(str(i) for i in ids))
+        now = self.clock()
+        oldest = now - self.ttl.get(kind, min(self.ttl.values()))
+        records = {}
+        stale = []
+        with self._lock:
+            for start in range(0, len(ids), MAX_PARAMS):
+                chunk = ids[start:start + MAX_PARAMS]
+                marks = ','.join('?' * len(chunk))
+                rows = self._conn.execute(
+                    f'SELECT id, payload, accessed_at FROM entries '
+                    f'WHERE kind = ? AND stored_at >= ? AND id IN ({marks})',
+                    [kind, oldest, *chunk]).fetchall()
+                records.update((id_, json.loads(payload)) for id_, payload, _ in rows)
+                stale.extend(id_ for id_, _, accessed_at in rows if accessed_at < now - self.touch_interval)
+            pending = self._pending.setdefault(kind, [0, 0])
+            pending[0] += len(records)
+            pending[1] += len(ids) - len(records)
+            # most lookups end here without writing
+            if stale or sum(sum(counts) for counts in self._pending.values()) >= COUNTER_FLUSH:
+                with self._conn:
+                    # a hit makes the entry the most recently used
+                    self._conn.executemany('UPDATE entries SET accessed_at = ? WHERE kind = ? AND id = ?',
+                                           [(now, kind, id_) for id_ in stale])
+                    self._flush_counts()
+        return records
+
+    def put_many(self, kind, records):
+        """
+        Store records, replacing existing entries, then evict down to max_entries.
+
+        Args:
+            kind (str): Entity kind, e.g. 'track' or 'artist'
+            records (dict): id -> JSON-serializable record, None for a negative entry
+        """
+        now = self.clock()
+        rows = [(kind, str(id_), json.dumps(record), now, now) for id_, record in records.items()]
+        with self._lock, self._conn:
+            self._conn.executemany('INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)', rows)
+            self._evict()
+            self._flush_counts()
+
+    def _evict(self):
+        excess = self._conn.execute('SELECT COUNT(*) FROM entries').fetchone()[0] - self.max_entries
+        if excess <= 0:
+            return
+        evicted = self._conn.execute(
+            'SELECT rowid, kind FROM entries ORDER BY accessed_at LIMIT ?', (excess,)).fetchall()
+        self._conn.executemany('DELETE FROM entries WHERE rowid = ?', [(rowid,) for rowid, _ in evicted])
+        for kind in {kind for _, kind in evicted}:
+            self._count(kind, evictions=sum(1 for _, k in evicted if k == kind))
+
+    def _flush_counts(self):
+        """Write the hits and misses counted in memory (inside a transaction)"""
+        for kind, (hits, misses) in self._pending.items():
+            self._count(kind, hits=hits, misses=misses)
+        self._pending.clear()
+
+    def _count(self, kind, hits=0, misses=0, evictions=0):
+        self._conn.execute(
+            'INSERT INTO counters (kind, hits, misses, evictions) VALUES (?, ?, ?, ?) '
+            'ON CONFLICT (kind) DO UPDATE SET hits = hits + excluded.hits, '
+            'misses = misses + excluded.misses, evictions = evictions + excluded.evictions',
+            (kind, hits, misses, evictions))
+
+    def stats(self):
+        """
+        Entry counts and counters per kind.
+
+        Returns:
+            dict: kind -> {'entries', 'hits', 'misses', 'evictions', 'hit_rate'}
+        """
+        with self._lock:
+            with self._conn:
+                self._flush_counts()
+            entries = dict(self._conn.execute('SELECT kind, COUNT(*) FROM entries GROUP BY kind').fetchall())
+            counters = self._conn.execute('SELECT kind, hits, misses, evictions FROM counters').fetchall()
+        stats = {kind: {'entries': count, 'hits': 0, 'misses': 0, 'evictions': 0, 'hit_rate': None}
+                 for kind, count in entries.items()}
+        for kind, hits, misses, evictions in counters:
+            lookups = hits + misses
+            stats[kind] = {'entries': entries.get(kind, 0), 'hits': hits, 'misses': misses,
+                           'evictions': evictions, 'hit_rate': hits / lookups if lookups else None}
+        return stats
+
+    def clear(self):
+        """Drop every entry and reset the counters"""
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM entries')
+            self._conn.execute('DELETE FROM counters')
+            self._pending.clear()
+
+    def close(self):
+        with self._lock:
+            with self._conn:
+                self._flush_counts()
+            self._conn.close()
+
+
+if __name__ == '__main__':
+    cache = MetadataCache()
+    print(cache.path)
+    for kind, row in sorted(cache.stats().items()):
+        hit_rate = '-' if row['hit_rate'] is None else f"{row['hit_rate']:.1%}"
+        print(f"{kind}: {row['entries']} entries, {row['hits']} hits, {row['misses']} misses, "
+              f"{row['evictions']} evictions, hit rate {hit_rate}")
@@ -0,0 +1,198 @@
+"""
+Precomputed 2-D layouts for the similarity-space plots.
+
+One global t-SNE layout per entity kind is fitted offline over every track and
+every artist and saved next to the vector store arrays ({kind}_layout.npy,
+plus layout.json with the fit parameters and timings). A plot then slices the
+rows of the query and its neighbours instead of fitting t-SNE on every render.
+
+A fast local refinement (a short t-SNE on just the plotted rows, started from
+their global coordinates) can adapt the slice to weighted vectors. Results are
+cached per store version, rows and weight vector. Without a global layout
+the plotted rows are fitted from scratch, as before.
+
+The global fit takes minutes on the full catalog, so it is a separate step
+from the vector store build. Run it from the repository root with:
+    python -m src.projection
+"""
+import json
+import os
+import time
+
+import numpy as np
+import streamlit as st
+from sklearn.manifold import TSNE
+from sklearn.preprocessing import StandardScaler
+
+from src.tracing import traced
+from src.vector_store import KINDS, open_vector_store
+
+
+LAYOUT_INFO = 'layout.json'
+
+# sklearn runs 250 early-exaggeration iterations before the regular ones
+REFINE_ITER = 300
+
+
+def layout_file(store, kind):
+    return os.path.join(store.path, f'{kind}_layout.npy')
+
+
+@traced
+def fit_layout(vectors, max_iter=1000, random_state=42):
+    """
+    Fit a 2-D t-SNE layout of standardized vectors.
+
+    Args:
+        vectors (np.array): Item vectors, one row per item
+        max_iter (int): t-SNE iterations (default 1000)
+        random_state (int): Seed (default 42)
+
+    Returns:
+        np.array: (n, 2) float32 coordinates
+    """
+    vectors_scaled = StandardScaler().fit_transform(vectors)
+    tsne = TSNE(
+        n_components=2,
+        random_state=random_state,
+        perplexity=min(30, len(vectors) - 1),
+        max_iter=max_iter
+    )
+    return tsne.fit_transform(vectors_scaled).astype(np.float32)
+
+
+def build_layouts(store, kinds=KINDS):
+    """
+    Fit the global layouts and save them with the vector store.
+
+    Each array is written to a temporary file and renamed into place, so
+    readers never see a partial layout.
+
+    Args:
+        store (VectorStore): Store whose vectors are laid out
+        kinds (list): Entity kinds to lay out (default all)
+
+    Returns:
+        dict: kind -> {'rows', 'seconds', 'max_iter'}
+    """
+    info_path = os.path.join(store.path, LAYOUT_INFO)
+    info = {}
+    if os.path.exists(info_path):
+        with open(info_path) as f:
+            info = json.load(f)
+
+    for kind in kinds:
+        start = time.perf_counter()
+        coords = fit_layout(np.asarray(getattr(store, f'{kind}_vectors')))
+        seconds = time.perf_counter() - start
+
+        tmp_path = layout_file(store, kind) + '.tmp.npy'
+        np.save(tmp_path, coords)
+        os.replace(tmp_path, layout_file(store, kind))
+        info[kind] = {'rows': int(len(coords)), 'seconds': seconds, 'max_iter': 1000}
+
+    with open(info_path + '.tmp', 'w') as f:
+        json.dump(info, f, indent=2)
+    os.replace(info_path + '.tmp', info_path)
+    return info
+
+
+def load_layout(store, kind):
+    """Memory-mapped global layout of 'track' or 'artist', or None if not built"""
+    path = layout_file(store, kind)
+    if not os.path.exists(path):
+        return None
+    return np.load(path, mmap_mode='r')
+
+
+@traced
+def refine_layout(coords, vectors, max_iter=REFINE_ITER, random_state=42):
+    """
+    Adjust a slice of the global layout to the given vectors with a short t-SNE.
+
+    Args:
+        coords (np.array): (n, 2) starting coordinates, e.g. sliced from the global layout
+        vectors (np.array): Vectors of the same n items, already scaled
+        max_iter (int): t-SNE iterations, at least 250 (default REFINE_ITER)
+        random_state (int): Seed (default 42)
+
+    Returns:
+        np.array: (n, 2) float32 coordinates
+    """
+    coords = np.asarray(coords, dtype=np.float64)
+    # same starting scale sklearn gives its own initializations
+    spread = np.std(coords[:, 0]) or 1.0
+    init = (coords - coords.mean(axis=0)) / spread * 1e-4
+    tsne = TSNE(
+        n_components=2,
+        random_state=random_state,
+        perplexity=min(30, len(vectors) - 1),
+        max_iter=max_iter,
+        init=init
+    )
+    return tsne.fit_transform(vectors).astype(np.float32)
+
+
+@st.cache_resource
+def feature_scaling(kind):
+    """Catalog-wide mean and std of every feature of 'track' or 'artist' vectors"""
+    vectors = np.asarray(getattr(open_vector_store(), f'{kind}_vectors'), dtype=np.float64)
+    std = vectors.std(axis=0)
+    std[std == 0] = 1
+    return vectors.mean(axis=0), std
+
+
+def weight_vector(weights, features):
+    """
+    Weights as a tuple in feature order (1.0 for unweighted features),
+    the cache key of weighted layouts.
+    """
+    weights = weights or {}
+    return tuple(float(weights.get(feature, 1.0)) for feature in features)
+
+
+@st.cache_data(max_entries=256)
+@traced
+def layout_coords(version, kind, rows, weights=None, refine=False):
+    """
+    2-D coordinates of the given rows for the similarity-space plot.
+
+    Args:
+        version (str): Vector store version, part of the cache key
+        kind (str): 'track' or 'artist'
+        rows (tuple): Row positions in the store
+        weights (tuple): Weight vector from weight_vector(), None for unweighted
+        refine (bool): Refine the global slice locally (default False); weighted
+            rows are always refined, the global layout is unweighted
+
+    Returns:
+        np.array: (len(rows), 2) coordinates
+    """
+    store = open_vector_store()
+    rows = np.asarray(rows, dtype=np.int64)
+    vectors = np.asarray(getattr(store, f'{kind}_vectors')[rows], dtype=np.float64)
+    weighted = weights is not None and any(weight != 1.0 for weight in weights)
+
+    layout = load_layout(store, kind)
+    if layout is None:
+        # no global layout built: fit the plotted rows alone
+        return fit_layout(vectors)
+
+    coords = np.asarray(layout[rows])
+    if not (refine or weighted):
+        return coords
+
+    # standardize against the whole catalog, not the plotted rows, so the
+    # weights still stretch their features afterwards
+    mean, std = feature_scaling(kind)
+    vectors = (vectors - mean) / std
+    if weighted:
+        vectors = vectors * np.asarray(weights)
+    return refine_layout(coords, vectors)
+
+
+if __name__ == '__main__':
+    store = open_vector_store()
+    for kind, row in build_layouts(store).items():
+        print(f"{kind}: {row['rows']} rows laid out in {row['seconds']:.1f}s")
+    print(f"saved with {store.version} at {store.path}")
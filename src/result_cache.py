@@ -0,0 +1,216 @@
+"""
+In-process LRU cache of recommendation results.
+
+Popular songs and artists are looked up again and again with the default
+weights. Their results are kept as compact arrays (int32 rows and float32
+scores, about 200 bytes for 20 recommendations), keyed by (kind, item id,
+normalized weights, n, filters). Weights are normalized so that weights
+differing only by a common factor share an entry; the weighted cosine does
+not change when every weight is scaled. Uniform weights share the entry of
+the unweighted search.
+
+One cache per process is shared by every session (load_result_cache). The
+least recently used entries are evicted beyond `max_bytes`, and every entry
+is dropped when the vector store version changes, since rows and scores
+belong to one version. RESULT_CACHE_MB sets the budget (default 64).
+"""
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import streamlit as st
+
+from src.data_processing import feature_weights, similar_rows
+from src.lookup import RowLookup
+from src.tracing import traced
+
+
+MAX_BYTES = int(float(os.environ.get('RESULT_CACHE_MB', 64)) * 1e6)
+# bytes charged per entry on top of its arrays: key tuple, dict slot, array headers
+ENTRY_OVERHEAD = 512
+# weights are rounded so float noise in the normalization does not split entries
+WEIGHT_DECIMALS = 6
+
+
+def normalized_weights(weights):
+    """
+    Weights as a hashable tuple in vector column order, scaled to a maximum of 1.
+
+    Args:
+        weights (dict or array): Feature weights, None or empty for unweighted
+
+    Returns:
+        tuple or None: Rounded weights, None when every feature weighs the same
+    """
+    if weights is None or (isinstance(weights, dict) and not weights):
+        return None
+    if isinstance(weights, dict):
+        weights = feature_weights(weights)
+    weights = np.asarray(weights, dtype=np.float64)
+    if np.all(weights == weights[0]):
+        return None
+    return tuple(np.round(weights / weights.max(), WEIGHT_DECIMALS).tolist())
+
+
+def result_key(kind, item_id, weights=None, n=20, filters=None):
+    """
+    Cache key of one search.
+
+    Args:
+        kind (str): 'track' or 'artist'
+        item_id (str): Id of the selected item
+        weights (dict or array): Feature weights of the search
+        n (int): Number of results
+        filters (dict): Filters of the search, None for none
+
+    Returns:
+        tuple: (kind, item_id, normalized weights, n, sorted filter items)
+    """
+    filter_items = tuple(sorted(filters.items())) if filters else None
+    return (kind, str(item_id), normalized_weights(weights), int(n), filter_items)
+
+
+class ResultCache:
+    """
+    Thread-safe LRU cache of (rows, scores) arrays, bounded by their size.
+
+    Args:
+        max_bytes (int): Size kept before least recently used entries are
+            evicted (default MAX_BYTES)
+    """
+
+    def __init__(self, max_bytes=MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.version = None
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _check_version(self, version):
+        # entries of another store version point at rows that may have moved
+        if version != self.version:
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self.nbytes = 0
+            self.version = version
+
+    def get(self, key, version):
+        """
+        Rows and scores stored for `key`, None on a miss.
+
+        Args:
+            key (tuple): Key from result_key
+            version (str): Vector store version the caller searches
+
+        Returns:
+            tuple or None: (rows int32, scores float32)
+        """
+        with self._lock:
+            self._check_version(version)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, version, rows, scores):
+        """
+        Store the result of a search, evicting least recently used entries
+        beyond max_bytes.
+
+        Returns:
+            tuple: The stored (rows int32, scores float32), read-only
+        """
+        rows = np.asarray(rows, dtype=np.int32 if len(rows) == 0 or rows.max() < 2**31 else np.int64)
+        scores = np.asarray(scores, dtype=np.float32)
+        rows.flags.writeable = False
+        scores.flags.writeable = False
+        size = rows.nbytes + scores.nbytes + ENTRY_OVERHEAD
+
+        with self._lock:
+            self._check_version(version)
+            if size > self.max_bytes:
+                return rows, scores
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.nbytes -= previous[0].nbytes + previous[1].nbytes + ENTRY_OVERHEAD
+            self._entries[key] = (rows, scores)
+            self.nbytes += size
+            while self.nbytes > self.max_bytes:
+                _, (old_rows, old_scores) = self._entries.popitem(last=False)
+                self.nbytes -= old_rows.nbytes + old_scores.nbytes + ENTRY_OVERHEAD
+                self.evictions += 1
+        return rows, scores
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def stats(self):
+        """Counters and size: hits, misses, evictions, invalidations, entries, bytes"""
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                    'invalidations': self.invalidations, 'entries': len(self._entries),
+                    'bytes': self.nbytes}
+
+
+@traced
+def cached_similar_items(cache, version, kind, item_name, vectors, items_df, n=20, weights=None,
+                         id_column=None, lookup=None, row_filter=None, **search):
+    """
+    get_similar_artists behind the result cache.
+
+    Args:
+        cache (ResultCache): Cache shared by the sessions of the process
+        version (str): Version of the vector store `vectors` come from
+        kind (str): 'track' or 'artist'
+        item_name (str): Name of the selected item
+        vectors (np.array): Feature vectors, aligned with items_df
+        items_df (pd.DataFrame): Rows of the items, with a 'name' column
+        n (int): Number of results (default 20)
+        weights (dict or array): Optional feature weights
+        id_column (str): Column of the item ids (default f'{kind}_id')
+        lookup (RowLookup): Index over items_df['name'], built on the fly if None
+        row_filter (RowFilter): Optional filter of the results, keyed by its filters
+        **search: Further arguments of similar_rows (index, graph, live, ...)
+
+    Returns:
+        tuple or str: Either (similar_vectors, similar_items_df, similarity_scores) or error message
+    """
+    if lookup is None:
+        lookup = RowLookup(items_df['name'])
+    row = lookup.first(item_name)
+    key = None
+    if row is not None:
+        key = result_key(kind, items_df[id_column or f'{kind}_id'].iloc[row], weights, n,
+                         row_filter.filters if row_filter is not None else None)
+        entry = cache.get(key, version)
+        if entry is not None:
+            rows, scores = entry
+            return vectors[rows], items_df.iloc[rows], scores
+
+    result = similar_rows(item_name, vectors, items_df, n=n, weights=weights, lookup=lookup,
+                          row_filter=row_filter, **search)
+    # errors (unknown names, failed searches) are not cached
+    if isinstance(result, str) or key is None:
+        return result
+    rows, scores = cache.put(key, version, *result)
+    return vectors[rows], items_df.iloc[rows], scores
+
+
+@st.cache_resource
+def load_result_cache():
+    """The ResultCache shared by every session of the process"""
+    return ResultCache()
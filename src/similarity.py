@@ -0,0 +1,451 @@
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+
+def top_k(scores, k):
+    """
+    Return the positions of the k largest scores, best first.
+
+    Uses a partial selection (np.argpartition) so only the k winners are sorted.
+
+    Args:
+        scores (np.array): 1-D array of scores
+        k (int): Number of positions to return
+
+    Returns:
+        np.array: Positions of the k highest scores in descending score order
+    """
+    k = min(k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if k < len(scores):
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(len(scores))
+    return candidates[np.argsort(-scores[candidates], kind='stable')]
+
+
+def normalize_rows(vectors, dtype=np.float32):
+    """
+    L2-normalize every row of a matrix.
+
+    Rows with zero norm are left as zeros, so they score 0 against everything
+    (same convention as sklearn's cosine_similarity).
+
+    Args:
+        vectors (np.array): 2-D array of item vectors
+        dtype: dtype of the returned matrix (default float32)
+
+    Returns:
+        tuple: (unit vectors, original row norms)
+    """
+    vectors = np.asarray(vectors, dtype=dtype)
+    norms = np.linalg.norm(vectors, axis=1)
+    safe_norms = np.where(norms == 0, 1, norms)
+    return vectors / safe_norms[:, None], norms
+
+
+def divide_norms(dot_products, norms):
+    """Dot products divided by row norms; rows with zero norm score 0"""
+    return np.divide(dot_products, norms, out=np.zeros_like(dot_products), where=norms > 0)
+
+
+class SimilarityIndex:
+    """
+    Cosine similarity search over a fixed matrix of item vectors.
+
+    The vectors are normalized once when the index is built, so scoring one
+    item against the catalog is a single matrix-vector product (O(N*d) time,
+    O(N) memory) and the top k come out of a partial selection. The full
+    N x N similarity matrix is never built.
+
+    Feature weights are a query parameter: the weighted cosine
+        sum_j u_j v_j w_j^2 / (||u * w|| ||v * w||)
+    folds w^2 and the query's weighted norm into the query vector, and divides
+    by the weighted row norms, which are computed once per weight vector and
+    shared by every query using it. No weighted copy of the catalog is made.
+    """
+
+    # weight vectors whose row norms are kept
+    MAX_WEIGHTED_NORMS = 16
+    # query items whose per-feature contributions are kept
+    MAX_CONTRIBUTIONS = 8
+
+    def __init__(self, vectors, dtype=np.float32):
+        self.unit_vectors, self.norms = normalize_rows(vectors, dtype=dtype)
+        self._init_weighted_norms()
+
+    def _init_weighted_norms(self):
+        self._weighted_norms = OrderedDict()
+        self._weighted_norms_lock = threading.Lock()
+        self._squared_features = None
+        self._contributions = OrderedDict()
+
+    @classmethod
+    def from_unit_vectors(cls, unit_vectors, norms):
+        """
+        Wrap already-normalized vectors (e.g. memory-mapped from the vector store)
+        without copying them.
+        """
+        index = cls.__new__(cls)
+        index.unit_vectors = unit_vectors
+        index.norms = norms
+        index._init_weighted_norms()
+        return index
+
+    def __len__(self):
+        return len(self.unit_vectors)
+
+    def weighted_norms(self, weights, block_size=65536):
+        """
+        Norm of every unit row after weighting, sqrt(sum_j u_j^2 w_j^2).
+
+        Computed once per weight vector (in blocks, without a weighted copy)
+        and kept for the most recent MAX_WEIGHTED_NORMS weight vectors.
+
+        Args:
+            weights (array-like): One weight per feature
+            block_size (int): Rows processed at a time (default 65536)
+
+        Returns:
+            np.array: float32 norms, one per item
+        """
+        key = tuple(float(weight) for weight in weights)
+        with self._weighted_norms_lock:
+            if key in self._weighted_norms:
+                self._weighted_norms.move_to_end(key)
+                return self._weighted_norms[key]
+
+        squared_weights = np.square(np.asarray(key, dtype=np.float32))
+        norms = np.empty(len(self.unit_vectors), dtype=np.float32)
+        for start in range(0, len(norms), block_size):
+            block = np.asarray(self.unit_vectors[start:start + block_size], dtype=np.float32)
+            norms[start:start + len(block)] = np.sqrt(np.square(block) @ squared_weights)
+
+        with self._weighted_norms_lock:
+            self._weighted_norms[key] = norms
+            while len(self._weighted_norms) > self.MAX_WEIGHTED_NORMS:
+                self._weighted_norms.popitem(last=False)
+        return norms
+
+    def squared_features(self, block_size=65536):
+        """
+        Squared unit vectors stored feature by feature, shape (d, N) float32.
+        Built on first use and shared by every query's contributions.
+        """
+        with self._weighted_norms_lock:
+            if self._squared_features is not None:
+                return self._squared_features
+
+        squares = np.empty(self.unit_vectors.shape[::-1], dtype=np.float32)
+        for start in range(0, squares.shape[1], block_size):
+            block = np.asarray(self.unit_vectors[start:start + block_size], dtype=np.float32)
+            squares[:, start:start + len(block)] = np.square(block).T
+
+        with self._weighted_norms_lock:
+            if self._squared_features is None:
+                self._squared_features = squares
+            return self._squared_features
+
+    def contributions(self, query_idx):
+        """
+        Per-feature contributions of item `query_idx` for live re-ranking
+        (see QueryContributions), kept for the most recent MAX_CONTRIBUTIONS
+        query items.
+        """
+        with self._weighted_norms_lock:
+            if query_idx in self._contributions:
+                self._contributions.move_to_end(query_idx)
+                return self._contributions[query_idx]
+
+        contributions = QueryContributions(self.unit_vectors, query_idx, self.squared_features())
+
+        with self._weighted_norms_lock:
+            self._contributions[query_idx] = contributions
+            while len(self._contributions) > self.MAX_CONTRIBUTIONS:
+                self._contributions.popitem(last=False)
+        return contributions
+
+    def weighted_query(self, query_idx, weights):
+        """
+        Query vector of item `query_idx` with the weights folded in.
+
+        unit_vectors @ query / weighted_norms(weights) is then the weighted
+        cosine similarity against every item.
+        """
+        unit = np.asarray(self.unit_vectors[query_idx], dtype=np.float32)
+        squared_weights = np.square(np.asarray(weights, dtype=np.float32))
+        query_norm = np.sqrt(np.square(unit) @ squared_weights)
+        return unit * squared_weights / (query_norm if query_norm > 0 else 1)
+
+    def scores(self, query_idx, weights=None):
+        """
+        Cosine similarity of item `query_idx` against every item.
+
+        Args:
+            query_idx (int): Row of the query item
+            weights (array-like): Optional weight per feature
+
+        Returns:
+            np.array: One score per item
+        """
+        if weights is None:
+            return self.unit_vectors @ self.unit_vectors[query_idx]
+        return divide_norms(self.unit_vectors @ self.weighted_query(query_idx, weights),
+                            self.weighted_norms(weights))
+
+    def subset_scores(self, query_idx, rows, weights=None):
+        """
+        Exact cosine similarity of item `query_idx` against the given rows only.
+
+        Costs O(len(rows) * d) instead of a pass over the catalog, so a
+        selective filter makes the search cheaper.
+
+        Args:
+            query_idx (int): Row of the query item
+            rows (np.array): Rows to score
+            weights (array-like): Optional weight per feature
+
+        Returns:
+            np.array: float32 scores, one per row in `rows`
+        """
+        unit = np.asarray(self.unit_vectors[rows], dtype=np.float32)
+        if weights is None:
+            return unit @ np.asarray(self.unit_vectors[query_idx], dtype=np.float32)
+        squared_weights = np.square(np.asarray(weights, dtype=np.float32))
+        return divide_norms(unit @ self.weighted_query(query_idx, weights),
+                            np.sqrt(np.square(unit) @ squared_weights))
+
+    def query(self, query_idx, k=20, exclude_self=True, weights=None):
+        """
+        Find the k items most similar to item `query_idx`.
+
+        Args:
+            query_idx (int): Row of the query item
+            k (int): Number of neighbours to return (default 20)
+            exclude_self (bool): Drop the query row from the result (default True)
+            weights (array-like): Optional weight per feature
+
+        Returns:
+            tuple: (indices, scores) of the neighbours, best first
+        """
+        scores = self.scores(query_idx, weights)
+        if exclude_self:
+            # push the query row to the bottom instead of copying the array
+            scores[query_idx] = -np.inf
+        indices = top_k(scores, k)
+        indices = indices[np.isfinite(scores[indices])]
+        return indices, scores[indices]
+
+    def query_batch(self, query_indices, k=20, exclude_self=True, memory_budget_mb=64):
+        """
+        Find the k most similar items for many query items at once.
+
+        Queries are scored in blocks with one matrix multiplication per block;
+        the block size is chosen so the block's score matrix and selection
+        buffer stay within `memory_budget_mb`.
+
+        Args:
+            query_indices (array-like): Rows of the query items
+            k (int): Number of neighbours per query (default 20)
+            exclude_self (bool): Drop each query row from its own result (default True)
+            memory_budget_mb (float): Working memory allowed per block (default 64)
+
+        Returns:
+            tuple: (indices, scores) arrays of shape (n_queries, k), int32 and
+            float32, best first. Rows with fewer than k candidates are padded
+            with index -1 and score -inf.
+        """
+        query_indices = np.asarray(query_indices, dtype=np.int64)
+        n_items = len(self)
+        n_queries = len(query_indices)
+        k_found = min(k, n_items - 1 if exclude_self else n_items)
+
+        indices = np.full((n_queries, k), -1, dtype=np.int32)
+        scores = np.full((n_queries, k), -np.inf, dtype=np.float32)
+        if n_queries == 0 or k_found <= 0:
+            return indices, scores
+
+        # per scored pair: float32 score and int64 partition index
+        bytes_per_query = n_items * (4 + 8)
+        block_size = max(1, int(memory_budget_mb * 1e6 // bytes_per_query))
+
+        for start in range(0, n_queries, block_size):
+            block = query_indices[start:start + block_size]
+            block_scores = self.unit_vectors[block] @ self.unit_vectors.T
+            if exclude_self:
+                block_scores[np.arange(len(block)), block] = -np.inf
+
+            if k_found < n_items:
+                # the k largest end up past position n_items - k
+                partition = np.argpartition(block_scores, n_items - k_found, axis=1)
+                candidates = partition[:, n_items - k_found:].copy()
+                del partition
+            else:
+                candidates = np.broadcast_to(np.arange(n_items), (len(block), n_items))
+            candidate_scores = np.take_along_axis(block_scores, candidates, axis=1)
+            # free the block before the next one is allocated
+            del block_scores
+            order = np.argsort(-candidate_scores, axis=1, kind='stable')
+
+            indices[start:start + len(block), :k_found] = np.take_along_axis(candidates, order, axis=1)
+            scores[start:start + len(block), :k_found] = np.take_along_axis(candidate_scores, order, axis=1)
+
+        return indices, scores
+
+
+class QueryContributions:
+    """
+    Weighted cosine of one query item against every item, split by feature.
+
+    For a fixed query q the weighted cosine against a unit row u is
+        sum_j (u_j q_j) w_j^2 / (sqrt(sum_j u_j^2 w_j^2) ||q * w||)
+    so with the products u_j q_j (this item's contribution matrix) and the
+    squares u_j^2 (shared by the index) stored, any weight vector is scored
+    with two vector-matrix products and no pass over the original vectors.
+    Both matrices are stored feature by feature, (d, N), so each product
+    streams through contiguous rows. Memory is one (d, N) float32 matrix per
+    query item.
+
+    Args:
+        unit_vectors (np.array): (N, d) normalized vectors
+        query_idx (int): Row of the query item
+        squared_features (np.array): (d, N) squared unit vectors, e.g.
+            SimilarityIndex.squared_features()
+        block_size (int): Rows multiplied at a time while building (default 65536)
+    """
+
+    def __init__(self, unit_vectors, query_idx, squared_features, block_size=65536):
+        self.query_idx = query_idx
+        self.query = np.asarray(unit_vectors[query_idx], dtype=np.float32)
+        self.squared_features = squared_features
+        self.products = np.empty(unit_vectors.shape[::-1], dtype=np.float32)
+        for start in range(0, self.products.shape[1], block_size):
+            block = np.asarray(unit_vectors[start:start + block_size], dtype=np.float32)
+            self.products[:, start:start + len(block)] = (block * self.query).T
+
+    def scores(self, weights=None):
+        """
+        Weighted cosine similarity of the query item against every item.
+
+        Args:
+            weights (array-like): Weight per feature, None for unweighted
+
+        Returns:
+            np.array: One float32 score per item
+        """
+        if weights is None:
+            return self.products.sum(axis=0)
+        squared_weights = np.square(np.asarray(weights, dtype=np.float32))
+        query_norm = np.sqrt(np.square(self.query) @ squared_weights)
+        scores = (squared_weights / (query_norm if query_norm > 0 else 1)) @ self.products
+        norms = np.sqrt(squared_weights @ self.squared_features)
+        # rows with zero norm score 0, without the masked divide of divide_norms
+        norms[norms == 0] = np.inf
+        scores /= norms
+        return scores
+
+
+def quantize_rows(unit_vectors, dtype='int8', block_size=65536):
+    """
+    Compact copy of normalized vectors for candidate scans.
+
+    int8 stores every feature with its own scale and offset
+    (value ~= (code + 128) * scale + offset); float16 is a plain cast.
+
+    Args:
+        unit_vectors (np.array): (N, d) normalized vectors
+        dtype (str): 'int8' or 'float16' (default 'int8')
+        block_size (int): Rows converted at a time (default 65536)
+
+    Returns:
+        tuple: (codes, scale, offset); scale and offset are None for float16
+    """
+    if dtype == 'float16':
+        return np.asarray(unit_vectors, dtype=np.float16), None, None
+    if dtype != 'int8':
+        raise ValueError(f"Unsupported scan dtype: {dtype}")
+
+    offset = np.asarray(unit_vectors.min(axis=0), dtype=np.float32)
+    scale = (np.asarray(unit_vectors.max(axis=0), dtype=np.float32) - offset) / 255
+    scale[scale == 0] = 1
+    codes = np.empty(unit_vectors.shape, dtype=np.int8)
+    for start in range(0, len(unit_vectors), block_size):
+        block = np.asarray(unit_vectors[start:start + block_size], dtype=np.float32)
+        codes[start:start + len(block)] = np.clip(np.round((block - offset) / scale), 0, 255) - 128
+    return codes, scale, offset
+
+
+class QuantizedIndex(SimilarityIndex):
+    """
+    Similarity index that scans a compact int8 or float16 copy of the vectors.
+
+    Every item is scored against the compact copy, then the best `rerank`
+    candidates are scored again against the full-precision unit vectors, so
+    the top of the ranking carries exact scores. Only the candidate rows of
+    the full-precision matrix are read per query.
+
+    Args:
+        unit_vectors (np.array): (N, d) full-precision normalized vectors
+        norms (np.array): Original row norms
+        codes (np.array): Compact copy from quantize_rows
+        scale (np.array): Per-feature int8 scale (None for float16)
+        offset (np.array): Per-feature int8 offset (None for float16)
+        rerank (int): Candidates re-scored at full precision (default 300)
+        block_size (int): Rows converted to float32 at a time while scanning; small blocks
+            stay in cache (default 8192)
+    """
+
+    def __init__(self, unit_vectors, norms, codes, scale=None, offset=None, rerank=300, block_size=8192):
+        self.unit_vectors = unit_vectors
+        self.norms = norms
+        self._init_weighted_norms()
+        self.codes = codes
+        self.scale = scale
+        self.offset = offset
+        self.rerank = rerank
+        self.block_size = block_size
+
+    @classmethod
+    def from_vectors(cls, vectors, dtype='int8', rerank=300):
+        """Normalize and quantize vectors in memory"""
+        unit_vectors, norms = normalize_rows(vectors)
+        return cls(unit_vectors, norms, *quantize_rows(unit_vectors, dtype), rerank=rerank)
+
+    def approximate_scores(self, query):
+        """Scores of every item against a query vector, from the compact copy"""
+        query = np.asarray(query, dtype=np.float32)
+        if self.scale is None:
+            weights, bias = query, 0.0
+        else:
+            # fold the dequantization into the query
+            weights = self.scale * query
+            bias = float((128 * self.scale + self.offset) @ query)
+
+        scores = np.empty(len(self.codes), dtype=np.float32)
+        for start in range(0, len(self.codes), self.block_size):
+            block = self.codes[start:start + self.block_size].astype(np.float32)
+            scores[start:start + len(block)] = block @ weights + bias
+        return scores
+
+    def scores(self, query_idx, weights=None):
+        """
+        Cosine similarity of item `query_idx` against every item: approximate,
+        except for the best `rerank` items, which are exact.
+        """
+        if weights is None:
+            query = np.asarray(self.unit_vectors[query_idx], dtype=np.float32)
+            scores = self.approximate_scores(query)
+            candidates = np.sort(top_k(scores, self.rerank))
+            scores[candidates] = self.unit_vectors[candidates] @ query
+            return scores
+
+        query = self.weighted_query(query_idx, weights)
+        norms = self.weighted_norms(weights)
+        scores = divide_norms(self.approximate_scores(query), norms)
+        candidates = np.sort(top_k(scores, self.rerank))
+        scores[candidates] = divide_norms(self.unit_vectors[candidates] @ query, norms[candidates])
+        return scores
@@ -0,0 +1,220 @@
+"""
+Pooled Spotify Web API client.
+
+One client is shared by every session of the app process: it keeps a
+requests.Session (HTTP keep-alive and a connection pool), caches the
+client-credentials token until shortly before it expires, and fetches tracks
+and artists through the multi-id endpoints, so a whole row of recommendation
+cards costs one request. gather_many / fetch_concurrently issue several such
+requests at once with a concurrency limit and per-request timeouts; a chunk
+that fails is logged and left out, the ids of the other chunks still resolve.
+
+The API and token URLs can be pointed elsewhere (e.g. a local stub server)
+with the SPOTIFY_API_URL and SPOTIFY_AUTH_URL environment variables.
+"""
+import asyncio
+import base64
+import logging
+import os
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+API_URL = os.environ.get('SPOTIFY_API_URL', 'https://api.spotify.com/v1')
+AUTH_URL = os.environ.get('SPOTIFY_AUTH_URL', 'https://accounts.spotify.com/api/token')
+
+# the /tracks and /artists endpoints accept at most 50 ids per request
+MAX_IDS_PER_REQUEST = 50
+# retries of rate limits and server errors, and the longest wait before one
+# (backoff or Retry-After), so the retries of a request fit a known budget
+RETRIES = 2
+MAX_RETRY_WAIT = 1.0
+
+logger = logging.getLogger(__name__)
+
+
+class CappedRetry(Retry):
+    """Retry whose Retry-After waits are capped at backoff_max like its backoff"""
+
+    def get_retry_after(self, response):
+        retry_after = super().get_retry_after(response)
+        return None if retry_after is None else min(retry_after, self.backoff_max)
+
+
+def chunks(items, size):
+    """Split a list into consecutive pieces of at most `size` items"""
+    return [items[start:start + size] for start in range(0, len(items), size)]
+
+
+class SpotifyClient:
+    """
+    Thread-safe Spotify Web API client with connection pooling and token caching.
+
+    Args:
+        client_id (str): Spotify client ID
+        client_secret (str): Spotify client secret
+        api_url (str): Base URL of the Web API (default API_URL)
+        auth_url (str): Token endpoint (default AUTH_URL)
+        pool_size (int): Connections kept open per host (default 10)
+        timeout (float): Seconds before a request is abandoned (default 10)
+        token_margin (float): Refresh the token this many seconds before it expires (default 60)
+        retries (int): Retries of rate limits and server errors (default RETRIES)
+        max_retry_wait (float): Longest wait before a retry, in seconds (default MAX_RETRY_WAIT)
+    """
+
+    def __init__(self, client_id, client_secret, api_url=None, auth_url=None,
+                 pool_size=10, timeout=10, token_margin=60, retries=RETRIES, max_retry_wait=MAX_RETRY_WAIT):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.api_url = (api_url or API_URL).rstrip('/')
+        self.auth_url = auth_url or AUTH_URL
+        self.timeout = timeout
+        self.token_margin = token_margin
+        self.retries = retries
+        self.max_retry_wait = max_retry_wait
+
+        self.session = requests.Session()
+        # retry rate limits and transient server errors, honouring Retry-After up to max_retry_wait
+        retry = CappedRetry(total=retries, backoff_factor=0.3, backoff_max=max_retry_wait,
+                            status_forcelist=[429, 500, 502, 503, 504],
+                            allowed_methods=['GET', 'POST'], respect_retry_after_header=True)
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self._token = None
+        self._token_expires_at = 0.0
+        self._token_lock = threading.Lock()
+
+    def attempt_timeout(self, budget):
+        """
+        HTTP timeout per attempt so that a request, its retries and the waits
+        between them fit in `budget` seconds, with one attempt's share left
+        over for the token request and the worker thread.
+        """
+        return max(budget - self.retries * self.max_retry_wait, 0.1) / (self.retries + 2)
+
+    def get_token(self, force_refresh=False):
+        """
+        Return a valid access token, requesting a new one only when the cached
+        token is missing or about to expire.
+        """
+        with self._token_lock:
+            if force_refresh or self._token is None or time.monotonic() >= self._token_expires_at:
+                auth_base64 = base64.b64encode(f'{self.client_id}:{self.client_secret}'.encode('utf-8')).decode('utf-8')
+                response = self.session.post(
+                    self.auth_url,
+                    headers={'Authorization': 'Basic ' + auth_base64,
+                             'Content-Type': 'application/x-www-form-urlencoded'},
+                    data={'grant_type': 'client_credentials'},
+                    timeout=self.timeout,
+                )
+                response.raise_for_status()
+                result = response.json()
+                self._token = result['access_token']
+                expires_in = result.get('expires_in', 3600)
+                self._token_expires_at = time.monotonic() + max(0, expires_in - self.token_margin)
+            return self._token
+
+    def get(self, path, params=None, timeout=None):
+        """
+        GET an API path and return the decoded JSON.
+
+        A 401 (token revoked or expired early) refreshes the token and retries once.
+        """
+        url = f'{self.api_url}/{path.lstrip("/")}'
+        for attempt in range(2):
+            headers = {'Authorization': 'Bearer ' + self.get_token(force_refresh=attempt > 0)}
+            response = self.session.get(url, headers=headers, params=params, timeout=timeout or self.timeout)
+            if response.status_code != 401:
+                break
+        response.raise_for_status()
+        return response.json()
+
+    def get_many(self, kind, ids, timeout=None):
+        """
+        Fetch several tracks or artists with the multi-id endpoint.
+
+        Args:
+            kind (str): 'tracks' or 'artists'
+            ids (list): Spotify ids, any number (split into requests of 50)
+            timeout (float): Per-request timeout, defaults to the client's
+
+        Returns:
+            list: One JSON object per id, in input order (None for unknown ids)
+        """
+        results = []
+        for chunk in chunks(list(ids), MAX_IDS_PER_REQUEST):
+            data = self.get(kind, params={'ids': ','.join(chunk)}, timeout=timeout)
+            results.extend(data[kind])
+        return results
+
+    def get_tracks(self, track_ids, timeout=None):
+        """Track objects for the given ids, in order"""
+        return self.get_many('tracks', track_ids, timeout=timeout)
+
+    def get_artists(self, artist_ids, timeout=None):
+        """Artist objects for the given ids, in order"""
+        return self.get_many('artists', artist_ids, timeout=timeout)
+
+
+async def gather_many(client, requests_by_kind, concurrency=8, timeout=5.0, chunk_size=MAX_IDS_PER_REQUEST):
+    """
+    Fetch tracks and artists concurrently.
+
+    Every chunk of ids becomes its own request; at most `concurrency` requests
+    are in flight at once and each one is abandoned after `timeout` seconds.
+    The HTTP timeout of each attempt leaves room for the client's retries
+    within `timeout`. A chunk that fails or times out is logged and its ids
+    are left out of the result.
+
+    Args:
+        client (SpotifyClient): Client used for the requests
+        requests_by_kind (dict): 'tracks' / 'artists' -> list of ids
+        concurrency (int): Maximum requests in flight (default 8)
+        timeout (float): Seconds allowed per request (default 5)
+        chunk_size (int): Ids per request, at most 50 (default 50)
+
+    Returns:
+        dict: kind -> {id: JSON object}, for the ids that resolved
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    attempt_timeout = client.attempt_timeout(timeout)
+
+    async def fetch(kind, chunk):
+        async with semaphore:
+            # the blocking session call runs in a worker thread; the HTTP timeout
+            # lets that thread finish even when wait_for gives up on it
+            return await asyncio.wait_for(asyncio.to_thread(client.get_many, kind, chunk, attempt_timeout),
+                                          timeout)
+
+    pending = [(kind, chunk)
+                for kind, ids in requests_by_kind.items()
+                for chunk in chunks(list(dict.fromkeys(ids)), min(chunk_size, MAX_IDS_PER_REQUEST))]
+    outcomes = await asyncio.gather(*(fetch(kind, chunk) for kind, chunk in pending), return_exceptions=True)
+
+    results = {kind: {} for kind in requests_by_kind}
+    for (kind, chunk), objects in zip(pending, outcomes):
+        if isinstance(objects, BaseException):
+            logger.warning('Spotify %s request for %d ids failed: %r', kind, len(chunk), objects)
+            continue
+        results[kind].update(zip(chunk, objects))
+    return results
+
+
+def fetch_concurrently(client, track_ids=(), artist_ids=(), concurrency=8, timeout=5.0,
+                       chunk_size=MAX_IDS_PER_REQUEST):
+    """
+    Blocking wrapper around gather_many for Streamlit scripts.
+
+    Returns:
+        tuple: ({track_id: track object}, {artist_id: artist object})
+    """
+    requests_by_kind = {'tracks': [str(i) for i in track_ids], 'artists': [str(i) for i in artist_ids]}
+    results = asyncio.run(gather_many(client, requests_by_kind, concurrency=concurrency,
+                                      timeout=timeout, chunk_size=chunk_size))
+    return results['tracks'], results['artists']
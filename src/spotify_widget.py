@@ -1,50 +1,94 @@
 import streamlit as st
-import base64
-import json
-from requests import post, get
 import pandas as pd 
+
+from src.spotify_client import SpotifyClient, fetch_concurrently
+from src.metadata_cache import MetadataCache
+from src.tracing import span, traced
  
+# one pooled client per set of credentials, shared by every session of the process
+@st.cache_resource
+def get_spotify_client(client_id, client_secret):
+    return SpotifyClient(client_id, client_secret)
+
+# parsed card fields kept on disk across reruns, sessions and restarts
+@st.cache_resource
+def get_metadata_cache():
+    return MetadataCache()
+
+@traced
+def cached_records(kind, ids, fetch_missing):
+    """
+    Parsed records for the given ids, fetching only those not in the metadata cache
+    
+    Args:
+        kind: str - 'track' or 'artist'
+        ids: list of str - Spotify IDs
+        fetch_missing: callable - takes the missing IDs, returns {id: parsed record},
+            with None for the IDs Spotify does not know
+    
+    Returns:
+        dict: id -> parsed record, None for IDs Spotify does not know
+    """
+    cache = get_metadata_cache()
+    records = cache.get_many(kind, ids)
+    missing = [i for i in dict.fromkeys(ids) if i not in records]
+    if missing:
+        fetched = fetch_missing(missing)
+        cache.put_many(kind, fetched)
+        records.update(fetched)
+    return records
+
 # getting access token from Spotify API
 def get_token(client_id, client_secret):
     
-    # constructing authentication credentials
-    auth_string = client_id + ":" + client_secret
-    # encoding the credentials to base64
-    auth_bytes = auth_string.encode('utf-8')
-    # converting the bytes to a string
-    auth_base64 = str(base64.b64encode(auth_bytes), 'utf-8')
-    
-    # making a POST request to the Spotify API to get the access token
-    url = "https://accounts.spotify.com/api/token"
+    # the shared client caches the token and only requests a new one
+    # shortly before the current one expires
+    return get_spotify_client(client_id, client_secret).get_token()
+
+
+
+def parse_spotify_song(track_id, data):
+    """Pick the fields shown on a song card from a Spotify track object (None for unknown ids)"""
+    if data is None:
+        return None
+    album = data.get('album') or {}
+    # get cover URL and album artist safely, like the artist image
+    cover_url = album['images'][0]['url'] if album.get('images') else None
+    artist_name = album['artists'][0]['name'] if album.get('artists') else None
     
-    # constructing the headers and data for the POST request
-    headers = {
-        'Authorization': 'Basic ' + auth_base64,
-        'Content-Type': 'application/x-www-form-urlencoded'
+    return {
+        'track_id': track_id,
+        'song_name': data['name'],
+        'artist_name': artist_name,
+        'spotify_url': data['external_urls']['spotify'],
+        'cover_image': cover_url
     }
-    # defining data as clint credentials
-    data = {'grant_type': 'client_credentials'}
-    
-    # making the POST request
-    result = post(url, headers = headers, data = data)
-    # converting the result to a json object
-    json_results = json.loads(result.content)
-    # getting the access token from the json object
-    token = json_results['access_token']
-    
-    # returning access token
-    return token   
-
 
+def parse_spotify_artist(data, artist_id=None):
+    """Pick the fields shown on an artist card from a Spotify artist object (None for unknown ids)"""
+    if data is None:
+        return None
+    # get image URL safely
+    image_url = data['images'][0]['url'] if data.get('images') and len(data['images']) > 0 else None
+    
+    return {
+        'artist_id': artist_id if artist_id is not None else data.get('id'),
+        'artist_name': data['name'],
+        'popularity': data['popularity'],
+        'followers': data['followers']['total'],
+        'spotify_url': data['external_urls']['spotify'],
+        'artist_image': image_url
+    }
 
 # fetching data from spotify api
+@traced
 def fetch_and_parse_spotify_songs(track_ids, token, client_id, client_secret):
     """
     Fetch and parse track data from Spotify API
     
     Args:
         track_ids: str or list of str - Spotify track ID(s)
-        token: str - Spotify API token
+        token: str - Spotify API token (unused, the shared client manages its own token)
         client_id: str - Spotify client ID
         client_secret: str - Spotify client secret
     
@@ -54,62 +98,100 @@ def fetch_and_parse_spotify_songs(track_ids, token, client_id, client_secret):
     # Convert single track_id to list
     if isinstance(track_ids, str):
         track_ids = [track_ids]
+    track_ids = [str(track_id) for track_id in track_ids]
+    
+    # cache misses cost one request per 50 tracks through the multi-id endpoint
+    def fetch_missing(missing):
+        tracks = get_spotify_client(client_id, client_secret).get_tracks(missing)
+        # Spotify answers null for unknown ids, cached as None so they are not asked again
+        return {track_id: parse_spotify_song(track_id, data) for track_id, data in zip(missing, tracks)}
+    
+    records = cached_records('track', track_ids, fetch_missing)
     
-    # placeholder for parsed data
-    parsed_song_data = []
-
-    # iterate over track IDs
-    for track_id in track_ids:
-        # constructing the URL and headers for GET request
-        url = f'https://api.spotify.com/v1/tracks/{track_id}'
-        headers = {'Authorization': 'Bearer ' + token}
-        
-        # making the GET request
-        response = get(url, headers=headers)
-        data = response.json()
-        
-        # create clean song data
-        clean_song_data = {
-            'track_id': track_id,
-            'song_name': data['name'],
-            'artist_name': data['album']['artists'][0]['name'],
-            'spotify_url': data['external_urls']['spotify'],
-            'cover_image': data['album']['images'][0]['url']
-        }
-        parsed_song_data.append(clean_song_data)
-    
-    # create DataFrame from parsed data
-    return pd.DataFrame(parsed_song_data)
+    # create DataFrame from parsed data, leaving out ids Spotify does not know
+    return pd.DataFrame([records[track_id] for track_id in track_ids if records.get(track_id) is not None])
 
 # fetching artist data from spotify api
-def fetch_and_parse_spotify_artist_data(id, token, client_id, client_secret):
+@traced
+def fetch_and_parse_spotify_artists(artist_ids, token, client_id, client_secret):
+    """
+    Fetch and parse data for several artists with one request per 50 artists
     
-    # placeholder for parsed data
-    parsed_song_data = []
+    Args:
+        artist_ids: str or list of str - Spotify artist ID(s)
+        token: str - Spotify API token (unused, the shared client manages its own token)
+        client_id: str - Spotify client ID
+        client_secret: str - Spotify client secret
     
-    # constructing the URL and headers for GET request
-    url = f'https://api.spotify.com/v1/artists/{id}'
-    headers = {'Authorization': 'Bearer ' + token}
+    Returns:
+        pd.DataFrame with columns: artist_name, popularity, followers, spotify_url, artist_image
+    """
+    if isinstance(artist_ids, str):
+        artist_ids = [artist_ids]
+    artist_ids = [str(artist_id) for artist_id in artist_ids]
     
-    # making the GET request
-    response = get(url, headers=headers)
-    data = response.json()
+    def fetch_missing(missing):
+        artists = get_spotify_client(client_id, client_secret).get_artists(missing)
+        return {artist_id: parse_spotify_artist(data, artist_id) for artist_id, data in zip(missing, artists)}
     
-    # get image URL safely
-    image_url = data['images'][0]['url'] if data.get('images') and len(data['images']) > 0 else None
+    records = cached_records('artist', artist_ids, fetch_missing)
     
-    # create clean song data with chart_week
-    clean_song_data = {
-        'artist_name': data['name'],
-        'popularity': data['popularity'],
-        'followers': data['followers']['total'],
-        'spotify_url': data['external_urls']['spotify'],
-        'artist_image': image_url
-    }
-    parsed_song_data.append(clean_song_data)
+    # create DataFrame from parsed data, leaving out ids Spotify does not know
+    return pd.DataFrame([records[artist_id] for artist_id in artist_ids if records.get(artist_id) is not None])
+
+def fetch_and_parse_spotify_artist_data(id, token, client_id, client_secret):
+    
+    return fetch_and_parse_spotify_artists([id], token, client_id, client_secret)
+
+# fetching everything a page render shows in one concurrent round
+@traced
+def fetch_spotify_metadata(client_id, client_secret, track_ids=(), artist_ids=(), concurrency=8, timeout=5.0):
+    """
+    Fetch the selected item and all displayed recommendations concurrently
     
-    # create DataFrame from parsed data
-    return pd.DataFrame(parsed_song_data)
+    Args:
+        client_id: str - Spotify client ID
+        client_secret: str - Spotify client secret
+        track_ids: list of str - Spotify track IDs to fetch
+        artist_ids: list of str - Spotify artist IDs to fetch
+        concurrency: int - maximum requests in flight
+        timeout: float - seconds allowed per request
+    
+    Returns:
+        tuple: (songs, artists) DataFrames indexed by track_id / artist_id,
+        with the same columns as fetch_and_parse_spotify_songs / _artists
+    """
+    track_ids = [str(track_id) for track_id in track_ids]
+    artist_ids = [str(artist_id) for artist_id in artist_ids]
+    cache = get_metadata_cache()
+    with span('metadata cache lookup', ids=len(track_ids) + len(artist_ids)):
+        song_records = cache.get_many('track', track_ids)
+        artist_records = cache.get_many('artist', artist_ids)
+    
+    # only cache misses go to Spotify, all in the same concurrent round
+    missing_tracks = [i for i in dict.fromkeys(track_ids) if i not in song_records]
+    missing_artists = [i for i in dict.fromkeys(artist_ids) if i not in artist_records]
+    if missing_tracks or missing_artists:
+        with span('spotify requests', tracks=len(missing_tracks), artists=len(missing_artists)):
+            tracks, artists = fetch_concurrently(get_spotify_client(client_id, client_secret),
+                                                 track_ids=missing_tracks, artist_ids=missing_artists,
+                                                 concurrency=concurrency, timeout=timeout)
+        # Spotify answers null for unknown ids: cached as None, so later reruns
+        # do not ask again until the entry expires; failed chunks are not cached
+        fetched_songs = {track_id: parse_spotify_song(track_id, data) for track_id, data in tracks.items()}
+        fetched_artists = {artist_id: parse_spotify_artist(data, artist_id) for artist_id, data in artists.items()}
+        cache.put_many('track', fetched_songs)
+        cache.put_many('artist', fetched_artists)
+        song_records.update(fetched_songs)
+        artist_records.update(fetched_artists)
+    
+    # ids known to be unknown are left out of the frames
+    songs = pd.DataFrame([record for record in song_records.values() if record is not None],
+                         columns=['track_id', 'song_name', 'artist_name', 'spotify_url', 'cover_image'])
+    artists = pd.DataFrame([record for record in artist_records.values() if record is not None],
+                           columns=['artist_id', 'artist_name', 'popularity', 'followers', 'spotify_url', 'artist_image'])
+    
+    return songs.set_index('track_id', drop=False), artists.set_index('artist_id', drop=False)
  
 # displaying artist data
 def show_spotify_artist_components(dataframe):
@@ -0,0 +1,230 @@
+"""
+Columnar, typed copies of the data/ CSV files.
+
+The CSVs carry an unnamed index column, blank rows (audio_features.csv), a
+repeated header row (mapping.csv) and duplicated rows (tracks.csv), and parse
+with default 64-bit dtypes. The conversion below cleans them once and writes
+Feather files with compact dtypes: float32 audio features, int8 key/mode/
+time_signature and categorical ids. The id columns share one category set
+across tables, so merges on track_id/artist_id stay categorical.
+
+Convert (or reconvert) from the repository root with:
+    python -m src.storage
+"""
+import hashlib
+import json
+import os
+
+import pandas as pd
+import pyarrow.feather as feather
+
+
+DATA_DIR = 'data'
+COLUMNAR_DIR = 'data/columnar'
+TABLES = ['tracks', 'mapping', 'artists', 'audio_features']
+
+FLOAT_FEATURES = ['danceability', 'energy', 'loudness', 'speechiness', 'acousticness',
+                  'instrumentalness', 'liveness', 'valence', 'tempo']
+SMALL_INT_FEATURES = ['key', 'mode', 'time_signature']
+
+# columns the app reads from each table (loudness is not used)
+COLUMNS = {
+    'tracks': ['track_id', 'name', 'duration_ms', 'release_date', 'album_type', 'explicit'],
+    'mapping': ['artist_id', 'track_id'],
+    'artists': ['artist_id', 'name', 'popularity', 'followers'],
+    'audio_features': ['track_id', 'danceability', 'energy', 'key', 'mode', 'speechiness',
+                       'acousticness', 'instrumentalness', 'liveness', 'valence', 'tempo',
+                       'time_signature'],
+}
+ID_COLUMNS = ['track_id', 'artist_id']
+
+# compact types of the non-id columns
+DTYPES = {
+    'tracks': {
+        'name': 'string',
+        'duration_ms': 'int32',
+        'release_date': 'string',
+        'album_type': 'category',
+        'explicit': 'bool',
+    },
+    'mapping': {},
+    'artists': {
+        'name': 'string',
+        'popularity': 'int8',
+        'followers': 'int64',
+    },
+    'audio_features': {
+        **{column: 'float32' for column in FLOAT_FEATURES},
+        **{column: 'int8' for column in SMALL_INT_FEATURES},
+    },
+}
+
+
+def source_fingerprint(paths):
+    """Content hash of the given files"""
+    digest = hashlib.sha1()
+    for path in paths:
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                digest.update(chunk)
+    return digest.hexdigest()[:12]
+
+
+def source_stats(paths):
+    """(size, mtime) of the given files, a cheap first check before hashing"""
+    return [[os.stat(path).st_size, os.stat(path).st_mtime_ns] for path in paths]
+
+
+def csv_paths(data_dir=DATA_DIR):
+    """Paths of the source CSV files, in TABLES order"""
+    return [os.path.join(data_dir, f'{table}.csv') for table in TABLES]
+
+
+def read_clean_csvs(data_dir=DATA_DIR):
+    """
+    Read the source CSVs and remove the junk rows and columns.
+
+    Args:
+        data_dir (str): Directory holding the CSV files (default data)
+
+    Returns:
+        dict: Cleaned DataFrames keyed by table name, still with CSV dtypes
+    """
+    # the first unnamed column is a saved pandas index
+    tables = {table: pd.read_csv(path, index_col=0) for table, path in zip(TABLES, csv_paths(data_dir))}
+
+    # blank rows in audio_features.csv
+    tables['audio_features'] = tables['audio_features'].dropna(subset=['track_id'])
+    # header row repeated as data in mapping.csv
+    mapping = tables['mapping']
+    tables['mapping'] = mapping[mapping['artist_id'] != 'artist_id']
+    # tracks.csv lists some tracks twice with identical values
+    tables['tracks'] = tables['tracks'].drop_duplicates()
+
+    return {table: frame.reset_index(drop=True) for table, frame in tables.items()}
+
+
+def apply_dtypes(tables):
+    """
+    Cast cleaned tables to the compact column types.
+
+    Args:
+        tables (dict): Cleaned DataFrames keyed by table name
+
+    Returns:
+        dict: The same tables with compact dtypes
+    """
+    track_ids = pd.CategoricalDtype(sorted(
+        set(tables['tracks']['track_id']) | set(tables['mapping']['track_id'])
+        | set(tables['audio_features']['track_id'])))
+    artist_ids = pd.CategoricalDtype(sorted(
+        set(tables['artists']['artist_id']) | set(tables['mapping']['artist_id'])))
+
+    tracks = tables['tracks'].astype({'track_id': track_ids, **DTYPES['tracks']})
+    mapping = tables['mapping'].astype({'artist_id': artist_ids, 'track_id': track_ids})
+    artists = tables['artists'].astype({'artist_id': artist_ids, **DTYPES['artists']})
+    audio_features = tables['audio_features'].astype({'track_id': track_ids, **DTYPES['audio_features']})
+
+    return {'tracks': tracks, 'mapping': mapping, 'artists': artists, 'audio_features': audio_features}
+
+
+def convert_to_columnar(data_dir=DATA_DIR, out_dir=COLUMNAR_DIR):
+    """
+    Clean the CSV files and write them as typed Feather files.
+
+    A manifest with the hash of the source CSVs is written last, so readers
+    can tell whether the columnar copy is complete and up to date.
+
+    Args:
+        data_dir (str): Directory holding the CSV files (default data)
+        out_dir (str): Output directory (default data/columnar)
+
+    Returns:
+        dict: The converted DataFrames keyed by table name
+    """
+    tables = apply_dtypes(read_clean_csvs(data_dir))
+
+    os.makedirs(out_dir, exist_ok=True)
+    for table, frame in tables.items():
+        tmp_path = os.path.join(out_dir, f'.{table}.feather.tmp')
+        frame.to_feather(tmp_path)
+        os.replace(tmp_path, os.path.join(out_dir, f'{table}.feather'))
+
+    manifest = {'source_fingerprint': source_fingerprint(csv_paths(data_dir)),
+                'source_stats': source_stats(csv_paths(data_dir)),
+                'rows': {table: int(len(frame)) for table, frame in tables.items()}}
+    with open(os.path.join(out_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    return tables
+
+
+def columnar_is_current(data_dir=DATA_DIR, out_dir=COLUMNAR_DIR):
+    """
+    True if the Feather files exist and were converted from the current CSVs,
+    or exist without any CSVs to convert from.
+    """
+    manifest_path = os.path.join(out_dir, 'manifest.json')
+    if not os.path.exists(manifest_path):
+        return False
+    with open(manifest_path) as f:
+        manifest = json.load(f)
+    # generated as Feather (src.synthetic), there are no csv files to compare
+    if manifest.get('synthetic'):
+        return True
+    # without the csv files (e.g. only the Feather copy was deployed), it is the source
+    paths = csv_paths(data_dir)
+    if not all(os.path.exists(path) for path in paths):
+        return True
+    # unchanged size and mtime: skip hashing the csv files
+    if manifest.get('source_stats') == source_stats(paths):
+        return True
+    return manifest.get('source_fingerprint') == source_fingerprint(paths)
+
+
+def read_columnar(data_dir=DATA_DIR, out_dir=COLUMNAR_DIR, columns=COLUMNS):
+    """
+    Read the four tables from the Feather files, converting them first if needed.
+
+    Id columns are rebuilt from their dictionary codes against one shared
+    CategoricalDtype per id, instead of letting every table build (and hash)
+    its own copy of the categories.
+
+    Args:
+        data_dir (str): Directory holding the CSV files (default data)
+        out_dir (str): Directory holding the Feather files (default data/columnar)
+        columns (dict): Columns to read per table (default COLUMNS)
+
+    Returns:
+        tuple: (tracks, mapping, artists, audio_features) DataFrames
+    """
+    if not columnar_is_current(data_dir, out_dir):
+        convert_to_columnar(data_dir, out_dir)
+
+    # id column name -> (arrow dictionary, pandas dtype) of the first table that had it
+    shared_ids = {}
+    frames = []
+    for table in TABLES:
+        arrow_table = feather.read_table(os.path.join(out_dir, f'{table}.feather'), columns=columns.get(table))
+        ids = {}
+        for name in ID_COLUMNS:
+            if name not in arrow_table.column_names:
+                continue
+            column = arrow_table.column(name).combine_chunks()
+            if name not in shared_ids:
+                shared_ids[name] = (column.dictionary, pd.CategoricalDtype(column.dictionary.to_pandas()))
+            dictionary, dtype = shared_ids[name]
+            if column.dictionary.equals(dictionary):
+                ids[name] = pd.Categorical.from_codes(column.indices.fill_null(-1).to_numpy(), dtype=dtype)
+
+        rest = arrow_table.drop_columns(list(ids)).to_pandas()
+        frames.append(pd.DataFrame({name: ids[name] if name in ids else rest[name]
+                                    for name in arrow_table.column_names}))
+
+    return tuple(frames)
+
+
+if __name__ == '__main__':
+    tables = convert_to_columnar()
+    for table, frame in tables.items():
+        print(f"{table}: {len(frame)} rows, {frame.memory_usage(deep=True).sum() / 1e6:.2f} MB")
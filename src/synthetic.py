@@ -0,0 +1,458 @@
+"""
+Synthetic catalogs with the schema of the data/ files, at any scale.
+
+The distributions are fitted from the shipped tables:
+- audio features, track duration, release year and explicit flag are drawn
+  jointly from a Gaussian copula over their rank correlations, every column
+  mapped back through its empirical quantiles
+- artist popularity and followers come from a second copula
+- album types, the number of artists per track and the number of tracks per
+  artist follow their empirical frequencies
+
+Track and artist ids are 22-character base62 strings like Spotify's, and
+names are spelled from the words of the shipped names. A share of tracks
+reuses another track's name and a share of tracks has no audio_features row;
+both default to the shares measured on data/.
+
+Tables are generated and written in chunks of tracks, so memory stays flat
+up to tens of millions of tracks (the Feather output also keeps the id
+dictionaries, about 25 bytes per id). The output is either CSV files laid
+out like data/*.csv, or the typed Feather files of src.storage written
+directly, which skips the CSV conversion. Both are read with
+load_df(data_dir=<out>). The same seed and chunk size give the same catalog.
+
+Generate from the repository root with, e.g.:
+    python -m src.synthetic --tracks 1000000 --out data/synthetic-1m
+"""
+import argparse
+import json
+import os
+import re
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from scipy.special import ndtr, ndtri
+
+from src.storage import DATA_DIR, DTYPES, SMALL_INT_FEATURES, TABLES, read_clean_csvs
+
+
+CHUNK_TRACKS = 1_000_000
+ALBUM_TYPES = ['album', 'compilation', 'single']
+AUDIO_COLUMNS = ['danceability', 'energy', 'key', 'loudness', 'mode', 'speechiness', 'acousticness',
+                 'instrumentalness', 'liveness', 'valence', 'tempo', 'time_signature']
+
+# copula columns; discrete ones are mapped back to observed values only
+TRACK_COLUMNS = AUDIO_COLUMNS + ['duration_ms', 'year', 'explicit']
+ARTIST_COLUMNS = ['popularity', 'followers']
+DISCRETE = set(SMALL_INT_FEATURES) | {'duration_ms', 'year', 'explicit', 'popularity', 'followers'}
+
+# words read_csv would parse as missing when they make up a whole name
+NA_WORDS = {'None', 'Null', 'Nan', 'Na', 'Nat'}
+BASE62 = np.frombuffer(b'0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz', dtype=np.uint8)
+ID_LENGTH = 22
+# random streams of a catalog
+TRACK_STREAM, ARTIST_STREAM, WEIGHT_STREAM = 1, 2, 3
+
+
+class GaussianCopula:
+    """
+    Joint distribution of numeric columns: a Gaussian copula fitted on their
+    normal scores, every column mapped back through its empirical quantiles.
+
+    Args:
+        frame (pd.DataFrame): Observed rows of the numeric columns
+        discrete (set): Columns sampled from their observed values, without interpolation
+    """
+
+    def __init__(self, frame, discrete=()):
+        self.columns = list(frame.columns)
+        self.discrete = [column in discrete for column in self.columns]
+        self.sorted_values = [np.sort(frame[column].to_numpy(np.float64)) for column in self.columns]
+
+        ranks = frame.rank(method='average').to_numpy(np.float64)
+        correlation = np.corrcoef(ndtri(ranks / (len(frame) + 1)), rowvar=False)
+        # constant columns have no correlation, keep the factorization defined
+        correlation = np.nan_to_num(correlation) + np.eye(len(self.columns)) * 1e-9
+        self.cholesky = np.linalg.cholesky(correlation)
+
+    def sample(self, n, rng):
+        """
+        Draw n rows.
+
+        Args:
+            n (int): Number of rows
+            rng (np.random.Generator): Random generator
+
+        Returns:
+            dict: column -> np.array of n float64 values
+        """
+        uniform = ndtr(rng.standard_normal((n, len(self.columns))) @ self.cholesky.T)
+        samples = {}
+        for i, column in enumerate(self.columns):
+            values = self.sorted_values[i]
+            if self.discrete[i]:
+                positions = np.minimum((uniform[:, i] * len(values)).astype(np.int64), len(values) - 1)
+                samples[column] = values[positions]
+            else:
+                samples[column] = np.interp(uniform[:, i] * (len(values) - 1), np.arange(len(values)), values)
+        return samples
+
+
+def vocabulary(names):
+    """Distinct capitalized words of the given names, in first-seen order"""
+    words = {}
+    for name in names:
+        for word in re.findall(r"[^\W\d_]+", str(name)):
+            if word.capitalize() not in NA_WORDS:
+                words.setdefault(word.capitalize(), None)
+    return np.array(list(words) or ['Song'], dtype=object)
+
+
+def spell_names(numbers, words, n_names):
+    """
+    Names spelled from words, one word per digit of the number in base len(words).
+
+    Different numbers give different names. The numbers are first permuted
+    within 0..n_names-1, so consecutive rows get unrelated names.
+
+    Args:
+        numbers (np.array): Name numbers, below n_names
+        words (np.array): Vocabulary
+        n_names (int): Size of the name space
+
+    Returns:
+        list: Names as str
+    """
+    multiplier = 2_654_435_761 % max(n_names, 1) or 1
+    while np.gcd(multiplier, n_names) > 1:
+        multiplier += 1
+    numbers = (np.asarray(numbers, dtype=np.int64) * multiplier) % max(n_names, 1)
+
+    n_words = len(words)
+    digits = []
+    while True:
+        digits.append(numbers % n_words)
+        numbers = numbers // n_words
+        if not numbers.any():
+            break
+    # most significant digit first, leading zeros dropped
+    digits = np.array(digits[::-1])
+    first = np.argmax(np.vstack([digits[:-1] > 0, np.ones((1, digits.shape[1]), dtype=bool)]), axis=0)
+    spelled = words[digits]
+    return [' '.join(spelled[start:, row]) for row, start in enumerate(first)]
+
+
+def make_ids(numbers, salt):
+    """
+    22-character base62 ids, unique per number below 2^60 - 1.
+
+    The numbers are mixed with a fixed odd multiplier, so ids do not sort like
+    the numbers; the leading characters come from the salt and differ per id kind.
+
+    Args:
+        numbers (np.array): Row numbers
+        salt (int): Id kind
+
+    Returns:
+        np.array: Ids as 22-byte strings (dtype S22)
+    """
+    mask = np.uint64((1 << 60) - 1)
+    mixed = ((np.asarray(numbers, dtype=np.uint64) + np.uint64(1)) * np.uint64(0x9E3779B97F4A7C15)) & mask
+    prefix = np.uint64((salt * 0x2545F4914F6CDD1D) & ((1 << 60) - 1))
+
+    chars = np.empty((len(mixed), ID_LENGTH), dtype=np.uint8)
+    # 11 base62 digits hold the 60 bits, the first 11 characters spell the prefix
+    for position in range(ID_LENGTH - 1, ID_LENGTH - 12, -1):
+        chars[:, position] = BASE62[(mixed % np.uint64(62)).astype(np.intp)]
+        mixed = mixed // np.uint64(62)
+    for position in range(ID_LENGTH - 12, -1, -1):
+        chars[:, position] = BASE62[int(prefix % np.uint64(62))]
+        prefix = prefix // np.uint64(62)
+    return chars.view(f'S{ID_LENGTH}').ravel()
+
+
+class CatalogModel:
+    """
+    Distributions of the shipped catalog that synthetic tables are drawn from.
+
+    Args:
+        data_dir (str): Directory of the shipped CSV files (default data)
+    """
+
+    def __init__(self, data_dir=DATA_DIR):
+        tables = read_clean_csvs(data_dir)
+        tracks, mapping = tables['tracks'], tables['mapping']
+        artists, audio_features = tables['artists'], tables['audio_features']
+
+        track_rows = tracks.merge(audio_features, on='track_id', how='inner')
+        track_rows['year'] = track_rows['release_date'].str[:4].astype(int)
+        track_rows['explicit'] = track_rows['explicit'].astype(int)
+        self.tracks = GaussianCopula(track_rows[TRACK_COLUMNS], DISCRETE)
+        self.artists = GaussianCopula(artists[ARTIST_COLUMNS], DISCRETE)
+
+        self.album_types = tracks['album_type'].value_counts(normalize=True).reindex(ALBUM_TYPES, fill_value=0)
+        # share of release dates given as a bare year ('1984' rather than '1984-05-01')
+        self.year_only = float((tracks['release_date'].str.len() == 4).mean())
+
+        self.artists_per_track = mapping.groupby('track_id').size().value_counts(normalize=True).sort_index()
+        self.tracks_per_artist = mapping.groupby('artist_id').size().to_numpy()
+        self.artist_ratio = len(artists) / tracks['track_id'].nunique()
+
+        self.duplicate_names = 1 - tracks['name'].nunique() / len(tracks)
+        self.duplicate_artist_names = 1 - artists['name'].nunique() / len(artists)
+        self.missing_features = float(1 - tracks['track_id'].isin(audio_features['track_id']).mean())
+
+        self.track_words = vocabulary(tracks['name'].unique())
+        self.artist_words = vocabulary(artists['name'].unique())
+
+
+def name_numbers(start, stop, duplicate_share, rng):
+    """Name number of rows start:stop: the row's own, or a random row's for duplicates"""
+    numbers = np.arange(start, stop, dtype=np.int64)
+    duplicates = rng.random(stop - start) < duplicate_share
+    numbers[duplicates] = rng.integers(0, max(stop, 1), duplicates.sum())
+    return numbers
+
+
+def release_dates(years, year_only, rng):
+    """'YYYY-MM-DD' strings, a share of them as a bare 'YYYY' like the shipped data"""
+    days = pd.to_timedelta(rng.integers(0, 365, len(years)), unit='D')
+    dates = (pd.to_datetime(years.astype(np.int64).astype(str), format='%Y') + days).strftime('%Y-%m-%d')
+    dates = dates.to_numpy(dtype=object)
+    short = rng.random(len(years)) < year_only
+    dates[short] = [date[:4] for date in dates[short]]
+    return dates
+
+
+class SyntheticCatalog:
+    """
+    Synthetic catalog, generated one chunk of tracks at a time.
+
+    Id columns of the generated chunks hold row numbers (int64); the writers
+    turn them into id strings or dictionary codes.
+
+    Args:
+        n_tracks (int): Number of tracks
+        n_artists (int): Number of artists, scaled with the shipped ratio if None
+        model (CatalogModel): Fitted distributions, fitted from data/ if None
+        duplicate_names (float): Share of tracks reusing another track's name
+            (default: the shipped share)
+        missing_features (float): Share of tracks without an audio_features row
+            (default: the shipped share)
+        seed (int): Random seed (default 42)
+    """
+
+    def __init__(self, n_tracks, n_artists=None, model=None, duplicate_names=None,
+                 missing_features=None, seed=42):
+        self.model = model if model is not None else CatalogModel()
+        self.n_tracks = int(n_tracks)
+        self.n_artists = int(n_artists or max(1, round(self.n_tracks * self.model.artist_ratio)))
+        self.duplicate_names = self.model.duplicate_names if duplicate_names is None else duplicate_names
+        self.missing_features = self.model.missing_features if missing_features is None else missing_features
+        self.seed = seed
+
+        # artists are credited in proportion to a track count drawn from the shipped ones
+        weights = self.rng(WEIGHT_STREAM, 0).choice(self.model.tracks_per_artist, self.n_artists)
+        self.artist_cumulative = np.cumsum(weights, dtype=np.float64)
+
+    def rng(self, stream, start):
+        """Generator of one stream and chunk, so chunks are generated independently"""
+        return np.random.default_rng([self.seed, stream, start])
+
+    def pick_artists(self, n, rng):
+        """n artist rows drawn in proportion to their weights"""
+        draws = rng.random(n) * self.artist_cumulative[-1]
+        return np.searchsorted(self.artist_cumulative, draws, side='right')
+
+    def artists(self, start, stop):
+        """Rows start:stop of the artists table"""
+        rng = self.rng(ARTIST_STREAM, start)
+        samples = self.model.artists.sample(stop - start, rng)
+        numbers = name_numbers(start, stop, self.model.duplicate_artist_names, rng)
+        return pd.DataFrame({
+            'artist_id': np.arange(start, stop, dtype=np.int64),
+            'name': spell_names(numbers, self.model.artist_words, self.n_artists),
+            'popularity': samples['popularity'].astype(np.int64),
+            'followers': samples['followers'].astype(np.int64),
+        })
+
+    def tracks(self, start, stop):
+        """
+        Rows of tracks start:stop in the tracks, mapping and audio_features tables.
+
+        Returns:
+            tuple: (tracks, mapping, audio_features) DataFrames
+        """
+        rng = self.rng(TRACK_STREAM, start)
+        n = stop - start
+        rows = np.arange(start, stop, dtype=np.int64)
+        samples = self.model.tracks.sample(n, rng)
+
+        tracks = pd.DataFrame({
+            'track_id': rows,
+            'name': spell_names(name_numbers(start, stop, self.duplicate_names, rng),
+                                self.model.track_words, self.n_tracks),
+            'duration_ms': samples['duration_ms'].astype(np.int64),
+            'release_date': release_dates(samples['year'], self.model.year_only, rng),
+            'album_type': rng.choice(ALBUM_TYPES, n, p=self.model.album_types.to_numpy()),
+            'explicit': samples['explicit'].astype(bool),
+        })
+
+        # track i < n_artists is credited to artist i, so every artist has a track
+        main_artists = np.where(rows < self.n_artists, rows, self.pick_artists(n, rng))
+        counts = rng.choice(self.model.artists_per_track.index.to_numpy(), n,
+                            p=self.model.artists_per_track.to_numpy())
+        featured = np.repeat(rows, counts - 1)
+        mapping = pd.DataFrame({
+            'artist_id': np.concatenate([main_artists, self.pick_artists(len(featured), rng)]),
+            'track_id': np.concatenate([rows, featured]),
+        }).drop_duplicates().sort_values('track_id', kind='stable').reset_index(drop=True)
+
+        has_features = rng.random(n) >= self.missing_features
+        audio_features = pd.DataFrame({'track_id': rows[has_features],
+                                       **{column: samples[column][has_features] for column in AUDIO_COLUMNS}})
+
+        return tracks, mapping, audio_features
+
+    def chunks(self, chunk_tracks=CHUNK_TRACKS):
+        """
+        Yield the catalog as dicts of table chunks.
+
+        Each chunk holds chunk_tracks tracks with their mapping and audio_features
+        rows, and a proportional slice of the artists table.
+        """
+        for start in range(0, self.n_tracks, chunk_tracks):
+            stop = min(start + chunk_tracks, self.n_tracks)
+            tracks, mapping, audio_features = self.tracks(start, stop)
+            artists = self.artists(self.n_artists * start // self.n_tracks, self.n_artists * stop // self.n_tracks)
+            yield {'tracks': tracks, 'mapping': mapping, 'artists': artists, 'audio_features': audio_features}
+
+
+ID_SALTS = {'track_id': 1, 'artist_id': 2}
+
+
+def write_csv(catalog, out_dir, chunk_tracks=CHUNK_TRACKS):
+    """
+    Write the catalog as tracks.csv, mapping.csv, artists.csv and audio_features.csv.
+
+    The files are laid out like data/*.csv (a leading unnamed index column,
+    the same columns), without the junk rows of the shipped files.
+
+    Args:
+        catalog (SyntheticCatalog): Catalog to write
+        out_dir (str): Output directory
+        chunk_tracks (int): Tracks generated and appended at a time (default CHUNK_TRACKS)
+
+    Returns:
+        dict: table -> rows written
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    rows = dict.fromkeys(TABLES, 0)
+    for i, chunk in enumerate(catalog.chunks(chunk_tracks)):
+        for table, frame in chunk.items():
+            for column, salt in ID_SALTS.items():
+                if column in frame:
+                    frame[column] = make_ids(frame[column].to_numpy(), salt).astype(str)
+            frame.index = pd.RangeIndex(rows[table], rows[table] + len(frame))
+            # the shipped files carry at most 6 significant digits
+            frame.to_csv(os.path.join(out_dir, f'{table}.csv'), mode='w' if i == 0 else 'a', header=i == 0,
+                         float_format='%.6g')
+            rows[table] += len(frame)
+    return rows
+
+
+def id_array(ids):
+    """Arrow string array over the bytes of fixed-width ids, without a per-string copy"""
+    n_bytes = len(ids) * ID_LENGTH
+    # 32-bit offsets address up to 2 GiB of characters
+    value_type, offset_type = (pa.string(), np.int32) if n_bytes < 2**31 else (pa.large_string(), np.int64)
+    offsets = np.arange(len(ids) + 1, dtype=offset_type) * ID_LENGTH
+    return pa.Array.from_buffers(value_type, len(ids), [None, pa.py_buffer(offsets), pa.py_buffer(ids.tobytes())])
+
+
+def write_feather(catalog, out_dir, chunk_tracks=CHUNK_TRACKS):
+    """
+    Write the catalog as the typed Feather files read by src.storage.read_columnar.
+
+    Every id column is dictionary-encoded against one dictionary per id kind
+    (all ids in row order), shared by every chunk and table, so the row
+    numbers of the chunks are the dictionary codes. The manifest marks the
+    files as synthetic, so they are read without looking for CSV files.
+
+    Args:
+        catalog (SyntheticCatalog): Catalog to write
+        out_dir (str): Output directory, e.g. <dir>/columnar for load_df(data_dir=<dir>)
+        chunk_tracks (int): Tracks generated and appended at a time (default CHUNK_TRACKS)
+
+    Returns:
+        dict: table -> rows written
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    sizes = {'track_id': catalog.n_tracks, 'artist_id': catalog.n_artists}
+    dictionaries = {}
+    for column, salt in ID_SALTS.items():
+        ids = np.concatenate([make_ids(np.arange(start, min(start + chunk_tracks, sizes[column])), salt)
+                              for start in range(0, sizes[column], chunk_tracks)] or [make_ids([], salt)])
+        dictionaries[column] = id_array(ids)
+
+    writers = {}
+    rows = dict.fromkeys(TABLES, 0)
+    try:
+        for chunk in catalog.chunks(chunk_tracks):
+            for table, frame in chunk.items():
+                frame = frame.astype(DTYPES[table])
+                if 'album_type' in frame:
+                    # the same categories in every chunk, one dictionary per file
+                    frame['album_type'] = pd.Categorical(frame['album_type'], categories=ALBUM_TYPES)
+                arrow_table = pa.Table.from_pandas(frame, preserve_index=False)
+                for column in ID_SALTS:
+                    if column in frame:
+                        codes = pa.array(frame[column].to_numpy(np.int32))
+                        arrow_table = arrow_table.set_column(
+                            arrow_table.column_names.index(column), column,
+                            pa.DictionaryArray.from_arrays(codes, dictionaries[column]))
+                if table not in writers:
+                    writers[table] = pa.ipc.new_file(os.path.join(out_dir, f'.{table}.feather.tmp'),
+                                                     arrow_table.schema)
+                writers[table].write_table(arrow_table)
+                rows[table] += len(frame)
+    finally:
+        for writer in writers.values():
+            writer.close()
+
+    for table in writers:
+        os.replace(os.path.join(out_dir, f'.{table}.feather.tmp'), os.path.join(out_dir, f'{table}.feather'))
+    manifest = {'synthetic': {'tracks': catalog.n_tracks, 'artists': catalog.n_artists, 'seed': catalog.seed,
+                              'duplicate_names': catalog.duplicate_names,
+                              'missing_features': catalog.missing_features},
+                'rows': rows}
+    with open(os.path.join(out_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return rows
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Write a synthetic catalog with the schema of data/')
+    parser.add_argument('--tracks', type=int, required=True, help='number of tracks')
+    parser.add_argument('--artists', type=int, default=None, help='number of artists (default: scaled from data/)')
+    parser.add_argument('--out', required=True, help='output directory, read back with load_df(data_dir=OUT)')
+    parser.add_argument('--format', choices=['csv', 'feather'], default='feather',
+                        help='CSV files like data/*.csv, or Feather files in OUT/columnar (default)')
+    parser.add_argument('--duplicate-names', type=float, default=None, help='share of tracks reusing a name')
+    parser.add_argument('--missing-features', type=float, default=None,
+                        help='share of tracks without audio features')
+    parser.add_argument('--chunk-tracks', type=int, default=CHUNK_TRACKS)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    catalog = SyntheticCatalog(args.tracks, n_artists=args.artists, duplicate_names=args.duplicate_names,
+                               missing_features=args.missing_features, seed=args.seed)
+    if args.format == 'csv':
+        rows = write_csv(catalog, args.out, args.chunk_tracks)
+    else:
+        rows = write_feather(catalog, os.path.join(args.out, 'columnar'), args.chunk_tracks)
+    summary = ', '.join(f'{table} {count}' for table, count in rows.items())
+    print(f"Wrote {summary} rows to {args.out} in {time.perf_counter() - start:.1f}s")
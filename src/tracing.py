@@ -0,0 +1,276 @@
+"""
+Timing spans of a page rerun.
+
+Functions of the pipeline are wrapped with @traced and slow sections with
+`with span(...)`. While a page rerun is traced (start_trace ... finish_trace),
+every span records its start, duration and nesting. The finished trace is
+shown in a sidebar panel and appended as one JSON line to a local log for
+offline analysis.
+
+The sections of a page are fragments that also rerun on their own:
+@traced_fragment gives such a rerun its own trace, and finishes the page's
+trace when a fragment cuts the run short with st.rerun().
+
+Tracing is off unless APP_TRACE=1 is set. While no trace is being recorded,
+a traced call costs one global check. TRACE_LOG_PATH moves the log (default
+data/cache/trace.jsonl).
+
+Each Streamlit session reruns its script in its own thread, so the current
+trace is thread-local. Work handed to other threads (the concurrent Spotify
+requests) is timed by the span around the hand-off.
+"""
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import nullcontext
+
+import pandas as pd
+import streamlit as st
+
+
+TRACE_ENABLED = os.environ.get('APP_TRACE', '') not in ('', '0')
+TRACE_PATH = os.environ.get('TRACE_LOG_PATH', 'data/cache/trace.jsonl')
+
+
+class _TraceLocal(threading.local):
+    # class default: a missing attribute would raise (and catch) on every lookup
+    trace = None
+
+
+_local = _TraceLocal()
+_write_lock = threading.Lock()
+# traces being recorded in any thread; while 0, traced calls skip the thread-local lookup
+_active = 0
+_active_lock = threading.Lock()
+# returned by span() when nothing is traced
+NO_SPAN = nullcontext()
+
+
+class Trace:
+    """
+    Spans of one page rerun, in the order they started.
+
+    Args:
+        page (str): Page the rerun belongs to
+    """
+
+    def __init__(self, page):
+        self.page = page
+        self.timestamp = time.time()
+        self.start = time.perf_counter()
+        self.end = None
+        self.spans = []
+        self.stack = []
+
+    def open(self, name, attrs):
+        """Start a span nested in the innermost open one, returning its position"""
+        self.spans.append({'name': name, 'depth': len(self.stack),
+                           'start_ms': (time.perf_counter() - self.start) * 1e3, 'ms': None, **attrs})
+        self.stack.append(len(self.spans) - 1)
+        return self.stack[-1]
+
+    def close(self, position, error=None):
+        """End the span at `position`"""
+        record = self.spans[position]
+        record['ms'] = (time.perf_counter() - self.start) * 1e3 - record['start_ms']
+        if error is not None:
+            record['error'] = error
+        self.stack.remove(position)
+
+    def total_ms(self):
+        """Duration of the rerun so far, or until finish_trace"""
+        end = self.end if self.end is not None else time.perf_counter()
+        return (end - self.start) * 1e3
+
+    def to_dict(self):
+        return {'page': self.page, 'timestamp': self.timestamp, 'total_ms': self.total_ms(), 'spans': self.spans}
+
+
+class Span:
+    """Context manager recording one span in a trace"""
+
+    __slots__ = ('trace', 'name', 'attrs', 'position')
+
+    def __init__(self, trace, name, attrs):
+        self.trace = trace
+        self.name = name
+        self.attrs = attrs
+
+    def __enter__(self):
+        self.position = self.trace.open(self.name, self.attrs)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.trace.close(self.position, error=None if exc_type is None else exc_type.__name__)
+        return False
+
+
+def current_trace():
+    """Trace of the rerun running in this thread, None when not tracing"""
+    return _local.trace
+
+
+def span(name, **attrs):
+    """
+    Time a block as a span of the current trace.
+
+    Args:
+        name (str): Span name
+        **attrs: JSON-serializable details stored with the span (e.g. rows=1000)
+
+    Returns:
+        Context manager; a shared no-op one when nothing is traced
+    """
+    trace = _local.trace if _active else None
+    if trace is None:
+        return NO_SPAN
+    return Span(trace, name, attrs)
+
+
+def traced(func=None, name=None):
+    """
+    Decorator timing every call of a function as a span.
+
+    Use as @traced or @traced(name='...'); the span is named after the function
+    by default. Under st.cache_data / st.cache_resource, only cache misses run
+    the function and show up in the trace.
+    """
+    if func is None:
+        return functools.partial(traced, name=name)
+    label = name or func.__name__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not _active:
+            return func(*args, **kwargs)
+        trace = _local.trace
+        if trace is None:
+            return func(*args, **kwargs)
+        with Span(trace, label, {}):
+            return func(*args, **kwargs)
+    return wrapper
+
+
+def start_trace(page, enabled=None):
+    """
+    Start tracing the current rerun, replacing an unfinished trace of this thread.
+
+    Args:
+        page (str): Page name stored with the trace
+        enabled (bool): Override TRACE_ENABLED
+
+    Returns:
+        Trace or None: The new trace, None when tracing is off
+    """
+    global _active
+    stop_trace(_local.trace)
+    if not (TRACE_ENABLED if enabled is None else enabled):
+        return None
+    with _active_lock:
+        _active += 1
+    _local.trace = Trace(page)
+    return _local.trace
+
+
+def stop_trace(trace):
+    """Stop recording into `trace`; spans still open are closed now"""
+    global _active
+    if trace is None or trace.end is not None:
+        return
+    with _active_lock:
+        _active -= 1
+    for position in list(trace.stack)[::-1]:
+        trace.close(position)
+    trace.end = time.perf_counter()
+    if _local.trace is trace:
+        _local.trace = None
+
+
+def traced_fragment(page, panel=True):
+    """
+    Decorator tracing the reruns of a fragment, applied under @st.fragment.
+
+    In a whole-page run the fragment is a span of the page's trace. A rerun of
+    the fragment alone gets its own trace, named '<page>: <fragment>', which is
+    logged and shown at the end of the fragment (a fragment rerun cannot add
+    to the sidebar). When the fragment raises, st.rerun() included, the run
+    ends there: its trace is logged without a panel.
+
+    Args:
+        page (str): Page name, as passed to start_trace
+        panel (bool): Show the trace of a fragment rerun (default True)
+    """
+    def decorator(func):
+        label = func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            trace = _local.trace if _active else None
+            own = trace is None
+            if own:
+                trace = start_trace(f'{page}: {label}')
+                if trace is None:
+                    return func(*args, **kwargs)
+            try:
+                with Span(trace, label, {}):
+                    result = func(*args, **kwargs)
+            except BaseException:
+                finish_trace(trace, panel=False)
+                raise
+            if own:
+                finish_trace(trace, panel=panel, container=st.container() if panel else None)
+            return result
+        return wrapper
+    return decorator
+
+
+def write_trace(trace, path=TRACE_PATH):
+    """Append a finished trace to the JSON-lines log at `path`"""
+    line = json.dumps(trace.to_dict(), default=str)
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with _write_lock, open(path, 'a') as f:
+        f.write(line + '\n')
+
+
+def trace_table(trace):
+    """
+    Rows of the trace panel: spans indented by depth, with their share of the rerun.
+
+    Returns:
+        list: dicts with 'span', 'ms' and '% of rerun'; the time outside any
+        top-level span is listed as '(untraced)'
+    """
+    total = trace.total_ms() or 1.0
+    rows = [{'span': ' ' * record['depth'] + record['name'], 'ms': record['ms'],
+             '% of rerun': 100 * record['ms'] / total} for record in trace.spans]
+    covered = sum(record['ms'] for record in trace.spans if record['depth'] == 0)
+    rows.append({'span': '(untraced)', 'ms': total - covered, '% of rerun': 100 * (total - covered) / total})
+    return rows
+
+
+def render_trace_panel(trace, path=TRACE_PATH, container=None):
+    """Show the trace in a collapsed expander in `container` (default the sidebar)"""
+    with (container or st.sidebar).expander(f"Performance trace: {trace.total_ms():.0f} ms", expanded=False):
+        st.dataframe(pd.DataFrame(trace_table(trace)).round({'ms': 1, '% of rerun': 1}),
+                     hide_index=True, use_container_width=True)
+        st.caption(f"Appended to {path}")
+
+
+def finish_trace(trace, path=TRACE_PATH, panel=True, container=None):
+    """
+    End the rerun's trace: append it to the log and show the sidebar panel.
+
+    Args:
+        trace (Trace): Trace from start_trace, None does nothing
+        path (str): JSON-lines log (default TRACE_PATH)
+        panel (bool): Show the sidebar panel (default True)
+        container: Where the panel goes instead of the sidebar
+    """
+    if trace is None:
+        return
+    stop_trace(trace)
+    write_trace(trace, path)
+    if panel:
+        render_trace_panel(trace, path, container)
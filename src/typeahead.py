@@ -0,0 +1,172 @@
+"""
+Server-side typeahead over song and artist names.
+
+The pickers used to send every unique name to the browser on every rerun.
+Now the query is typed into a text box and matched on the server. Only the
+top MAX_OPTIONS names go to the selectbox, ranked by popularity.
+
+Names are folded for matching (accents stripped, case folded), so "beyonce"
+finds "Beyoncé". TypeaheadIndex is built once per process:
+- prefixes: a sorted array of the folded names, searched with bisect
+- substrings: a trigram inverted index; the posting lists of the query's
+  trigrams are intersected and the few candidates checked for the whole query
+
+Queries shorter than a trigram match prefixes only.
+"""
+import unicodedata
+from bisect import bisect_left
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from src.filters import load_filter_index
+from src.tracing import traced
+from src.vector_store import load_item_lookups
+
+
+MAX_OPTIONS = 50
+NGRAM = 3
+
+
+def fold(text):
+    """Lowercase `text` without accents, for case- and accent-insensitive matching"""
+    decomposed = unicodedata.normalize('NFKD', str(text))
+    return ''.join(char for char in decomposed if not unicodedata.combining(char)).casefold()
+
+
+def ngrams(text, n=NGRAM):
+    """Distinct substrings of length n of `text`"""
+    return {text[start:start + n] for start in range(len(text) - n + 1)}
+
+
+class TypeaheadIndex:
+    """
+    Prefix and substring index over unique names, ranked by popularity.
+
+    Args:
+        names (list): Unique names
+        popularity (array-like): Popularity of every name, higher ranks first
+            (default: all equal, ranked by name)
+    """
+
+    def __init__(self, names, popularity=None):
+        self.names = np.asarray(names, dtype=object)
+        self.folded = [fold(name) for name in self.names]
+        if popularity is None:
+            popularity = np.zeros(len(self.names))
+        self.popularity = np.asarray(popularity, dtype=np.float64)
+
+        # rank of every name: popularity first, then the folded name
+        ranking = np.lexsort((np.asarray(self.folded, dtype=object), -self.popularity))
+        self.rank = np.empty(len(self.names), dtype=np.int64)
+        self.rank[ranking] = np.arange(len(self.names))
+        self.ranking = ranking
+
+        # prefixes: folded names in sorted order, searched with bisect
+        by_key = sorted(range(len(self.folded)), key=self.folded.__getitem__)
+        self.sorted_keys = [self.folded[name_id] for name_id in by_key]
+        self.sorted_ids = np.asarray(by_key, dtype=np.int64)
+
+        # substrings: postings of every trigram as one CSR array, name ids ascending
+        grams, ids = [], []
+        for name_id, key in enumerate(self.folded):
+            name_grams = ngrams(key)
+            grams.extend(name_grams)
+            ids.extend([name_id] * len(name_grams))
+        codes, uniques = pd.factorize(pd.Series(grams, dtype=object))
+        order = np.argsort(codes, kind='stable')
+        self.postings = np.asarray(ids, dtype=np.int32)[order]
+        self.indptr = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+        self.gram_codes = dict(zip(uniques.tolist(), range(len(uniques))))
+
+    def __len__(self):
+        return len(self.names)
+
+    def prefix_ids(self, key):
+        """Ids of the names whose folded form starts with `key`"""
+        start = bisect_left(self.sorted_keys, key)
+        stop = bisect_left(self.sorted_keys, key + '\U0010ffff', lo=start)
+        return self.sorted_ids[start:stop]
+
+    def substring_ids(self, key):
+        """Ids of the names whose folded form contains `key` (len(key) >= NGRAM)"""
+        postings = []
+        for gram in ngrams(key):
+            code = self.gram_codes.get(gram)
+            if code is None:
+                return self.sorted_ids[:0]
+            postings.append(self.postings[self.indptr[code]:self.indptr[code + 1]])
+        # shortest lists first keep the intersections small
+        postings.sort(key=len)
+        candidates = postings[0]
+        for other in postings[1:]:
+            if not len(candidates):
+                break
+            candidates = np.intersect1d(candidates, other, assume_unique=True)
+        # every trigram present does not make the whole query present
+        return np.asarray([name_id for name_id in candidates.tolist() if key in self.folded[name_id]],
+                          dtype=np.int64)
+
+    def search(self, query, limit=MAX_OPTIONS):
+        """
+        Most popular names matching `query`.
+
+        Args:
+            query (str): Typed text; empty for the most popular names overall
+            limit (int): Number of names returned (default MAX_OPTIONS)
+
+        Returns:
+            list: Up to `limit` names, most popular first
+        """
+        key = fold(query).strip()
+        if not key:
+            ids = self.ranking[:limit]
+        else:
+            ids = self.substring_ids(key) if len(key) >= NGRAM else self.prefix_ids(key)
+            if len(ids) > limit:
+                ids = ids[np.argpartition(self.rank[ids], limit)[:limit]]
+            ids = ids[np.argsort(self.rank[ids])]
+        return self.names[ids].tolist()
+
+
+def picker(index, label, placeholder, key, limit=MAX_OPTIONS):
+    """
+    Text box and selectbox of the names matching the typed text.
+
+    Only the matches go to the browser. The current selection stays among
+    the options, so typing a new query does not clear it.
+
+    Args:
+        index (TypeaheadIndex): Names to pick from
+        label (str): Label of the text box
+        placeholder (str): Placeholder of the text box
+        key (str): Session state key of the selectbox; the text box uses f'{key}_query'
+        limit (int): Number of matches shown (default MAX_OPTIONS)
+
+    Returns:
+        str or None: The selected name
+    """
+    query = st.text_input(label, key=f'{key}_query', placeholder=placeholder)
+    options = index.search(query, limit)
+    current = st.session_state.get(key)
+    if current is not None and current not in options:
+        options = [current] + options
+    return st.selectbox(f"Top {limit} matches", options=options, index=None, key=key,
+                        placeholder="Pick a match...", label_visibility='collapsed')
+
+
+@st.cache_resource
+@traced
+def load_typeahead(kind):
+    """
+    TypeaheadIndex over the unique names of load_item_frame(kind), ranked by
+    popularity (the artist's; for a song, its best-ranked row per load_filter_index).
+
+    Args:
+        kind (str): 'track' or 'artist'
+    """
+    lookup = load_item_lookups(kind)['name']
+    popularity, _ = lookup.group_max(load_filter_index(kind).popularity)
+    # key codes follow the insertion order of lookup.codes
+    return TypeaheadIndex(list(lookup.codes), popularity)
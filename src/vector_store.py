@@ -0,0 +1,295 @@
+"""
+Persistent vector store for the recommendation pages.
+
+The normalized track and artist matrices, their MinMaxScaler parameters and the
+row -> track_id / artist_id maps are built once from the data/ files and written
+as .npy arrays, together with int8 and float16 copies of the normalized
+matrices for compact candidate scans (see QuantizedIndex). The app opens
+them with np.load(mmap_mode='r'), so startup skips the merges and the scaler
+fit, and every Streamlit worker process shares the same page-cache pages
+instead of holding its own copy.
+
+Build (or rebuild) the store from the repository root with:
+    python -m src.vector_store
+"""
+import json
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from src.data_processing import (load_catalog,
+                                 merge_artist_features,
+                                 get_artist_features,
+                                 vectorize_artist_features,
+                                 )
+from src.lookup import build_lookups
+from src.similarity import QuantizedIndex, SimilarityIndex, normalize_rows, quantize_rows
+from src.storage import source_fingerprint
+from src.tracing import traced
+
+
+# bump when the on-disk layout changes, old stores are then rebuilt
+FORMAT_VERSION = 2
+STORE_DIR = 'data/vector_store'
+SOURCE_FILES = ['data/tracks.csv', 'data/mapping.csv', 'data/artists.csv', 'data/audio_features.csv']
+
+FEATURES = ['danceability', 'energy', 'acousticness', 'instrumentalness',
+            'liveness', 'valence', 'speechiness', 'key', 'mode',
+            'tempo', 'time_signature']
+
+# arrays saved per entity kind ('track' or 'artist')
+ARRAYS = ['vectors', 'unit', 'norms', 'ids', 'unit_int8', 'unit_float16']
+KINDS = ['track', 'artist']
+
+
+def store_path(store_dir=STORE_DIR, fingerprint=None):
+    """Directory of the store version matching the current source data"""
+    if fingerprint is None:
+        fingerprint = source_fingerprint(SOURCE_FILES)
+    return os.path.join(store_dir, f'v{FORMAT_VERSION}-{fingerprint}')
+
+
+def build_vector_store(store_dir=STORE_DIR):
+    """
+    Build the vector store from the data/ files and write it to disk.
+
+    The store is written to a temporary directory and moved into place in one
+    step, so processes opening the store never see a half-written version.
+    Older versions are removed afterwards (open memory maps stay valid).
+
+    Args:
+        store_dir (str): Parent directory of the versioned store (default data/vector_store)
+
+    Returns:
+        str: Path of the written store version
+    """
+    fingerprint = source_fingerprint(SOURCE_FILES)
+    final_path = store_path(store_dir, fingerprint)
+
+    # the shared catalog of the process, not another copy of it
+    tracks, mapping, artists, audio_features = load_catalog()
+
+    # tracks: one row per track_id with audio features
+    tracks_features = pd.merge(tracks, audio_features, on='track_id', how='inner')
+    tracks_features = tracks_features.drop_duplicates('track_id')
+    track_vectors, songs_cleaned, track_scaler = vectorize_artist_features(tracks_features, return_scaler=True)
+
+    # artists: mean track features per artist name, mapped back to the artist's id
+    artist_track_ = merge_artist_features(tracks, mapping, artists)
+    table = get_artist_features(artists, artist_track_, audio_features)
+    artist_vectors, artists_cleaned, artist_scaler = vectorize_artist_features(table, return_scaler=True)
+    first_id_per_name = artists.drop_duplicates('name').set_index('name')['artist_id']
+    artist_ids = first_id_per_name.reindex(artists_cleaned['name']).to_numpy()
+
+    arrays = {}
+    scalers = {}
+    for kind, vectors, ids, scaler in [('track', track_vectors, songs_cleaned['track_id'].to_numpy(), track_scaler),
+                                       ('artist', artist_vectors, artist_ids, artist_scaler)]:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        unit, norms = normalize_rows(vectors)
+        arrays[f'{kind}_vectors'] = vectors
+        arrays[f'{kind}_unit'] = unit
+        arrays[f'{kind}_norms'] = norms.astype(np.float32)
+        # compact scan copies, re-ranked against the float32 rows at query time
+        arrays[f'{kind}_unit_int8'], int8_scale, int8_offset = quantize_rows(unit, 'int8')
+        arrays[f'{kind}_unit_float16'] = quantize_rows(unit, 'float16')[0]
+        # fixed-width unicode so the id maps can be memory-mapped too
+        arrays[f'{kind}_ids'] = np.asarray(ids).astype(str)
+        scalers[f'{kind}_data_min'] = scaler.data_min_
+        scalers[f'{kind}_data_max'] = scaler.data_max_
+        scalers[f'{kind}_int8_scale'] = int8_scale
+        scalers[f'{kind}_int8_offset'] = int8_offset
+
+    manifest = {
+        'version': f'v{FORMAT_VERSION}-{fingerprint}',
+        'format_version': FORMAT_VERSION,
+        'source_fingerprint': fingerprint,
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'features': FEATURES,
+        'n_tracks': int(len(track_vectors)),
+        'n_artists': int(len(artist_vectors)),
+    }
+
+    os.makedirs(store_dir, exist_ok=True)
+    tmp_path = tempfile.mkdtemp(dir=store_dir, prefix='.build-')
+    try:
+        os.chmod(tmp_path, 0o755)
+        for name, array in arrays.items():
+            np.save(os.path.join(tmp_path, f'{name}.npy'), array)
+        np.savez(os.path.join(tmp_path, 'scalers.npz'), **scalers)
+        with open(os.path.join(tmp_path, 'manifest.json'), 'w') as f:
+            json.dump(manifest, f, indent=2)
+
+        if os.path.isdir(final_path):
+            # another process finished the same build first
+            shutil.rmtree(tmp_path)
+        else:
+            os.rename(tmp_path, final_path)
+    except Exception:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        raise
+
+    # remove stale versions
+    for entry in os.listdir(store_dir):
+        entry_path = os.path.join(store_dir, entry)
+        if entry_path != final_path and entry.startswith('v') and os.path.isdir(entry_path):
+            shutil.rmtree(entry_path, ignore_errors=True)
+
+    return final_path
+
+
+class VectorStore:
+    """
+    Read-only view of a built vector store.
+
+    Matrices and id maps are memory-mapped; only the manifest and the scaler
+    parameters are read into memory.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, 'manifest.json')) as f:
+            self.manifest = json.load(f)
+        self.version = self.manifest['version']
+        self.features = self.manifest['features']
+
+        for kind in KINDS:
+            for name in ARRAYS:
+                array = np.load(os.path.join(path, f'{kind}_{name}.npy'), mmap_mode='r')
+                setattr(self, f'{kind}_{name}', array)
+
+        with np.load(os.path.join(path, 'scalers.npz')) as scalers:
+            self.scalers = {key: scalers[key] for key in scalers.files}
+
+    def index(self, kind, scan='float32', rerank=300):
+        """
+        Similarity index over the memory-mapped vectors of 'track' or 'artist'.
+
+        Args:
+            kind (str): 'track' or 'artist'
+            scan (str): 'float32' scans the full-precision vectors (exact); 'int8'
+                or 'float16' scan the compact copy and re-rank the best candidates
+            rerank (int): Candidates re-scored at full precision for compact scans (default 300)
+
+        Returns:
+            SimilarityIndex or QuantizedIndex
+        """
+        unit, norms = getattr(self, f'{kind}_unit'), getattr(self, f'{kind}_norms')
+        if scan == 'float32':
+            return SimilarityIndex.from_unit_vectors(unit, norms)
+        if scan == 'int8':
+            return QuantizedIndex(unit, norms, getattr(self, f'{kind}_unit_int8'),
+                                  self.scalers[f'{kind}_int8_scale'], self.scalers[f'{kind}_int8_offset'],
+                                  rerank=rerank)
+        if scan == 'float16':
+            return QuantizedIndex(unit, norms, getattr(self, f'{kind}_unit_float16'), rerank=rerank)
+        raise ValueError(f"Unsupported scan dtype: {scan}")
+
+    def inverse_transform(self, kind, rows=None):
+        """
+        Undo the MinMax scaling of 'track' or 'artist' vectors.
+
+        Args:
+            kind (str): 'track' or 'artist'
+            rows (array-like): Rows to transform, all rows if None
+
+        Returns:
+            np.array: Feature values on their original scale
+        """
+        vectors = getattr(self, f'{kind}_vectors')
+        if rows is not None:
+            vectors = vectors[rows]
+        data_min = self.scalers[f'{kind}_data_min']
+        data_range = self.scalers[f'{kind}_data_max'] - data_min
+        # MinMaxScaler maps constant features to 0, keep them at their value
+        data_range[data_range == 0] = 1
+        return np.asarray(vectors, dtype=np.float64) * data_range + data_min
+
+
+def load_vector_store(store_dir=STORE_DIR, build_missing=True):
+    """
+    Open the store version matching the current data files.
+
+    Args:
+        store_dir (str): Parent directory of the versioned store (default data/vector_store)
+        build_missing (bool): Build the store if it does not exist yet (default True)
+
+    Returns:
+        VectorStore: The opened store
+    """
+    path = store_path(store_dir)
+    if not os.path.isdir(path):
+        if not build_missing:
+            raise FileNotFoundError(f"No vector store at {path}, run `python -m src.vector_store`")
+        path = build_vector_store(store_dir)
+    return VectorStore(path)
+
+
+@st.cache_resource
+@traced
+def open_vector_store():
+    """Process-wide vector store, opened once per Streamlit server process"""
+    return load_vector_store()
+
+
+@st.cache_resource
+@traced
+def load_index(kind, scan='float32'):
+    """
+    Process-wide similarity index of 'track' or 'artist' (see VectorStore.index),
+    so cached weighted row norms are shared by every session.
+    """
+    return open_vector_store().index(kind, scan=scan)
+
+
+@st.cache_resource
+@traced
+def load_item_frame(kind):
+    """
+    Metadata and original-scale features aligned row by row with the store.
+
+    Args:
+        kind (str): 'track' or 'artist'
+
+    Returns:
+        pd.DataFrame: One row per vector, with the id, name and feature columns
+    """
+    store = open_vector_store()
+    tracks, mapping, artists, audio_features = load_catalog()
+    frame, id_column = (tracks, 'track_id') if kind == 'track' else (artists, 'artist_id')
+
+    ids = getattr(store, f'{kind}_ids')
+    items = frame.drop_duplicates(id_column).set_index(id_column).reindex(ids)
+    items.index.name = id_column
+    items = items.reset_index()
+    items[store.features] = store.inverse_transform(kind)
+
+    return items
+
+
+@st.cache_resource
+@traced
+def load_item_lookups(kind):
+    """
+    Name and id lookups over the rows of load_item_frame(kind).
+
+    Args:
+        kind (str): 'track' or 'artist'
+
+    Returns:
+        dict: {'name': RowLookup, '<kind>_id': RowLookup}
+    """
+    return build_lookups(load_item_frame(kind), ['name', f'{kind}_id'])
+
+
+if __name__ == '__main__':
+    start = time.perf_counter()
+    path = build_vector_store()
+    store = VectorStore(path)
+    print(f"Built {store.version} in {time.perf_counter() - start:.2f}s at {path}: "
+          f"{store.manifest['n_tracks']} tracks, {store.manifest['n_artists']} artists")
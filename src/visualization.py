@@ -8,10 +8,13 @@ from sklearn.preprocessing import StandardScaler
 import pandas as pd
 import random
 
+from src.tracing import span, traced
 
 
 
 
+
+@traced
 def create_radar_chart_new(table):
     """Creates radar chart comparing song features using Plotly.
     """
@@ -96,23 +99,31 @@ def align_datasets(vectors, artists_df):
         return vectors_aligned, artists_aligned
 
 
-def visualize_artist_space(vectors, items_df, scores=None, item_type="artist"):
+@traced
+def visualize_artist_space(vectors, items_df, scores=None, item_type="artist", coords=None):
     """
     Visualize artists in 2D space with optional feature weights
-    """
 
-        # Apply StandardScaler before t-SNE
-    scaler = StandardScaler()
-    vectors_scaled = scaler.fit_transform(vectors)
+    coords: optional precomputed (n, 2) layout of the items (see src.projection);
+    t-SNE is only fitted on the fly when it is missing
+    """
 
-    perplexity = min(30, len(vectors) - 1)
-    tsne = TSNE(
-        n_components=2, 
-        random_state=42,
-        perplexity=perplexity,
-        max_iter=1000
-    )
-    vectors_2d = tsne.fit_transform(vectors_scaled)
+    if coords is not None:
+        vectors_2d = np.asarray(coords)
+    else:
+        with span('t-SNE', rows=len(vectors)):
+            # Apply StandardScaler before t-SNE
+            scaler = StandardScaler()
+            vectors_scaled = scaler.fit_transform(vectors)
+
+            perplexity = min(30, len(vectors) - 1)
+            tsne = TSNE(
+                n_components=2, 
+                random_state=42,
+                perplexity=perplexity,
+                max_iter=1000
+            )
+            vectors_2d = tsne.fit_transform(vectors_scaled)
 
         # Use dictionary for dynamic labels
     labels = {
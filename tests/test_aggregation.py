@@ -0,0 +1,70 @@
+"""
+ArtistProfiles kept current by appending catalog rows in batches, against a
+one-shot ArtistAggregates rebuild from the rows appended so far.
+
+Run from the repository root:
+    python -m pytest tests
+"""
+import numpy as np
+import pandas as pd
+
+from benchmarks.bench_aggregation import synthetic_artist_tracks
+from src.aggregation import FEATURES, ArtistAggregates, ArtistProfiles
+from src.data_processing import get_artist_features, merge_artist_features, vectorize_artist_features
+
+
+N_ARTISTS = 1_000
+
+
+def tracks_between(frame, start, stop):
+    """Rows of the tracks numbered start..stop-1 (synthetic ids are numbered in category order)"""
+    codes = frame['track_id'].cat.codes.to_numpy()
+    return frame[(codes >= start) & (codes < stop)]
+
+
+def assert_matches_rebuild(profiles, tracks, mapping, artists, audio_features):
+    artist_track_ = merge_artist_features(tracks, mapping, artists)
+    expected_vectors, _ = vectorize_artist_features(get_artist_features(artists, artist_track_, audio_features))
+    vectors, table = profiles.vectors()
+
+    pd.testing.assert_frame_equal(table, ArtistAggregates(artist_track_, audio_features).frame(),
+                                  check_exact=False, rtol=1e-6)
+    np.testing.assert_allclose(vectors, expected_vectors, rtol=0, atol=1e-6)
+    assert profiles.verify(tracks, mapping, artists, audio_features)
+
+
+def test_appended_batches_match_rebuild():
+    artists, tracks, mapping, audio_features = synthetic_artist_tracks(N_ARTISTS)
+    n_tracks = len(tracks)
+    # the last two tracks move the min and max of every feature, which rescales every artist
+    for feature in FEATURES:
+        audio_features[feature] = np.concatenate([audio_features[feature].to_numpy()[:-2],
+                                                  np.array([3.0, -2.0], dtype=np.float32)])
+
+    # half the artists and tracks at first
+    first_artists = artists.iloc[:N_ARTISTS // 2]
+    seen = n_tracks // 2
+    profiles = ArtistProfiles(tracks_between(tracks, 0, seen), tracks_between(mapping, 0, seen), first_artists,
+                              tracks_between(audio_features, 0, seen))
+    assert_matches_rebuild(profiles, tracks_between(tracks, 0, seen), tracks_between(mapping, 0, seen),
+                           first_artists, tracks_between(audio_features, 0, seen))
+
+    # the other artists, whose mapping rows were waiting for them
+    profiles.append(artists=artists.iloc[N_ARTISTS // 2:])
+    assert_matches_rebuild(profiles, tracks_between(tracks, 0, seen), tracks_between(mapping, 0, seen),
+                           artists, tracks_between(audio_features, 0, seen))
+
+    # small batches of new tracks, each with its mapping rows; features arrive one batch late
+    batches = np.linspace(seen, n_tracks, 6).astype(int)
+    for start, stop in zip(batches[:-1], batches[1:]):
+        changed = profiles.append(tracks=tracks_between(tracks, start, stop),
+                                  mapping=tracks_between(mapping, start, stop),
+                                  audio_features=tracks_between(audio_features, seen, start))
+        seen = start
+        assert_matches_rebuild(profiles, tracks_between(tracks, 0, stop), tracks_between(mapping, 0, stop),
+                               artists, tracks_between(audio_features, 0, seen))
+        assert len(changed) <= len(profiles)
+
+    # the last features, including the rows that move the min and max
+    profiles.append(audio_features=tracks_between(audio_features, seen, n_tracks))
+    assert_matches_rebuild(profiles, tracks, mapping, artists, audio_features)
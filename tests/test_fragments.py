@@ -0,0 +1,55 @@
+"""
+Expensive calls per interaction of the recommendation pages, replayed on
+headless pages by benchmarks.bench_fragments.
+
+Run from the repository root:
+    python -m pytest tests
+"""
+import pytest
+
+from benchmarks import bench_fragments
+from benchmarks.spotify_stub import SpotifyStubServer
+
+
+# calls made by the fragment holding the widget, for the interactions that stay in it
+FRAGMENT_CALLS = {
+    'move a weight slider': {},
+    'refine the plot layout': {'layout_coords': 1, 'visualize_artist_space': 1},
+    'turn on live mode': {},
+}
+
+
+@pytest.fixture
+def instrumented(monkeypatch, tmp_path):
+    """Pages served by the Spotify stub and a fresh metadata cache, with their calls counted"""
+    from src import spotify_widget
+    from src.metadata_cache import MetadataCache
+    from src.spotify_client import SpotifyClient
+
+    with SpotifyStubServer() as stub:
+        client = SpotifyClient('id', 'secret', api_url=stub.api_url, auth_url=stub.auth_url)
+        cache = MetadataCache(str(tmp_path / 'metadata.sqlite'))
+        monkeypatch.setattr(spotify_widget, 'get_spotify_client', lambda client_id, client_secret: client)
+        monkeypatch.setattr(spotify_widget, 'get_metadata_cache', lambda: cache)
+        bench_fragments.instrument(monkeypatch.setattr)
+        yield stub
+
+
+@pytest.mark.parametrize('kind', sorted(bench_fragments.PAGES))
+def test_calls_per_interaction(instrumented, kind):
+    page, selection, live_key = bench_fragments.PAGES[kind]
+    rows = {(row['interaction'], row['rerun']): row for row in bench_fragments.session_rows(page, selection, live_key)}
+    names = [name for _, name in bench_fragments.EXPENSIVE]
+
+    for label, _, reruns_page, _ in bench_fragments.interactions(live_key):
+        # with the result cache emptied, a whole-page rerun searches and fetches once
+        whole_page = rows[label, 'whole page']
+        assert whole_page['similar_rows'] == 1
+        assert whole_page['fetch_spotify_metadata'] == 1
+        assert whole_page['layout_coords'] == 1
+
+        fragment = {name: rows[label, 'fragment'][name] for name in names}
+        if reruns_page:
+            assert fragment == {name: whole_page[name] for name in names}
+        else:
+            assert fragment == {name: FRAGMENT_CALLS[label].get(name, 0) for name in names}